@@ -0,0 +1,327 @@
+"""
+Run many independent simulations of a vectorized strategy in lockstep over
+one replay of a round.
+
+The round is read once per tick and shared by every simulation. Each
+simulation has its own cash, positions and fills, and its own depletion of
+the tick's orderbook, held as NumPy arrays with one row per simulation. The
+algo's orders are matched and the bot orders filled for the whole batch at
+once, with the same rules as match_order and add_bot_orders: algo orders
+fill against the market levels best price first, what is unfilled rests
+behind the market orders at its price, and each bot order fills market and
+resting algo orders in price and then time priority. Orders do not persist
+across ticks.
+
+The strategy is a BatchTrader class in the algo file, constructed with the
+number of simulations, whose parameters are arrays with one value per
+simulation. Its run method gets a BatchState and returns the price and
+quantity of up to K orders per simulation and product, as arrays of shape
+(simulations, products, K) where a quantity of 0 means no order. Orders
+for a product are matched in K order.
+
+Example:
+    python sweep.py --round Round_3.csv --algo examplealgo_batch.py --batch \\
+        --set parity_threshold=3,3.5,3.9,4.5 --set hedge_threshold=3,5
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from dataimport import MarketData
+from profiling import NULL_TIMER, PhaseTimer
+
+
+class BatchState:
+    """
+    The market and the positions of every simulation at one tick. Arrays
+    are read-only and indexed by product id in the order of products.
+    """
+    __slots__ = ("tick", "products", "positions", "pos_limit", "bid_prices", "bid_volumes",
+                 "ask_prices", "ask_volumes", "best_bid", "best_ask", "mid")
+
+    def __init__(self, tick: int, products: List[str], positions: np.ndarray, pos_limit: np.ndarray,
+                 bid_prices: np.ndarray, bid_volumes: np.ndarray,
+                 ask_prices: np.ndarray, ask_volumes: np.ndarray) -> None:
+        """
+        :param tick: Current tick.
+        :param products: Product names in product id order.
+        :param positions: Positions of shape (simulations, products).
+        :param pos_limit: Position limit of each product.
+        :param bid_prices: Bid levels of shape (products, levels), and the
+            ask and volume arrays likewise.
+        """
+        self.tick = tick
+        self.products = products
+        self.positions = positions
+        self.pos_limit = pos_limit
+        self.bid_prices = bid_prices
+        self.bid_volumes = bid_volumes
+        self.ask_prices = ask_prices
+        self.ask_volumes = ask_volumes
+        # Over all levels, including empty ones, as the engine marks prices
+        self.best_bid = bid_prices.max(axis=1)
+        self.best_ask = ask_prices.min(axis=1)
+        self.mid = (self.best_bid + self.best_ask) / 2
+
+
+class BatchPortfolio:
+    """
+    The portfolios of every simulation in a batch, one row per simulation.
+    """
+    __slots__ = ("products", "cash", "pnl", "positions", "fill_counts", "peak_pnl", "max_drawdown")
+
+    def __init__(self, n: int, products: List[str]) -> None:
+        """
+        :param n: Number of simulations.
+        :param products: Products traded, in product id order.
+        """
+        self.products = list(products)
+        self.cash = np.zeros(n)
+        self.pnl = np.zeros(n)
+        self.positions = np.zeros((n, len(products)), dtype=np.int64)
+        self.fill_counts = np.zeros((n, len(products)), dtype=np.int64)
+        # Running versions of main.max_drawdown, so no PnL history is kept
+        self.peak_pnl = np.zeros(n)
+        self.max_drawdown = np.zeros(n)
+
+    def __len__(self) -> int:
+        return len(self.cash)
+
+    def mark(self, mid: np.ndarray) -> None:
+        """
+        Mark every portfolio to the mid prices and update its drawdown.
+
+        :param mid: Mid price of each product.
+        """
+        self.pnl = self.cash + self.positions @ mid
+        np.maximum(self.peak_pnl, self.pnl, out=self.peak_pnl)
+        np.maximum(self.max_drawdown, self.peak_pnl - self.pnl, out=self.max_drawdown)
+
+    def record_fills(self, product_ids: np.ndarray, prices: np.ndarray, quantities: np.ndarray) -> None:
+        """
+        Update the portfolios for one fill, or none, per simulation and product.
+
+        :param product_ids: Product id of each column.
+        :param prices: Fill prices of shape (simulations, columns).
+        :param quantities: Quantities bought, negative when selling, of the
+            same shape. Zero means no fill.
+        """
+        self.positions[:, product_ids] += quantities
+        self.cash -= (quantities * prices).sum(axis=1)
+        self.fill_counts[:, product_ids] += quantities != 0
+
+
+def _best_first(prices: np.ndarray, volumes: np.ndarray, descending: bool) -> Tuple[np.ndarray, np.ndarray]:
+    # Levels of each product sorted from the best price outwards
+    order = np.argsort(-prices if descending else prices, axis=1, kind="stable")
+    return np.take_along_axis(prices, order, axis=1), np.take_along_axis(volumes, order, axis=1)
+
+
+def match_batch_orders(
+    prices: np.ndarray,
+    quantities: np.ndarray,
+    bid_prices: np.ndarray,
+    bid_left: np.ndarray,
+    ask_prices: np.ndarray,
+    ask_left: np.ndarray,
+    portfolio: BatchPortfolio,
+    pos_limit: np.ndarray,
+) -> np.ndarray:
+    """
+    Match every simulation's orders against its copy of the market levels,
+    up to the position limit, as match_order does for one simulation.
+
+    :param prices: Order prices of shape (simulations, products, K).
+    :param quantities: Order quantities of the same shape, positive to buy.
+    :param bid_prices: Bid prices of shape (products, levels), best first.
+    :param bid_left: Bid volumes left in each simulation, of shape
+        (simulations, products, levels). Updated in place.
+    :param ask_prices: Ask prices, best first.
+    :param ask_left: Ask volumes left in each simulation. Updated in place.
+    :param portfolio: The portfolios to be updated.
+    :param pos_limit: Position limit of each product.
+    :return: The unfilled quantity of each order, negative for sells, which
+        rests behind the market orders at its price.
+    """
+    product_ids = np.arange(quantities.shape[1])
+    positions = portfolio.positions
+    unfilled = quantities.copy()
+    for k in range(quantities.shape[2]):
+        quantity = quantities[:, :, k]
+        if not quantity.any():
+            continue
+        price = prices[:, :, k]
+        buying = quantity > 0
+        # Most each order may fill before the position limit, never negative
+        remaining = np.maximum(np.minimum(np.abs(quantity), pos_limit - np.where(buying, positions, -positions)), 0)
+        for level_prices, left, sign, crosses in (
+            (ask_prices, ask_left, 1, buying & (quantity != 0)),
+            (bid_prices, bid_left, -1, ~buying & (quantity != 0)),
+        ):
+            for level in range(level_prices.shape[1]):
+                level_price = level_prices[:, level]
+                reached = crosses & ((level_price <= price) if sign > 0 else (level_price >= price))
+                if not reached.any():
+                    break
+                amount = np.where(reached, np.minimum(remaining, left[:, :, level]), 0)
+                left[:, :, level] -= amount
+                remaining -= amount
+                unfilled[:, :, k] -= sign * amount
+                portfolio.record_fills(product_ids, np.broadcast_to(level_price, amount.shape), sign * amount)
+    return unfilled
+
+
+def add_batch_bot_orders(
+    bot_prices: np.ndarray,
+    bot_quantities: np.ndarray,
+    level_prices: np.ndarray,
+    level_left: np.ndarray,
+    resting_prices: np.ndarray,
+    resting: np.ndarray,
+    portfolio: BatchPortfolio,
+    pos_limit: np.ndarray,
+    bot_side: str,
+) -> None:
+    """
+    Match one side of the bot orders against every simulation's market
+    levels and resting algo orders, as add_bot_orders does for one simulation.
+    Resting orders fill in price priority, behind the market orders at the
+    same price and in the order they were sent.
+
+    :param bot_prices: Bot order price of each product.
+    :param bot_quantities: Bot order quantity of each product, 0 for none.
+    :param level_prices: Prices of the market levels the bots trade with, of
+        shape (products, levels).
+    :param level_left: Volumes of those levels left in each simulation.
+    :param resting_prices: Prices of the algo orders, of shape
+        (simulations, products, K).
+    :param resting: Unfilled quantity of the algo orders, positive for buys.
+    :param portfolio: The portfolios to be updated.
+    :param pos_limit: Position limit of each product.
+    :param bot_side: BUY to fill the algo's sells, SELL to fill its buys.
+    """
+    buying = bot_side == "BUY"
+    # A bot buy fills the algo's sells and a bot sell fills its buys
+    algo_sign = -1 if buying else 1
+    price_sign = 1 if buying else -1
+    # Only products with a bot order, and the levels and algo orders it reaches
+    columns = np.flatnonzero(bot_quantities > 0)
+    bot_prices = bot_prices[columns]
+    algo_quantity = np.maximum(algo_sign * resting[:, columns], 0)
+    resting_prices = resting_prices[:, columns]
+    algo_reached = (algo_quantity > 0) & (price_sign * resting_prices <= price_sign * bot_prices[:, None])
+    orders = np.flatnonzero(algo_reached.any(axis=(0, 1)))
+    if not len(orders):
+        # Only market orders are filled, which leaves the portfolios as they are
+        return
+    level_prices = level_prices[columns]
+    levels = np.flatnonzero((price_sign * level_prices <= price_sign * bot_prices[:, None]).any(axis=0))
+    n = len(resting)
+    n_levels, n_orders = len(levels), len(orders)
+
+    prices = np.concatenate([
+        np.broadcast_to(level_prices[:, levels], (n, len(columns), n_levels)),
+        resting_prices[:, :, orders],
+    ], axis=2).astype(np.int64)
+    quantity = np.concatenate([level_left[:, columns][:, :, levels], algo_quantity[:, :, orders]], axis=2)
+    # Price priority, then the market orders, then the algo's in time order
+    key = price_sign * prices * (n_orders + 1)
+    key[:, :, n_levels:] += np.arange(1, n_orders + 1)
+    order = np.argsort(key, axis=2)
+    prices = np.take_along_axis(prices, order, axis=2)
+    quantity = np.take_along_axis(quantity, order, axis=2)
+    is_algo = order >= n_levels
+
+    bot_left = np.repeat(bot_quantities[columns][None].astype(np.int64), n, axis=0)
+    room = pos_limit[columns] - algo_sign * portfolio.positions[:, columns]
+    for i in range(prices.shape[2]):
+        price = prices[:, :, i]
+        reached = (bot_left > 0) & (price_sign * price <= price_sign * bot_prices)
+        if not reached.any():
+            break
+        amount = np.where(reached, np.minimum(bot_left, quantity[:, :, i]), 0)
+        algo = is_algo[:, :, i]
+        amount = np.where(algo, np.maximum(np.minimum(amount, room), 0), amount)
+        bot_left -= amount
+        algo_amount = np.where(algo, amount, 0)
+        room -= algo_amount
+        portfolio.record_fills(columns, price, algo_sign * algo_amount)
+
+
+def run_batch_simulation(
+    market_data: MarketData,
+    bot_data: MarketData,
+    algo,
+    n: int,
+    pos_limit: int,
+    start_tick: int = 1,
+    end_tick: Optional[int] = None,
+    timer: PhaseTimer = NULL_TIMER,
+) -> BatchPortfolio:
+    """
+    Run a BatchTrader over a round for n simulations at once and return
+    their portfolios after the last tick.
+
+    :param market_data: Indexed market data for the round.
+    :param bot_data: Indexed bot orders for the round.
+    :param algo: BatchTrader instance holding the parameters of every simulation.
+    :param n: Number of simulations.
+    :param pos_limit: Position limit of every product.
+    :param start_tick: First tick to simulate.
+    :param end_tick: Tick to stop before, defaults to the end of the data.
+    :param timer: Records the time spent in each phase of every tick.
+    """
+    products = market_data.products
+    end = market_data.ticks if end_tick is None else min(end_tick, market_data.ticks)
+    missing = ~market_data.present[start_tick:end]
+    if missing.any():
+        tick, product_id = np.argwhere(missing)[0]
+        raise KeyError(f"No data for {products[product_id]} at tick {start_tick + tick}")
+
+    portfolio = BatchPortfolio(n, products)
+    limits = np.full(len(products), pos_limit, dtype=np.int64)
+    limits.flags.writeable = False
+    bot_present = np.zeros((end, len(products)), dtype=bool)
+    bot_present[:min(end, bot_data.ticks)] = bot_data.present[:end]
+
+    for tick in range(start_tick, end):
+        with timer.phase("extract"):
+            bid_prices, bid_volumes = _best_first(market_data.bid_prices[tick], market_data.bid_volumes[tick], True)
+            ask_prices, ask_volumes = _best_first(market_data.ask_prices[tick], market_data.ask_volumes[tick], False)
+            for array in (bid_prices, bid_volumes, ask_prices, ask_volumes):
+                array.flags.writeable = False
+            positions = portfolio.positions.view()
+            positions.flags.writeable = False
+            state = BatchState(tick, products, positions, limits, bid_prices, bid_volumes, ask_prices, ask_volumes)
+
+        with timer.phase("algo"):
+            prices, quantities = algo.run(state)
+
+        with timer.phase("match"):
+            prices = np.asarray(prices, dtype=np.int64)
+            quantities = np.asarray(quantities, dtype=np.int64)
+            if prices.shape != quantities.shape or prices.shape[:2] != (n, len(products)):
+                raise ValueError(
+                    f"BatchTrader.run must return prices and quantities of shape ({n}, {len(products)}, K), "
+                    f"got {prices.shape} and {quantities.shape}"
+                )
+            # Every simulation depletes its own copy of the tick's levels
+            bid_left = np.repeat(bid_volumes[None].astype(np.int64), n, axis=0)
+            ask_left = np.repeat(ask_volumes[None].astype(np.int64), n, axis=0)
+            resting = match_batch_orders(prices, quantities, bid_prices, bid_left, ask_prices, ask_left,
+                                         portfolio, limits)
+
+        with timer.phase("bots"):
+            if tick < bot_data.ticks:
+                present = bot_present[tick]
+                for bot_side, levels, left, prefix in (("BUY", ask_prices, ask_left, "bid"),
+                                                       ("SELL", bid_prices, bid_left, "ask")):
+                    bot_quantities = np.where(present, getattr(bot_data, f"{prefix}_volumes")[tick, :, 0], 0)
+                    if (bot_quantities > 0).any():
+                        add_batch_bot_orders(getattr(bot_data, f"{prefix}_prices")[tick, :, 0], bot_quantities,
+                                             levels, left, prices, resting, portfolio, limits, bot_side)
+
+        with timer.phase("mark"):
+            portfolio.mark(state.mid)
+
+    return portfolio
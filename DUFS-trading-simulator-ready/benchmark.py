@@ -0,0 +1,483 @@
+"""
+Reproducible benchmarks for the matching engine, bot matching, data import
+and full backtests.
+
+Every benchmark builds its inputs from a fixed seed, so two runs on the same
+machine time the same work. Sizes grow with --scale: deeper books, more
+resting algo levels and more rows of round data. The allocation benchmarks
+measure bytes with tracemalloc instead of time: the memory a fill-heavy
+matching loop allocates, and the size of the model objects built every tick.
+Results are written as JSON so runs from different commits can be compared
+with --compare.
+
+Example:
+    python benchmark.py --scale 1 --scale 10 --out after.json
+    python benchmark.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from statistics import mean, median
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bots_functions import add_bot_orders
+from dataimport import extract_orders, index_orders
+from datamodel import Order, OrderBook, Portfolio, State
+from ordermatching import match_order
+from synthetic import generate_round, option_products, write_round
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OPTION_PRODUCTS = [product.name for product in option_products()]
+# Shipped rounds and the algos written for them
+BACKTESTS = [("Round_2.csv", "Round_2_code.py"), ("Round_3.csv", "examplealgo.py")]
+# Large enough that no fill in a benchmark is cut short by the position limit
+NO_LIMIT = 10 ** 9
+
+
+def measure(setup: Callable[[], List[tuple]], fn: Callable, repeat: int) -> List[float]:
+    """
+    Time fn over batches of arguments and return the mean microseconds per
+    call of each batch. Arguments are built by setup outside the timed region.
+
+    :param setup: Returns a list of argument tuples, one per call in a batch.
+    :param fn: Function to time.
+    :param repeat: Number of batches.
+    """
+    samples = []
+    for _ in range(repeat):
+        batch = setup()
+        start = perf_counter_ns()
+        for args in batch:
+            fn(*args)
+        samples.append((perf_counter_ns() - start) / len(batch) / 1e3)
+    return samples
+
+
+def measure_memory(setup: Callable[[], List[tuple]], fn: Callable, repeat: int) -> List[float]:
+    """
+    Trace fn over batches of arguments and return the mean peak bytes
+    allocated per call of each batch, over what was allocated before the
+    call. Arguments are built by setup outside the traced calls.
+
+    :param setup: Returns a list of argument tuples, one per call in a batch.
+    :param fn: Function to trace.
+    :param repeat: Number of batches.
+    """
+    samples = []
+    for _ in range(repeat):
+        batch = setup()
+        tracemalloc.start()
+        try:
+            total = 0
+            for args in batch:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                fn(*args)
+                total += tracemalloc.get_traced_memory()[1] - before
+        finally:
+            tracemalloc.stop()
+        samples.append(total / len(batch))
+    return samples
+
+
+def measure_footprint(build: Callable[[int], List[Any]], n: int, repeat: int) -> List[float]:
+    """
+    Return the bytes per object that stay allocated while n objects from
+    build are alive, once per repeat.
+
+    :param build: Builds a list of n objects.
+    :param n: Number of objects.
+    :param repeat: Number of samples.
+    """
+    samples = []
+    for _ in range(repeat):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            objects = build(n)
+            samples.append((tracemalloc.get_traced_memory()[0] - before) / n)
+            del objects
+        finally:
+            tracemalloc.stop()
+    return samples
+
+
+def deep_side(side: str, best: int, depth: int, rng: np.random.Generator) -> Dict[int, int]:
+    """
+    A side of a book with one level at every price for depth ticks from best.
+
+    :param side: BUY or SELL.
+    :param best: Best price of the side.
+    :param depth: Number of price levels.
+    :param rng: Random generator for the level volumes.
+    """
+    step = -1 if side == "BUY" else 1
+    volumes = rng.integers(1, 20, size=depth).tolist()
+    return {best + step * i: volume for i, volume in enumerate(volumes)}
+
+
+def synthetic_frames(n_ticks: int, seed: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Market and bot order frames of a synthetic round of OPTION_PRODUCTS.
+
+    :param n_ticks: Number of ticks.
+    :param seed: Seed for the generator.
+    """
+    return generate_round(n_ticks, option_products(), seed=seed)
+
+
+def match_order_case(scale: int, seed: int, n_products: int) -> Tuple[Dict[str, Any], Callable[[], List[tuple]]]:
+    """
+    One buy and one sell order per product sweeping books 20 * scale levels
+    deep, so every order fills against every level of its book. Returns the
+    parameters and the setup building a batch of match_order arguments.
+    """
+    rng = np.random.default_rng(seed)
+    products = [f"P{i}" for i in range(n_products)]
+    depth = 20 * scale
+    template = {
+        product: OrderBook(deep_side("BUY", 999, depth, rng), deep_side("SELL", 1001, depth, rng))
+        for product in products
+    }
+    orders = []
+    for product in products:
+        orders.append(Order(product, 1001 + depth, 20 * depth))
+        orders.append(Order(product, 999 - depth, -20 * depth))
+    pos_limit = {product: NO_LIMIT for product in products}
+
+    def setup() -> List[tuple]:
+        return [(orders, {product: ob.copy() for product, ob in template.items()},
+                 Portfolio(products), pos_limit) for _ in range(10)]
+
+    return {"products": n_products, "depth": depth}, setup
+
+
+def bench_match_order(scale: int, seed: int, repeat: int, n_products: int = 50) -> Dict[str, Any]:
+    """
+    Time of the fill-heavy matching loop of match_order_case.
+    """
+    params, setup = match_order_case(scale, seed, n_products)
+    return {"params": params, "samples": measure(setup, match_order, repeat)}
+
+
+def bench_match_order_memory(scale: int, seed: int, repeat: int, n_products: int = 50) -> Dict[str, Any]:
+    """
+    Peak bytes allocated by the fill-heavy matching loop of match_order_case.
+    """
+    params, setup = match_order_case(scale, seed, n_products)
+    return {"params": params, "unit": "bytes", "samples": measure_memory(setup, match_order, repeat)}
+
+
+def bench_order_footprint(scale: int, seed: int, repeat: int) -> Dict[str, Any]:
+    """
+    Bytes per Order of 10000 * scale orders, as an algo returns them.
+    """
+    rng = np.random.default_rng(seed)
+    n = 10000 * scale
+    prices = rng.integers(900, 1100, size=n).tolist()
+    quantities = rng.integers(-20, 20, size=n).tolist()
+
+    def build(count: int) -> List[Order]:
+        return [Order("P0", prices[i], quantities[i]) for i in range(count)]
+
+    return {"params": {"orders": n}, "unit": "bytes", "samples": measure_footprint(build, n, repeat)}
+
+
+def bench_state_footprint(scale: int, seed: int, repeat: int, n_products: int = 50) -> Dict[str, Any]:
+    """
+    Bytes per State and its public view of 10000 * scale ticks over
+    n_products books, as the engine builds them every tick.
+    """
+    rng = np.random.default_rng(seed)
+    products = [f"P{i}" for i in range(n_products)]
+    orderbook = {product: OrderBook(deep_side("BUY", 999, 5, rng), deep_side("SELL", 1001, 5, rng))
+                 for product in products}
+    portfolio = Portfolio(products)
+    pos_limit = {product: NO_LIMIT for product in products}
+    n = 10000 * scale
+
+    def build(count: int) -> List[State]:
+        states = []
+        for tick in range(count):
+            state = State(orderbook, portfolio.quantity, products, pos_limit, tick)
+            states.append(state)
+            states.append(state.public_view())
+        return states
+
+    return {"params": {"products": n_products, "states": n}, "unit": "bytes",
+            "samples": measure_footprint(build, n, repeat)}
+
+
+def bench_add_bot_orders(scale: int, seed: int, repeat: int, n_products: int = 50) -> Dict[str, Any]:
+    """
+    Bot orders on both sides of every product crossing the market book and
+    20 * scale resting algo levels.
+    """
+    rng = np.random.default_rng(seed)
+    products = [f"P{i}" for i in range(n_products)]
+    depth = 20 * scale
+    template = {}
+    for product in products:
+        book = OrderBook(deep_side("BUY", 999, 3, rng), deep_side("SELL", 1001, 3, rng))
+        for side, best in (("BUY", 999), ("SELL", 1001)):
+            for price, quantity in deep_side(side, best, depth, rng).items():
+                book.submit(side, price, quantity, "algo")
+        template[product] = book
+    bot_orders = {product: {"BUY": {1001 + depth: 20 * depth}, "SELL": {999 - depth: 20 * depth}}
+                  for product in products}
+    pos_limit = {product: NO_LIMIT for product in products}
+
+    def setup() -> List[tuple]:
+        return [(bot_orders, {product: ob.copy() for product, ob in template.items()},
+                 Portfolio(products), pos_limit) for _ in range(10)]
+
+    return {"params": {"products": n_products, "resting_levels": depth},
+            "samples": measure(setup, add_bot_orders, repeat)}
+
+
+def bench_load_snapshot(scale: int, seed: int, repeat: int, n_products: int = 50) -> Dict[str, Any]:
+    """
+    Carrying books 20 * scale levels deep, with algo orders resting in every
+    other level, over to a snapshot one tick higher, as with --persist-orders.
+    """
+    rng = np.random.default_rng(seed)
+    products = [f"P{i}" for i in range(n_products)]
+    depth = 20 * scale
+    template = {}
+    for product in products:
+        book = OrderBook(deep_side("BUY", 999, depth, rng), deep_side("SELL", 1001, depth, rng))
+        for i in range(0, depth, 2):
+            book.submit("BUY", 999 - i, 5, "algo")
+            book.submit("SELL", 1001 + i, 5, "algo")
+        template[product] = book
+    snapshots = {product: (deep_side("BUY", 1000, depth, rng), deep_side("SELL", 1002, depth, rng))
+                 for product in products}
+
+    def load(orderbook: Dict[str, OrderBook]) -> None:
+        for product, (buy_orders, sell_orders) in snapshots.items():
+            orderbook[product].load_snapshot(buy_orders, sell_orders)
+
+    def setup() -> List[tuple]:
+        return [({product: ob.copy() for product, ob in template.items()},) for _ in range(10)]
+
+    return {"params": {"products": n_products, "depth": depth}, "samples": measure(setup, load, repeat)}
+
+
+def bench_extract_orders(scale: int, seed: int, repeat: int) -> Dict[str, Any]:
+    """
+    Orderbook lookups by dataframe filtering on a frame of 3000 * scale rows.
+    """
+    df, _ = synthetic_frames(1000 * scale, seed)
+    rng = np.random.default_rng(seed)
+
+    def setup() -> List[tuple]:
+        ticks = rng.integers(0, 1000 * scale, size=10).tolist()
+        return [(df, tick, OPTION_PRODUCTS[tick % 3]) for tick in ticks]
+
+    return {"params": {"rows": len(df)}, "samples": measure(setup, extract_orders, repeat)}
+
+
+def bench_index_orders(scale: int, seed: int, repeat: int) -> Dict[str, Any]:
+    """
+    Indexing a frame of 3000 * scale rows into MarketData, which replaces
+    per-tick calls to extract_orders.
+    """
+    df, _ = synthetic_frames(1000 * scale, seed)
+    return {"params": {"rows": len(df)},
+            "samples": measure(lambda: [(df, OPTION_PRODUCTS)], index_orders, repeat)}
+
+
+def bench_backtest(round_data_path: str, repeat: int, trading_algo: str) -> Dict[str, Any]:
+    """
+    A full headless backtest of trading_algo, reading the CSVs on every run.
+    """
+    from main import run_backtest
+
+    pnl = []
+
+    def backtest() -> None:
+        pnl.append(run_backtest(round_data_path, trading_algo, use_cache=False)["pnl"])
+
+    samples = measure(lambda: [()], backtest, repeat)
+    # The PnL shows whether a speedup also changed the results
+    return {"params": {"round": os.path.basename(round_data_path), "pnl": pnl[-1]},
+            "samples": samples}
+
+
+def bench_synthetic_backtest(scale: int, seed: int, repeat: int, trading_algo: str) -> Dict[str, Any]:
+    """
+    A full backtest of a synthetic round of 1000 * scale ticks of
+    OPTION_PRODUCTS.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        round_data_path = os.path.join(tmp_dir, f"Round_bench{scale}.csv")
+        write_round(round_data_path, *synthetic_frames(1000 * scale, seed))
+        result = bench_backtest(round_data_path, repeat, trading_algo)
+    result["params"]["ticks"] = 1000 * scale
+    return result
+
+
+def run_benchmarks(scales: List[int], seed: int = 0, repeat: int = 5,
+                   backtests: Optional[List[Tuple[str, str]]] = None) -> Dict[str, Any]:
+    """
+    Run every benchmark at every scale and backtests of real rounds.
+
+    :param scales: Size multipliers for the synthetic benchmarks.
+    :param seed: Seed for all synthetic data.
+    :param repeat: Number of timed samples per benchmark.
+    :param backtests: (round, algo) file paths to backtest, defaults to
+        BACKTESTS. The synthetic rounds are backtested with the last algo.
+    """
+    if backtests is None:
+        backtests = [(os.path.join(HERE, round_file), os.path.join(HERE, algo_file))
+                     for round_file, algo_file in BACKTESTS]
+    synthetic_algo = backtests[-1][1] if backtests else os.path.join(HERE, "examplealgo.py")
+
+    cases: List[Tuple[str, Optional[int], Callable[[], Dict[str, Any]]]] = []
+    for scale in scales:
+        cases += [
+            ("match_order", scale, lambda s=scale: bench_match_order(s, seed, repeat)),
+            ("match_order_alloc", scale, lambda s=scale: bench_match_order_memory(s, seed, repeat)),
+            ("order_footprint", scale, lambda s=scale: bench_order_footprint(s, seed, repeat)),
+            ("state_footprint", scale, lambda s=scale: bench_state_footprint(s, seed, repeat)),
+            ("add_bot_orders", scale, lambda s=scale: bench_add_bot_orders(s, seed, repeat)),
+            ("load_snapshot", scale, lambda s=scale: bench_load_snapshot(s, seed, repeat)),
+            ("extract_orders", scale, lambda s=scale: bench_extract_orders(s, seed, repeat)),
+            ("index_orders", scale, lambda s=scale: bench_index_orders(s, seed, repeat)),
+            ("backtest_synthetic", scale,
+             lambda s=scale: bench_synthetic_backtest(s, seed, repeat, synthetic_algo)),
+        ]
+    for round_data_path, trading_algo in backtests:
+        cases.append(("backtest", None,
+                      lambda r=round_data_path, a=trading_algo: bench_backtest(r, repeat, a)))
+
+    results = []
+    for name, scale, bench in cases:
+        result = bench()
+        samples = result["samples"]
+        unit = result.get("unit", "us")
+        row = {
+            "benchmark": name,
+            "scale": scale,
+            "params": result["params"],
+            "repeat": len(samples),
+            f"min_{unit}": min(samples),
+            f"median_{unit}": median(samples),
+            f"mean_{unit}": mean(samples),
+            f"max_{unit}": max(samples),
+        }
+        print(format_row(row), file=sys.stderr)
+        results.append(row)
+
+    return {"meta": environment(seed), "results": results}
+
+
+def environment(seed: int) -> Dict[str, Any]:
+    """
+    Describe the machine and commit a benchmark run was made on.
+
+    :param seed: Seed the run used.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": seed,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def case_key(row: Dict[str, Any]) -> str:
+    if row["benchmark"] == "backtest":
+        return f"backtest {row['params']['round']}"
+    return f"{row['benchmark']} x{row['scale']}"
+
+
+def row_unit(row: Dict[str, Any]) -> str:
+    """
+    "bytes" for allocation benchmarks, "us" for timed ones.
+    """
+    return "bytes" if "median_bytes" in row else "us"
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    unit = row_unit(row)
+    return (f"{case_key(row):<28}{row[f'median_{unit}']:>14.1f} {unit}"
+            f"  (min {row[f'min_{unit}']:.1f}, n={row['repeat']})")
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    """
+    Format the median time, or bytes, of each benchmark in two runs side by side.
+
+    :param before: Results from run_benchmarks.
+    :param after: Results from run_benchmarks.
+    """
+    old = {case_key(row): row for row in before["results"]}
+    lines = [
+        f"before {before['meta'].get('commit')}, after {after['meta'].get('commit')}",
+        f"{'benchmark':<28}{'before':>14}{'after':>14}{'ratio':>8}",
+    ]
+    for row in after["results"]:
+        key = case_key(row)
+        median_key = f"median_{row_unit(row)}"
+        if key not in old:
+            lines.append(f"{key:<28}{'-':>14}{row[median_key]:>14.1f}{'-':>8}  {row_unit(row)}")
+            continue
+        ratio = row[median_key] / old[key][median_key]
+        lines.append(f"{key:<28}{old[key][median_key]:>14.1f}{row[median_key]:>14.1f}{ratio:>8.2f}  {row_unit(row)}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulator.")
+    parser.add_argument(
+        "--scale", type=int, action="append",
+        help="Size multiplier for the synthetic benchmarks, can be repeated (default 1 and 10)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed samples per benchmark")
+    parser.add_argument(
+        "--backtest", nargs=2, action="append", metavar=("ROUND", "ALGO"),
+        help="Round and algo to backtest, can be repeated (default Round_2.csv with "
+             "Round_2_code.py and Round_3.csv with examplealgo.py)",
+    )
+    parser.add_argument("--out", help="Write the results to this JSON file")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+        help="Compare two JSON result files instead of running",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        files = []
+        for path in args.compare:
+            with open(path) as f:
+                files.append(json.load(f))
+        print(compare(*files))
+    else:
+        report = run_benchmarks(args.scale or [1, 10], args.seed, args.repeat, args.backtest)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(report, f, indent=2)
+        else:
+            print(json.dumps(report, indent=2))
@@ -0,0 +1,162 @@
+"""
+Snapshots of a running simulation, so long runs can be resumed and sweeps
+can fork from a shared warmed-up prefix.
+"""
+import os
+import pickle
+from typing import Any, Dict, List, Optional
+
+from datamodel import OrderBook, Portfolio
+from history import History
+from indicators import IndicatorSet
+from latency import LatencyBudget
+from wake import Wake
+from metrics import MetricsRecorder
+
+
+class Checkpoint:
+    """
+    Everything needed to continue a simulation after a tick: the portfolio,
+    the Trader instance, the metrics recorded so far and the last tick run.
+
+    The orderbooks are rebuilt from the round data every tick, so continuing
+    only needs the tick to replay from, unless orders persist across ticks.
+    Then the orderbooks, with the algo's resting orders, are saved too, as
+    is the algo's price history, registered indicators and wake conditions
+    if it has them, and the latency budget's overruns if the run has one.
+    """
+    def __init__(
+        self,
+        tick: int,
+        products: List[str],
+        portfolio: Portfolio,
+        algo: Any,
+        recorder: MetricsRecorder,
+        round_data_path: Optional[str] = None,
+        trading_algo: Optional[str] = None,
+        orderbook: Optional[Dict[str, OrderBook]] = None,
+        history: Optional[History] = None,
+        indicators: Optional[IndicatorSet] = None,
+        wake: Optional[Wake] = None,
+        budget: Optional[LatencyBudget] = None,
+    ) -> None:
+        """
+        :param tick: Last tick simulated.
+        :param products: Products traded.
+        :param portfolio: The portfolio after the tick.
+        :param algo: Trader instance to run.
+        :param recorder: Metrics and fills recorded up to the tick.
+        :param round_data_path: File path of CSV containing market data.
+        :param trading_algo: Trading algo filepath.
+        :param orderbook: Orderbooks after the tick, if orders persist across ticks.
+        :param history: History up to the tick, if the algo has a history_size.
+        :param indicators: The algo's registered indicators after the tick.
+        :param wake: The algo's wake conditions after the tick.
+        :param budget: The run's latency budget after the tick.
+        """
+        self.tick = tick
+        self.products = list(products)
+        self.portfolio = portfolio
+        self.algo = algo
+        self.recorder = recorder
+        self.round_data_path = round_data_path
+        self.trading_algo = trading_algo
+        self.orderbook = orderbook
+        self.history = history
+        self.indicators = indicators
+        self.wake = wake
+        self.budget = budget
+
+    def dumps(self) -> bytes:
+        """
+        Serialise the checkpoint. The Trader class must have been imported
+        with main.import_trader so its instances can be pickled.
+        """
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def loads(data: bytes) -> "Checkpoint":
+        """
+        Deserialise a checkpoint into independent copies of its state. Import
+        the Trader class with main.import_trader first.
+
+        :param data: Bytes from Checkpoint.dumps.
+        """
+        return pickle.loads(data)
+
+
+def save_checkpoint(checkpoint: Checkpoint, file_path: str) -> None:
+    """
+    Write a checkpoint, replacing any previous one at the same path only once
+    the new one is complete.
+
+    :param checkpoint: Checkpoint to write.
+    :param file_path: Checkpoint file path.
+    """
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(checkpoint.dumps())
+    os.replace(tmp_path, file_path)
+
+
+def load_checkpoint(file_path: str) -> Checkpoint:
+    """
+    Read a checkpoint written by save_checkpoint.
+
+    :param file_path: Checkpoint file path.
+    """
+    with open(file_path, "rb") as f:
+        return Checkpoint.loads(f.read())
+
+
+class Checkpointer:
+    """
+    Saves a checkpoint every few ticks during run_simulation.
+    """
+    def __init__(
+        self,
+        file_path: str,
+        every: int,
+        round_data_path: Optional[str] = None,
+        trading_algo: Optional[str] = None,
+    ) -> None:
+        """
+        :param file_path: Checkpoint file path, overwritten by every save.
+        :param every: Ticks between checkpoints.
+        :param round_data_path: Round recorded in the checkpoint.
+        :param trading_algo: Algo recorded in the checkpoint.
+        """
+        if every <= 0:
+            raise ValueError(f"every must be positive, got {every}")
+        self.file_path = file_path
+        self.every = every
+        self.round_data_path = round_data_path
+        self.trading_algo = trading_algo
+        self.last_tick: Optional[int] = None
+
+    def __call__(
+        self,
+        tick: int,
+        products: List[str],
+        portfolio: Portfolio,
+        algo: Any,
+        recorder: MetricsRecorder,
+        orderbook: Optional[Dict[str, OrderBook]] = None,
+        history: Optional[History] = None,
+        indicators: Optional[IndicatorSet] = None,
+        wake: Optional[Wake] = None,
+        budget: Optional[LatencyBudget] = None,
+    ) -> None:
+        """
+        Save a checkpoint if the tick is due one.
+        """
+        if tick % self.every:
+            return
+        save_checkpoint(
+            Checkpoint(
+                tick, products, portfolio, algo, recorder,
+                self.round_data_path, self.trading_algo, orderbook, history, indicators, wake, budget,
+            ),
+            self.file_path,
+        )
+        self.last_tick = tick
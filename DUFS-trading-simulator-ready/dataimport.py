@@ -1,18 +1,45 @@
-from typing import Tuple, Dict, List
-import pandas as pd
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Tuple, Dict, Iterator, List, Optional
+import numpy as np
 
-def read_file(file_path: str) -> Tuple[List[str], int, pd.DataFrame]:
+if TYPE_CHECKING:
+    # pandas is only imported to parse the CSVs, so loading a round from the
+    # binary cache does not need it
+    import pandas as pd
+
+def read_file(file_path: str) -> Tuple[List[str], int, "pd.DataFrame"]:
     """
     Create a dataframe of all orders.
 
     :param file_path: File path of CSV containing market data.
     """
+    import pandas as pd
+
     df = pd.read_csv(file_path)
     products = df["product"].unique().tolist()
     ticks = df["timestamp"].nunique()
     return products, ticks, df
 
-def extract_orders(df: pd.DataFrame, tick: int, product: str) -> Dict[str, Dict[float, int]]:
+def read_round(file_path: str) -> Tuple[List[str], int, "pd.DataFrame", "pd.DataFrame"]:
+    """
+    Create dataframes of all market and bot orders for a round.
+
+    :param file_path: File path of CSV containing market data. Bot orders are
+        read from the matching ``_bots.csv`` file.
+    """
+    import pandas as pd
+
+    products, ticks, df = read_file(file_path)
+    bot_df = pd.read_csv(file_path[:-4] + "_bots.csv")
+    return products, ticks, df, bot_df
+
+def extract_orders(df: "pd.DataFrame", tick: int, product: str) -> Dict[str, Dict[float, int]]:
     """
     Create an orderbook for the specified tick from  dataframe.
 
@@ -34,7 +61,7 @@ def extract_orders(df: pd.DataFrame, tick: int, product: str) -> Dict[str, Dict[
     return {"BUY": bid_orders,
             "SELL": ask_orders}
 
-def extract_bot_orders(df: pd.DataFrame, tick: int, product: str) -> Dict[str, Dict[float, int]]:
+def extract_bot_orders(df: "pd.DataFrame", tick: int, product: str) -> Dict[str, Dict[float, int]]:
     """
     Create an orderbook for the specified tick from bot order dataframe.
 
@@ -59,3 +86,496 @@ def extract_bot_orders(df: pd.DataFrame, tick: int, product: str) -> Dict[str, D
 
     return {"BUY": bid_orders,
             "SELL": ask_orders}
+
+
+class MarketData:
+    """
+    Orderbook snapshots for every (tick, product), indexed once at load time.
+
+    Prices and volumes are held in arrays of shape (ticks, products, levels) so
+    that building the orderbook for a tick is a direct lookup rather than a scan
+    of the whole dataframe.
+    """
+    ARRAYS = ("present", "bid_prices", "bid_volumes", "ask_prices", "ask_volumes")
+
+    def __init__(self, df: "pd.DataFrame", products: List[str], levels: int = 3, skip_empty: bool = False) -> None:
+        """
+        :param df: Dataframe containing market or bot data.
+        :param products: Products to index, in product id order.
+        :param levels: Number of price levels per side in the dataframe.
+        :param skip_empty: Leave out price levels with zero volume.
+        """
+        product_ids = {product: i for i, product in enumerate(products)}
+        df = df[df["product"].isin(product_ids)]
+        # keep the first row per (timestamp, product), as extract_orders does
+        df = df.drop_duplicates(["timestamp", "product"], keep="first")
+        ticks = df["timestamp"].to_numpy() // 100
+        pids = df["product"].map(product_ids).to_numpy()
+        n_ticks = int(ticks.max()) + 1 if len(ticks) else 0
+
+        shape = (n_ticks, len(products), levels)
+        arrays = {"present": np.zeros(shape[:2], dtype=bool)}
+        arrays["present"][ticks, pids] = True
+        for side in ("bid", "ask"):
+            for field in ("price", "volume"):
+                columns = [f"{side}_{field}_{i + 1}" for i in range(levels)]
+                values = np.zeros(shape, dtype=_value_dtype(df[columns]))
+                for i, column in enumerate(columns):
+                    values[ticks, pids, i] = df[column].to_numpy()
+                arrays[f"{side}_{field}s"] = values
+        self._set_arrays(products, arrays, skip_empty)
+
+    @classmethod
+    def from_arrays(cls, products: List[str], arrays: Dict[str, np.ndarray], skip_empty: bool = False) -> "MarketData":
+        """
+        Create market data from arrays saved by a previous MarketData.
+
+        :param products: Products in product id order.
+        :param arrays: One array per name in MarketData.ARRAYS.
+        :param skip_empty: Leave out price levels with zero volume.
+        """
+        data = cls.__new__(cls)
+        data._set_arrays(products, arrays, skip_empty)
+        return data
+
+    def _set_arrays(self, products: List[str], arrays: Dict[str, np.ndarray], skip_empty: bool) -> None:
+        self.products = list(products)
+        self.product_ids = {product: i for i, product in enumerate(self.products)}
+        self.skip_empty = skip_empty
+        self.present = arrays["present"]
+        self.bid_prices = arrays["bid_prices"]
+        self.bid_volumes = arrays["bid_volumes"]
+        self.ask_prices = arrays["ask_prices"]
+        self.ask_volumes = arrays["ask_volumes"]
+        self.ticks, _, self.levels = self.bid_prices.shape
+
+    def take(self, ticks: np.ndarray) -> "MarketData":
+        """
+        Create market data from the given ticks of this one, in the given order.
+
+        :param ticks: Tick to use for each tick of the new market data.
+        """
+        arrays = {name: getattr(self, name)[ticks] for name in self.ARRAYS}
+        return MarketData.from_arrays(self.products, arrays, self.skip_empty)
+
+    def save(self, directory: str, prefix: str) -> None:
+        """
+        Save the arrays as .npy files that can be memory-mapped by load.
+
+        :param directory: Directory to write to.
+        :param prefix: Prefix for the file names.
+        """
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{prefix}_{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, prefix: str, products: List[str], skip_empty: bool = False, mmap: bool = True) -> "MarketData":
+        """
+        Load arrays written by save, memory-mapped read-only by default.
+
+        :param directory: Directory to read from.
+        :param prefix: Prefix of the file names.
+        :param products: Products in product id order.
+        :param skip_empty: Leave out price levels with zero volume.
+        :param mmap: Memory-map the files instead of reading them into memory.
+        """
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{prefix}_{name}.npy"), mmap_mode=mmap_mode)
+                  for name in cls.ARRAYS}
+        return cls.from_arrays(products, arrays, skip_empty)
+
+    def top_of_book(self) -> Dict[str, Any]:
+        """
+        Best bid, best ask and mid price of every product at every tick, as
+        read-only float arrays of shape (ticks, products). Row i is tick i and
+        column j is products[j]. Ticks with no data for a product are NaN.
+
+        The best prices are taken over all levels, as the engine does when
+        marking the portfolio.
+        """
+        best_bid = self.bid_prices.max(axis=2).astype(np.float64)
+        best_ask = self.ask_prices.min(axis=2).astype(np.float64)
+        best_bid[~self.present] = np.nan
+        best_ask[~self.present] = np.nan
+        mid = (best_bid + best_ask) / 2
+        for array in (best_bid, best_ask, mid):
+            array.flags.writeable = False
+        return {
+            "products": list(self.products),
+            "ticks": np.arange(self.ticks),
+            "best_bid": best_bid,
+            "best_ask": best_ask,
+            "mid": mid,
+        }
+
+    def orders(self, tick: int, product: str) -> Dict[str, Dict[int, int]]:
+        """
+        Create an orderbook for the specified tick and product.
+
+        :param tick: Tick to create orderbook for.
+        :param product: Product to create orderbook for.
+        """
+        pid = self.product_ids[product]
+        if not 0 <= tick < self.ticks or not self.present[tick, pid]:
+            raise KeyError(f"No data for {product} at tick {tick}")
+        return {"BUY": self._side(self.bid_prices[tick, pid], self.bid_volumes[tick, pid]),
+                "SELL": self._side(self.ask_prices[tick, pid], self.ask_volumes[tick, pid])}
+
+    def orderbook(self, tick: int, missing_ok: bool = False) -> Dict[str, Dict[str, Dict[int, int]]]:
+        """
+        Create the orderbooks of all products for the specified tick.
+
+        :param tick: Tick to create orderbooks for.
+        :param missing_ok: Leave out products with no data at the tick instead
+            of raising KeyError.
+        """
+        if not missing_ok:
+            return {product: self.orders(tick, product) for product in self.products}
+        if not 0 <= tick < self.ticks:
+            return {}
+        present = self.present[tick]
+        return {product: self.orders(tick, product) for pid, product in enumerate(self.products) if present[pid]}
+
+    def _side(self, prices: np.ndarray, volumes: np.ndarray) -> Dict[int, int]:
+        return _build_side(prices.tolist(), volumes.tolist(), self.skip_empty)
+
+
+def _build_side(prices: List[int], volumes: List[int], skip_empty: bool) -> Dict[int, int]:
+    orders = {}  # price:quantity
+    for price, volume in zip(prices, volumes):
+        if volume > 0 or not skip_empty:
+            orders[price] = volume
+    return orders
+
+
+def _value_dtype(df: "pd.DataFrame") -> np.dtype:
+    """
+    Use int32 for integer prices and volumes that fit in it, float64 otherwise.
+    """
+    import pandas as pd
+
+    if all(pd.api.types.is_integer_dtype(dtype) for dtype in df.dtypes):
+        info = np.iinfo(np.int32)
+        if df.empty or (df.min().min() >= info.min and df.max().max() <= info.max):
+            return np.dtype(np.int32)
+        return np.dtype(np.int64)
+    return np.dtype(np.float64)
+
+
+def index_orders(df: "pd.DataFrame", products: List[str]) -> MarketData:
+    """
+    Index market data so orderbooks can be looked up per tick.
+
+    :param df: Dataframe containing market data.
+    :param products: Products to index.
+    """
+    return MarketData(df, products, levels=3)
+
+
+def index_bot_orders(df: "pd.DataFrame", products: List[str]) -> MarketData:
+    """
+    Index bot order data so bot orders can be looked up per tick.
+
+    :param df: Dataframe containing bot order data.
+    :param products: Products to index.
+    """
+    return MarketData(df, products, levels=1, skip_empty=True)
+
+
+def replay_round(market_data: MarketData, bot_data: MarketData, start_tick: int = 1,
+                 end_tick: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Dict], Dict[str, Dict]]]:
+    """
+    Yield the tick, orderbooks and bot orders for every tick of an indexed round.
+
+    Every product must have market data on every tick. Products without bot
+    rows at a tick get no bot orders.
+
+    :param market_data: Indexed market data for the round.
+    :param bot_data: Indexed bot orders for the round.
+    :param start_tick: First tick to yield. It may be one past the last tick,
+        as when resuming a run that finished, but no later.
+    :param end_tick: Tick to stop before, defaults to the end of the data.
+    :raises ValueError: If start_tick is further past the end of the data.
+    """
+    if start_tick > market_data.ticks:
+        raise ValueError(f"start_tick {start_tick} is past the last tick {market_data.ticks - 1} of the round")
+    end = market_data.ticks if end_tick is None else min(end_tick, market_data.ticks)
+    for tick in range(start_tick, end):
+        yield tick, market_data.orderbook(tick), bot_data.orderbook(tick, missing_ok=True)
+
+
+def stream_orders(file_path: str, levels: int, skip_empty: bool = False,
+                  chunksize: int = 10000) -> Iterator[Tuple[int, Dict[str, Dict]]]:
+    """
+    Read a market or bot orders CSV in chunks and yield the orderbooks of each tick.
+
+    Only one chunk is held in memory at a time. Rows must be sorted by timestamp.
+
+    :param file_path: File path of the CSV.
+    :param levels: Number of price levels per side in the file.
+    :param skip_empty: Leave out price levels with zero volume.
+    :param chunksize: Number of rows to read at a time.
+    """
+    import pandas as pd
+
+    bid_prices = [f"bid_price_{i + 1}" for i in range(levels)]
+    bid_volumes = [f"bid_volume_{i + 1}" for i in range(levels)]
+    ask_prices = [f"ask_price_{i + 1}" for i in range(levels)]
+    ask_volumes = [f"ask_volume_{i + 1}" for i in range(levels)]
+
+    current_tick = None
+    orderbook: Dict[str, Dict] = {}
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        ticks = (chunk["timestamp"] // 100).tolist()
+        products = chunk["product"].tolist()
+        rows = zip(ticks, products, chunk[bid_prices].to_numpy().tolist(), chunk[bid_volumes].to_numpy().tolist(),
+                   chunk[ask_prices].to_numpy().tolist(), chunk[ask_volumes].to_numpy().tolist())
+        for tick, product, bid_price, bid_volume, ask_price, ask_volume in rows:
+            if tick != current_tick:
+                if current_tick is not None:
+                    if tick < current_tick:
+                        raise ValueError(f"{file_path} is not sorted by timestamp at tick {tick}")
+                    yield current_tick, orderbook
+                current_tick, orderbook = tick, {}
+            # keep the first row per (timestamp, product), as extract_orders does
+            if product not in orderbook:
+                orderbook[product] = {"BUY": _build_side(bid_price, bid_volume, skip_empty),
+                                      "SELL": _build_side(ask_price, ask_volume, skip_empty)}
+    if current_tick is not None:
+        yield current_tick, orderbook
+
+
+def stream_round(file_path: str, chunksize: int = 10000, start_tick: int = 1,
+                 end_tick: Optional[int] = None) -> Tuple[List[str], Iterator[Tuple[int, Dict[str, Dict], Dict[str, Dict]]]]:
+    """
+    Stream a round from its CSVs chunk by chunk, in the same form as replay_round.
+
+    Memory use does not grow with the length of the files. The products are
+    taken from the first tick of market data. As with replay_round, every
+    product must have market data on every tick, products without bot rows
+    at a tick get no bot orders, and start_tick may be one past the last tick
+    but no later.
+
+    :param file_path: File path of CSV containing market data.
+    :param chunksize: Number of rows to read at a time.
+    :param start_tick: First tick to yield.
+    :param end_tick: Tick to stop before, defaults to the end of the data.
+    :raises ValueError: If the market data CSV has no rows. A start_tick
+        further past the end of the data raises once the ticks are iterated.
+    """
+    market = stream_orders(file_path, levels=3, chunksize=chunksize)
+    bots = stream_orders(file_path[:-4] + "_bots.csv", levels=1, skip_empty=True, chunksize=chunksize)
+
+    first = next(market, None)
+    if first is None:
+        raise ValueError(f"{file_path} has no market data")
+    first_tick, first_orderbook = first
+    products = list(first_orderbook)
+
+    def ticks() -> Iterator[Tuple[int, Dict[str, Dict], Dict[str, Dict]]]:
+        bot_tick, bot_orders = next(bots, (None, {}))
+        last_tick = first_tick
+        for tick, orderbook in itertools.chain([first], market):
+            last_tick = tick
+            if end_tick is not None and tick >= end_tick:
+                return
+            while bot_tick is not None and bot_tick < tick:
+                bot_tick, bot_orders = next(bots, (None, {}))
+            if tick < start_tick:
+                continue
+            missing = [product for product in products if product not in orderbook]
+            if missing:
+                raise KeyError(f"No data for {missing[0]} at tick {tick}")
+            yield tick, orderbook, bot_orders if bot_tick == tick else {}
+        if start_tick > last_tick + 1:
+            raise ValueError(f"start_tick {start_tick} is past the last tick {last_tick} of {file_path}")
+
+    return products, ticks()
+
+
+CACHE_VERSION = 1
+
+
+def file_digest(file_path: str) -> str:
+    """
+    SHA-256 hex digest of a file's contents.
+
+    :param file_path: File to hash.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_round(file_path: str, cache_dir: Optional[str] = None, use_cache: bool = True) -> Tuple[List[str], MarketData, MarketData]:
+    """
+    Load the indexed market and bot orders for a round through a binary cache.
+
+    The first load parses the CSVs and writes the indexed arrays as .npy files
+    to a cache directory keyed on the hashes of both CSVs, so editing either
+    file invalidates the cache. Later loads memory-map those files, so
+    processes loading the same round share its pages.
+
+    :param file_path: File path of CSV containing market data.
+    :param cache_dir: Where to keep cached rounds, defaults to ``.round_cache``
+        next to the CSV.
+    :param use_cache: Set to False to always parse the CSVs.
+    """
+    bot_path = file_path[:-4] + "_bots.csv"
+    if not use_cache:
+        products, _, df, bot_df = read_round(file_path)
+        return products, index_orders(df, products), index_bot_orders(bot_df, products)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), ".round_cache")
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    key = hashlib.sha256(
+        f"{CACHE_VERSION}:{file_digest(file_path)}:{file_digest(bot_path)}".encode()
+    ).hexdigest()[:16]
+    round_dir = os.path.join(cache_dir, f"{stem}-{key}")
+
+    if not os.path.isdir(round_dir):
+        products, _, df, bot_df = read_round(file_path)
+        _write_round_cache(round_dir, products, index_orders(df, products), index_bot_orders(bot_df, products))
+
+    with open(os.path.join(round_dir, "meta.json")) as f:
+        products = json.load(f)["products"]
+    market_data = MarketData.load(round_dir, "market", products)
+    bot_data = MarketData.load(round_dir, "bots", products, skip_empty=True)
+    return products, market_data, bot_data
+
+
+def _write_round_cache(round_dir: str, products: List[str], market_data: MarketData, bot_data: MarketData) -> None:
+    cache_dir, name = os.path.split(round_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary directory and rename it into place so that
+    # concurrent loaders never see a partly written cache
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=f".{name}-")
+    try:
+        market_data.save(tmp_dir, "market")
+        bot_data.save(tmp_dir, "bots")
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({"version": CACHE_VERSION, "products": products}, f)
+        os.rename(tmp_dir, round_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(round_dir):
+            raise
+        return
+
+    # Remove caches of earlier versions of the same round
+    stem = name.rsplit("-", 1)[0]
+    for entry in os.listdir(cache_dir):
+        if entry != name and entry.rsplit("-", 1)[0] == stem:
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+
+class SharedRound:
+    """
+    A round's indexed market and bot arrays published in one shared memory
+    block, so worker processes can attach zero-copy views of it instead of
+    each holding their own copy.
+
+    Create it in the parent process and pass ``spec`` to the workers, which
+    call attach_round with it. Workers must be started with multiprocessing
+    by the process that published the round. The block is freed by close, or
+    on leaving a with block, once the workers are done.
+    """
+    # Start every array on a cache line
+    ALIGN = 64
+
+    def __init__(self, products: List[str], market_data: MarketData, bot_data: MarketData) -> None:
+        """
+        :param products: Products in product id order.
+        :param market_data: Indexed market data for the round.
+        :param bot_data: Indexed bot orders for the round.
+        """
+        arrays = {
+            f"{prefix}_{name}": np.asarray(getattr(data, name))
+            for prefix, data in (("market", market_data), ("bots", bot_data))
+            for name in MarketData.ARRAYS
+        }
+        layout = []
+        size = 0
+        for key, array in arrays.items():
+            offset = -(-size // self.ALIGN) * self.ALIGN
+            layout.append((key, array.dtype.str, array.shape, offset))
+            size = offset + array.nbytes
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            for (_, dtype, shape, offset), array in zip(layout, arrays.values()):
+                np.ndarray(shape, dtype, buffer=self._shm.buf, offset=offset)[...] = array
+        except BaseException:
+            # Nothing else holds the block yet, so free it here
+            self.close()
+            raise
+        # Everything a worker needs to attach, small enough to pickle per task
+        self.spec = {"name": self._shm.name, "products": list(products), "layout": layout}
+
+    @classmethod
+    def publish(cls, file_path: str, use_cache: bool = True) -> "SharedRound":
+        """
+        Load a round with load_round and publish it.
+
+        :param file_path: File path of CSV containing market data.
+        :param use_cache: Load the round through the binary cache.
+        """
+        return cls(*load_round(file_path, use_cache=use_cache))
+
+    @property
+    def nbytes(self) -> int:
+        return self._shm.size
+
+    def close(self) -> None:
+        """
+        Free the shared memory block. Views attached to it must not be used
+        afterwards.
+        """
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedRound":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Shared memory blocks attached by this process, kept open for its lifetime
+# as the arrays returned by attach_round point into them
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def attach_round(spec: Dict[str, Any]) -> Tuple[List[str], MarketData, MarketData]:
+    """
+    Attach to a round published by SharedRound and return the same products
+    and market and bot data as load_round, backed by read-only views of the
+    shared memory block.
+
+    :param spec: SharedRound.spec from the publishing process.
+    """
+    shm = _attached.get(spec["name"])
+    if shm is None:
+        try:
+            # The publisher owns the block, so the worker must not track it
+            shm = shared_memory.SharedMemory(name=spec["name"], track=False)
+        except TypeError:
+            # Before Python 3.13 workers share the publisher's resource tracker
+            shm = shared_memory.SharedMemory(name=spec["name"])
+        _attached[spec["name"]] = shm
+
+    views = {}
+    for key, dtype, shape, offset in spec["layout"]:
+        view = np.ndarray(tuple(shape), np.dtype(dtype), buffer=shm.buf, offset=offset)
+        view.flags.writeable = False
+        views[key] = view
+    products = spec["products"]
+    market_data = MarketData.from_arrays(
+        products, {name: views[f"market_{name}"] for name in MarketData.ARRAYS}
+    )
+    bot_data = MarketData.from_arrays(
+        products, {name: views[f"bots_{name}"] for name in MarketData.ARRAYS}, skip_empty=True
+    )
+    return products, market_data, bot_data
@@ -1,9 +1,666 @@
-from typing import Dict, List
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+class RestingOrder:
+    """
+    An order resting in an orderbook, with the quantity still unfilled.
+
+    Levels loaded from a market data snapshot are owned by "book" and have no
+    order id, as each stands for the unknown orders at that price.
+    """
+    __slots__ = ("order_id", "owner", "side", "price", "quantity")
+
+    def __init__(self, order_id: Optional[int], owner: str, side: str, price: int, quantity: int) -> None:
+        self.order_id = order_id
+        self.owner = owner
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+
+    def __repr__(self) -> str:
+        return f"RestingOrder({self.order_id}, {self.owner}, {self.side}, price={self.price}, quantity={self.quantity})"
+
+
+class Fill(NamedTuple):
+    """
+    A trade between an incoming order and a resting order, at the resting
+    order's price.
+    """
+    price: int
+    # Quantity traded, positive
+    quantity: int
+    # Side of the incoming order
+    side: str
+    # Owner of the incoming order
+    aggressor: str
+    # Owner and id of the resting order
+    owner: str
+    order_id: Optional[int]
+
+
+# Builds a Fill without the Python-level NamedTuple __new__, for the matching loop
+_new_fill = tuple.__new__
+
+
+class BookSide(Mapping):
+    """
+    One side of an orderbook, read like a dict of {price: quantity}.
+
+    Each price level holds a FIFO queue of resting orders and the quantity
+    is their total. A level loaded from a snapshot is a single "book" order,
+    only turned into a queue once another order joins it. Price levels are
+    kept sorted so the best price (highest bid, lowest ask) is available in
+    O(1) and iteration runs from the best price outwards. Levels are removed
+    once they are filled down to zero.
+    """
+    __slots__ = ("side", "_sign", "_quantity", "_keys", "_queues")
+
+    def __init__(self, side: str, orders: Optional[Dict[int, int]] = None) -> None:
+        """
+        :param side: BUY or SELL.
+        :param orders: Snapshot of {price: quantity} to load as "book" orders.
+        """
+        if side not in ("BUY", "SELL"):
+            raise ValueError(f"side must be BUY or SELL, got {side!r}")
+        self.side = side
+        # Levels are stored by key ascending with the best price last, where the
+        # key is the price for bids and the negated price for asks
+        self._sign = 1 if side == "BUY" else -1
+        self._quantity: Dict[int, int] = dict(orders) if orders else {}
+        # Queues of the levels with more than the snapshot order. They are
+        # short, so lists beat deques here
+        self._queues: Dict[int, List[RestingOrder]] = {}
+        self._keys: List[int] = sorted(self._sign * price for price in self._quantity)
+
+    def __getitem__(self, price: int) -> int:
+        return self._quantity[price]
+
+    def __contains__(self, price) -> bool:
+        return price in self._quantity
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[int]:
+        # The level just yielded may be filled and removed before iteration resumes
+        i = len(self._keys) - 1
+        while i >= 0:
+            yield self._sign * self._keys[i]
+            i = min(i, len(self._keys)) - 1
+
+    def __repr__(self) -> str:
+        return f"BookSide({self.side}, {dict(self.items())})"
+
+    def best_price(self) -> Optional[int]:
+        return self._sign * self._keys[-1] if self._keys else None
+
+    def best_market_price(self) -> Optional[int]:
+        """
+        Best price of a level with "book" orders, skipping levels that only
+        hold other owners' orders.
+        """
+        keys = self._keys
+        for i in range(len(keys) - 1, -1, -1):
+            price = self._sign * keys[i]
+            queue = self._queues.get(price)
+            if queue is None or any(order.owner == "book" for order in queue):
+                return price
+        return None
+
+    def queue(self, price: int) -> Iterator[RestingOrder]:
+        """
+        Iterate the unfilled orders at a price level in time priority.
+
+        :param price: Price of the level.
+        """
+        if price not in self._quantity:
+            return iter(())
+        return (order for order in self._queue(price) if order.quantity > 0)
+
+    def _queue(self, price: int) -> List[RestingOrder]:
+        queue = self._queues.get(price)
+        if queue is None:
+            queue = self._queues[price] = [RestingOrder(None, "book", self.side, price, self._quantity[price])]
+        return queue
+
+    def add(self, price: int, quantity: int, owner: str = "book", order_id: Optional[int] = None) -> RestingOrder:
+        """
+        Add an order to the back of the queue at a price level, creating the
+        level if needed.
+
+        :param price: Price of the level.
+        :param quantity: Quantity to add.
+        :param owner: Owner of the order.
+        :param order_id: Id of the order, if it can be cancelled.
+        """
+        order = RestingOrder(order_id, owner, self.side, price, quantity)
+        if price in self._quantity:
+            self._queue(price).append(order)
+            self._quantity[price] += quantity
+        else:
+            self._quantity[price] = quantity
+            self._queues[price] = [order]
+            insort(self._keys, self._sign * price)
+        return order
+
+    def fill(self, price: int, quantity: int) -> None:
+        """
+        Take quantity from a price level in time priority, removing the level
+        if it is emptied.
+
+        :param price: Price of the level.
+        :param quantity: Quantity to take.
+        """
+        for order in list(self.queue(price)):
+            if quantity <= 0:
+                return
+            amount = min(quantity, order.quantity)
+            quantity -= amount
+            self.take(order, amount)
+
+    def take(self, order: RestingOrder, quantity: int) -> None:
+        """
+        Fill part of a resting order, removing its level if it is emptied.
+        Filled orders are dropped from the queue once they reach its front.
+
+        :param order: Order in this side.
+        :param quantity: Quantity to fill.
+        """
+        order.quantity -= quantity
+        price = order.price
+        remaining = self._quantity[price] - quantity
+        if remaining > 0:
+            self._quantity[price] = remaining
+            queue = self._queues[price]
+            while queue and queue[0].quantity <= 0:
+                del queue[0]
+        else:
+            self._remove_level(price)
+
+    def remove(self, order: RestingOrder) -> None:
+        """
+        Cancel the unfilled quantity of a resting order.
+
+        :param order: Order in this side.
+        """
+        if order.quantity > 0:
+            self.take(order, order.quantity)
+
+    def load_snapshot(self, orders: Dict[int, int]) -> None:
+        """
+        Replace the "book" orders with a new snapshot of {price: quantity},
+        keeping every other order and its place in its queue.
+
+        :param orders: Snapshot of {price: quantity}.
+        """
+        if not self._queues:
+            # Only snapshot levels, so the new snapshot replaces them outright
+            if self._quantity.keys() != orders.keys():
+                self._keys = sorted(self._sign * price for price in orders)
+            self._quantity = dict(orders)
+            return
+        # Plain snapshot levels are set directly, only queues need set_book_quantity
+        quantities = self._quantity
+        queues = self._queues
+        for price in [price for price in quantities if price not in orders]:
+            if price in queues:
+                self.set_book_quantity(price, None)
+            else:
+                self._remove_level(price)
+        for price, quantity in orders.items():
+            if price in queues:
+                self.set_book_quantity(price, quantity)
+            elif price in quantities:
+                quantities[price] = quantity
+            else:
+                quantities[price] = quantity
+                insort(self._keys, self._sign * price)
+
+    def set_book_quantity(self, price: int, quantity: Optional[int]) -> None:
+        """
+        Set the "book" quantity at a price level, keeping the other orders
+        there. Extra quantity joins the back of the queue, and quantity taken
+        away comes off the "book" orders nearest the back.
+
+        :param price: Price of the level.
+        :param quantity: New "book" quantity, or None to take all of it and
+            remove the level if no other orders rest there.
+        """
+        if price not in self._quantity:
+            if quantity is not None:
+                self._quantity[price] = quantity
+                insort(self._keys, self._sign * price)
+            return
+        queue = self._queues.get(price)
+        if queue is None:
+            if quantity is None:
+                self._remove_level(price)
+            else:
+                self._quantity[price] = quantity
+            return
+
+        change = (quantity or 0) - sum(order.quantity for order in queue if order.owner == "book")
+        if change > 0:
+            queue.append(RestingOrder(None, "book", self.side, price, change))
+        for order in reversed(queue):
+            if change >= 0:
+                break
+            if order.owner == "book" and order.quantity > 0:
+                amount = min(order.quantity, -change)
+                order.quantity -= amount
+                change += amount
+        queue[:] = [order for order in queue if order.quantity > 0]
+        if quantity == 0 and all(order.owner != "book" for order in queue):
+            # Keeps an empty snapshot level marked as a market level
+            queue.append(RestingOrder(None, "book", self.side, price, 0))
+
+        if all(order.owner == "book" for order in queue):
+            # Back to a plain snapshot level
+            del self._queues[price]
+            if quantity is None:
+                self._remove_level(price)
+            else:
+                self._quantity[price] = quantity
+        else:
+            self._quantity[price] = sum(order.quantity for order in queue)
+
+    def _remove_level(self, price: int) -> None:
+        del self._quantity[price]
+        self._queues.pop(price, None)
+        key = self._sign * price
+        if self._keys[-1] == key:
+            self._keys.pop()
+        else:
+            del self._keys[bisect_left(self._keys, key)]
+
+    def copy(self) -> "BookSide":
+        side = BookSide.__new__(BookSide)
+        side.side = self.side
+        side._sign = self._sign
+        side._quantity = self._quantity.copy()
+        side._queues = {
+            price: [RestingOrder(order.order_id, order.owner, order.side, order.price, order.quantity)
+                    for order in queue]
+            for price, queue in self._queues.items()
+        }
+        side._keys = self._keys.copy()
+        return side
+
+
+class OrderBook(Mapping):
+    """
+    The bids and asks for a product, read like {"BUY": {...}, "SELL": {...}}.
+
+    Incoming orders are matched by execute against the other side, best price
+    first and in time order within a price, and orders left resting by
+    submit get an id they can be cancelled by.
+    """
+    __slots__ = ("buy_orders", "sell_orders", "_orders", "_next_id")
+
+    def __init__(self, buy_orders: Optional[Dict[int, int]] = None, sell_orders: Optional[Dict[int, int]] = None) -> None:
+        self.buy_orders = BookSide("BUY", buy_orders)
+        self.sell_orders = BookSide("SELL", sell_orders)
+        self._orders: Dict[int, RestingOrder] = {}
+        self._next_id = 1
+
+    def __getitem__(self, side: str) -> BookSide:
+        if side == "BUY":
+            return self.buy_orders
+        if side == "SELL":
+            return self.sell_orders
+        raise KeyError(side)
+
+    def __len__(self) -> int:
+        return 2
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("BUY", "SELL"))
+
+    def __repr__(self) -> str:
+        return f"OrderBook(BUY={dict(self.buy_orders.items())}, SELL={dict(self.sell_orders.items())})"
+
+    def mid_price(self) -> float:
+        return (self.buy_orders.best_price() + self.sell_orders.best_price()) / 2
+
+    def market_top(self) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Best bid and ask of the "book" orders, leaving out levels that only
+        hold resting orders of other owners. None for an empty side.
+        """
+        return self.buy_orders.best_market_price(), self.sell_orders.best_market_price()
+
+    def market_mid_price(self) -> float:
+        """
+        Mid price of the "book" orders, leaving out levels that only hold
+        resting orders of other owners.
+        """
+        bid, ask = self.market_top()
+        return (bid + ask) / 2
+
+    def load_snapshot(self, buy_orders: Dict[int, int], sell_orders: Dict[int, int]) -> None:
+        """
+        Carry the book over to a new market data snapshot. The "book" orders
+        are replaced by the snapshot and submitted orders keep their place.
+
+        :param buy_orders: Snapshot of bids as {price: quantity}.
+        :param sell_orders: Snapshot of asks as {price: quantity}.
+        """
+        self.buy_orders.load_snapshot(buy_orders)
+        self.sell_orders.load_snapshot(sell_orders)
+
+    def submit(self, side: str, price: int, quantity: int, owner: str) -> RestingOrder:
+        """
+        Rest an order at the back of its price level without matching it.
+
+        :param side: BUY or SELL.
+        :param price: Limit price.
+        :param quantity: Quantity, positive.
+        :param owner: Owner of the order.
+        :return: The resting order, with its id.
+        """
+        order_id = self._next_id
+        self._next_id += 1
+        order = self[side].add(price, quantity, owner, order_id)
+        self._orders[order_id] = order
+        return order
+
+    def cancel(self, order_id: int) -> bool:
+        """
+        Cancel what is left of a resting order.
+
+        :param order_id: Id from submit.
+        :return: Whether the order was still resting.
+        """
+        order = self._orders.pop(order_id, None)
+        if order is None or order.quantity <= 0:
+            return False
+        self[order.side].remove(order)
+        return True
+
+    def cancel_all(self, owner: str) -> int:
+        """
+        Cancel every resting order of an owner.
+
+        :param owner: Owner of the orders.
+        :return: Number of orders cancelled.
+        """
+        order_ids = [order.order_id for order in self._orders.values() if order.owner == owner]
+        return sum(self.cancel(order_id) for order_id in order_ids)
+
+    def resting_orders(self, owner: Optional[str] = None) -> List[RestingOrder]:
+        """
+        Copies of the submitted orders still resting, oldest first.
+
+        :param owner: Only list the orders of this owner.
+        """
+        return [
+            RestingOrder(order.order_id, order.owner, order.side, order.price, order.quantity)
+            for order in self._orders.values()
+            if order.quantity > 0 and (owner is None or order.owner == owner)
+        ]
+
+    def order(self, order_id: int) -> Optional[RestingOrder]:
+        """
+        Look up a resting order by id, or None once it is filled or cancelled.
+
+        :param order_id: Id from submit.
+        """
+        order = self._orders.get(order_id)
+        return order if order is not None and order.quantity > 0 else None
+
+    def execute(
+        self,
+        side: str,
+        price: int,
+        quantity: int,
+        owner: str,
+        room: Optional[int] = None,
+        passive_room: Optional[Dict[str, int]] = None,
+    ) -> Tuple[int, List[Fill]]:
+        """
+        Match an incoming order against the resting orders on the other side.
+        The incoming order does not rest, so the caller decides what happens
+        to the quantity left.
+
+        Resting orders of the incoming order's owner are skipped, so an owner
+        never trades with itself.
+
+        :param side: Side of the incoming order, BUY or SELL.
+        :param price: Limit price of the incoming order.
+        :param quantity: Quantity of the incoming order, positive.
+        :param owner: Owner of the incoming order.
+        :param room: Most the incoming order may fill, e.g. before a
+            position limit.
+        :param passive_room: Most the resting orders of each owner listed may
+            be filled. Updated in place.
+        :return: The unfilled quantity and the fills in the order they happened.
+        """
+        buying = side == "BUY"
+        resting_side = self.sell_orders if buying else self.buy_orders
+        # The loops below inline BookSide.take and _remove_level, as every
+        # fill in a backtest goes through them
+        quantities = resting_side._quantity
+        queues = resting_side._queues
+        keys = resting_side._keys
+        sign = resting_side._sign
+        remaining = quantity if room is None else min(quantity, room)
+        unfillable = quantity - remaining
+        fills: List[Fill] = []
+
+        j = len(keys) - 1
+        while j >= 0 and remaining > 0:
+            key = keys[j]
+            level_price = sign * key
+            if (level_price > price) if buying else (level_price < price):
+                break
+
+            level_quantity = quantities[level_price]
+            queue = queues.get(level_price)
+            if queue is None:
+                # A level still holding only its snapshot order
+                amount = min(remaining, level_quantity) if owner != "book" else 0
+                if passive_room is not None and "book" in passive_room:
+                    amount = min(amount, passive_room["book"])
+                if amount > 0:
+                    if passive_room is not None and "book" in passive_room:
+                        passive_room["book"] -= amount
+                    fills.append(_new_fill(Fill, (level_price, amount, side, owner, "book", None)))
+                    remaining -= amount
+                    level_quantity -= amount
+                queue = ()
+
+            i = 0
+            while i < len(queue) and remaining > 0:
+                resting = queue[i]
+                i += 1
+                amount = resting.quantity
+                if amount <= 0 or resting.owner == owner:
+                    continue
+                if remaining < amount:
+                    amount = remaining
+                if passive_room is not None and resting.owner in passive_room:
+                    amount = min(amount, passive_room[resting.owner])
+                    if amount <= 0:
+                        continue
+                    passive_room[resting.owner] -= amount
+
+                fills.append(_new_fill(Fill, (level_price, amount, side, owner, resting.owner, resting.order_id)))
+                remaining -= amount
+                level_quantity -= amount
+                resting.quantity -= amount
+                if resting.quantity <= 0:
+                    if resting.order_id is not None:
+                        self._orders.pop(resting.order_id, None)
+                    if i == 1:
+                        del queue[0]
+                        i = 0
+
+            if level_quantity > 0:
+                quantities[level_price] = level_quantity
+                j -= 1
+            elif level_quantity < quantities[level_price]:
+                del quantities[level_price]
+                queues.pop(level_price, None)
+                # Only the skipped levels above j move down
+                del keys[j]
+                j -= 1
+            else:
+                # An empty level, as loaded from a snapshot
+                j -= 1
+
+        remaining += unfillable
+        return remaining, fills
+
+    def copy(self) -> "OrderBook":
+        book = OrderBook.__new__(OrderBook)
+        book.buy_orders = self.buy_orders.copy()
+        book.sell_orders = self.sell_orders.copy()
+        book._orders = {
+            order.order_id: order
+            for side in (book.buy_orders, book.sell_orders)
+            for queue in side._queues.values()
+            for order in queue
+            if order.order_id is not None and order.quantity > 0
+        }
+        book._next_id = self._next_id
+        return book
+
+
+class BookSideView(Mapping):
+    """
+    A read-only view of a BookSide, for handing the engine's books to
+    Trader.run without copying them. It reads like the BookSide but has none
+    of its methods that change the book, and queue hands out copies of the
+    resting orders.
+    """
+    __slots__ = ("_side",)
+
+    def __init__(self, side: BookSide) -> None:
+        self._side = side
+
+    @property
+    def side(self) -> str:
+        return self._side.side
+
+    def __getitem__(self, price: int) -> int:
+        return self._side._quantity[price]
+
+    def __contains__(self, price) -> bool:
+        return price in self._side._quantity
+
+    def __len__(self) -> int:
+        return len(self._side._keys)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._side)
+
+    def __repr__(self) -> str:
+        return f"BookSideView({self.side}, {dict(self.items())})"
+
+    def best_price(self) -> Optional[int]:
+        return self._side.best_price()
+
+    def best_market_price(self) -> Optional[int]:
+        return self._side.best_market_price()
+
+    def queue(self, price: int) -> Iterator[RestingOrder]:
+        """
+        Iterate copies of the unfilled orders at a price level in time priority.
+
+        :param price: Price of the level.
+        """
+        return (RestingOrder(order.order_id, order.owner, order.side, order.price, order.quantity)
+                for order in self._side.queue(price))
+
+
+class OrderBookView(Mapping):
+    """
+    A read-only view of an OrderBook, read like {"BUY": {...}, "SELL": {...}}
+    with each side a BookSideView. Orders cannot be submitted, executed or
+    cancelled through it.
+    """
+    __slots__ = ("buy_orders", "sell_orders", "_book")
+
+    def __init__(self, book: OrderBook) -> None:
+        self._book = book
+        self.buy_orders = BookSideView(book.buy_orders)
+        self.sell_orders = BookSideView(book.sell_orders)
+
+    def __getitem__(self, side: str) -> BookSideView:
+        if side == "BUY":
+            return self.buy_orders
+        if side == "SELL":
+            return self.sell_orders
+        raise KeyError(side)
+
+    def __len__(self) -> int:
+        return 2
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("BUY", "SELL"))
+
+    def __repr__(self) -> str:
+        return f"OrderBookView(BUY={dict(self.buy_orders.items())}, SELL={dict(self.sell_orders.items())})"
+
+    def mid_price(self) -> float:
+        return self._book.mid_price()
+
+    def market_top(self) -> Tuple[Optional[int], Optional[int]]:
+        return self._book.market_top()
+
+    def market_mid_price(self) -> float:
+        return self._book.market_mid_price()
+
+    def resting_orders(self, owner: Optional[str] = None) -> List[RestingOrder]:
+        return self._book.resting_orders(owner)
+
+    def order(self, order_id: int) -> Optional[RestingOrder]:
+        """
+        Copy of a resting order by id, or None once it is filled or cancelled.
+
+        :param order_id: Id from submit.
+        """
+        order = self._book.order(order_id)
+        if order is None:
+            return None
+        return RestingOrder(order.order_id, order.owner, order.side, order.price, order.quantity)
+
+
+class OrderBookViews(Mapping):
+    """
+    A read-only {product: OrderBookView} over the engine's {product: OrderBook}.
+    Views are made when a product is looked up, so products the algo does
+    not read cost nothing.
+    """
+    __slots__ = ("_books",)
+
+    def __init__(self, books: Mapping[str, OrderBook]) -> None:
+        self._books = books
+
+    def __getitem__(self, product: str) -> OrderBookView:
+        return OrderBookView(self._books[product])
+
+    def __contains__(self, product) -> bool:
+        return product in self._books
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._books)
+
+    def __repr__(self) -> str:
+        return f"OrderBookViews({dict(self.items())})"
+
 
 class Listing:
     """
     A class to represent the
     """
+    __slots__ = ("buy_orders", "sell_orders", "product")
+
     def __init__(self, orderbook: Dict[str, Dict[int, int]], product: str) -> None:
         self.buy_orders = orderbook["BUY"] #dict of {price: quantity} top is lowest price
         self.sell_orders = orderbook["SELL"] #dict of {price: quantity} top is highest price
@@ -13,6 +670,8 @@ class Order:
     """
     A class to represent an order sent to the matching engine.
     """
+    __slots__ = ("product", "price", "quantity")
+
     def __init__(self, product: str, price: int, quantity: int):
         self.product = product
         self.price = price
@@ -26,26 +685,158 @@ class Order:
     def __str__(self):
         return f"Order(product={self.product}, price={self.price}, quantity={self.quantity})"
 
+class Cancel:
+    """
+    A request, returned by Trader.run alongside orders, to cancel a resting order.
+    """
+    __slots__ = ("product", "order_id")
+
+    def __init__(self, product: str, order_id: Optional[int] = None):
+        self.product = product
+        # None cancels all of the algo's resting orders in the product
+        self.order_id = order_id
+
+    def __str__(self):
+        return f"Cancel(product={self.product}, order_id={self.order_id})"
+
+class ProductMap(Mapping):
+    """
+    A per-product list of a Portfolio, read like a dict of {product: value}.
+
+    The list is indexed by product id and shared with the portfolio, so the
+    map always shows its current values. Values of existing products can be
+    set, but products can only be added with Portfolio.add_product.
+    """
+    __slots__ = ("_ids", "_values")
+
+    def __init__(self, ids: Dict[str, int], values: List[int]) -> None:
+        self._ids = ids
+        self._values = values
+
+    def __getitem__(self, product: str) -> int:
+        return self._values[self._ids[product]]
+
+    def __setitem__(self, product: str, value: int) -> None:
+        self._values[self._ids[product]] = value
+
+    def __contains__(self, product) -> bool:
+        return product in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
 class Portfolio:
     """
     A class to represent the trader's current portfolio.
+
+    Each product is given an integer id, in the order it was added, that
+    indexes the positions and fill_counts lists. The matching engine updates
+    those lists by id, and quantity and fills read them by product name.
     """
-    def __init__(self):
+    __slots__ = ("cash", "pnl", "products", "product_ids", "positions", "fill_counts",
+                 "quantity", "fills", "on_fill")
+
+    def __init__(self, products: Iterable[str] = ()):
         self.cash: float = 0
-        self.quantity: Dict[str, int] = {}
         self.pnl: float = 0
+        self.products: List[str] = []
+        self.product_ids: Dict[str, int] = {}
+        self.positions: List[int] = []
+        self.fill_counts: List[int] = []
+        self.quantity = ProductMap(self.product_ids, self.positions)
+        self.fills = ProductMap(self.product_ids, self.fill_counts)
+        # Called as on_fill(product, price, quantity, counterparty) after every fill
+        self.on_fill: Optional[Callable[[str, int, int, str], None]] = None
+        for product in products:
+            self.add_product(product)
+
+    def add_product(self, product: str) -> int:
+        """
+        Start tracking a product with no position or fills.
+
+        :param product: Product to add.
+        :return: The product's id.
+        """
+        if product in self.product_ids:
+            raise ValueError(f"{product!r} is already in the portfolio")
+        product_id = self.product_ids[product] = len(self.products)
+        self.products.append(product)
+        self.positions.append(0)
+        self.fill_counts.append(0)
+        return product_id
+
+    def record_fill(self, product: str, price: int, quantity: int, counterparty: str) -> None:
+        """
+        Update the portfolio for a fill.
+
+        :param product: Product traded.
+        :param price: Price of the fill.
+        :param quantity: Quantity bought, negative when selling.
+        :param counterparty: "book" for fills against the orderbook, "bot" for
+            bot orders filling resting algo orders.
+        """
+        self.record_fill_id(self.product_ids[product], price, quantity, counterparty)
+
+    def record_fill_id(self, product_id: int, price: int, quantity: int, counterparty: str) -> None:
+        """
+        Update the portfolio for a fill of the product with the given id.
+        """
+        self.positions[product_id] += quantity
+        self.cash -= quantity * price
+        self.fill_counts[product_id] += 1
+        if self.on_fill is not None:
+            self.on_fill(self.products[product_id], price, quantity, counterparty)
 
     def __str__(self):
-        return f"Portfolio(cash={self.cash}, quantity={self.quantity}, pnl={self.pnl})"
+        return f"Portfolio(cash={self.cash}, quantity={self.quantity}, pnl={self.pnl}, fills={self.fills})"
 
 class State:
     """
     A class to represent the state of the market and the trader's portfolio.
     """
-    def __init__(self, orderbook: Dict[str, Dict[int, int]], positions: Dict[str, int], products: List[str], pos_limit: int):
+    __slots__ = ("orderbook", "positions", "products", "pos_limit", "tick", "open_orders", "history", "indicators")
+
+    def __init__(self, orderbook: Dict[str, Dict[int, int]], positions: Dict[str, int], products: List[str], pos_limit: int,
+                 tick: int = 0, open_orders: Optional[Dict[str, List[RestingOrder]]] = None, history=None,
+                 indicators=None):
         self.orderbook = orderbook
         self.positions = positions
         self.products = products
         self.pos_limit = pos_limit
+        # Row of the current tick in the arrays passed to Trader.precompute
+        self.tick = tick
+        # Copies of the algo's orders still resting from earlier ticks, when
+        # orders persist across ticks
+        self.open_orders = open_orders if open_orders is not None else {}
+        # history.History of recent ticks, if the Trader has a history_size
+        self.history = history
+        # indicators.IndicatorSet of the Trader's registered indicators, if any
+        self.indicators = indicators
+
+    def public_view(self) -> "State":
+        """
+        Create a view of this state to hand to Trader.run without copying it.
+
+        The orderbooks are handed out as OrderBookViews, which have no
+        methods that change the book, and the position and limit dicts are
+        wrapped in MappingProxyType. The products are passed as a tuple, so
+        the engine's list cannot be changed. The history and indicators only
+        hand out read-only views.
+        """
+        return State(OrderBookViews(self.orderbook), MappingProxyType(self.positions),
+                     tuple(self.products), MappingProxyType(self.pos_limit), self.tick,
+                     MappingProxyType(self.open_orders), self.history, self.indicators)
+
+
+class StateMutationError(RuntimeError):
+    """
+    Raised in debug mode when Trader.run modifies the state it was given.
+    """
 
 
@@ -0,0 +1,85 @@
+"""
+The strategy of examplealgo.py for sweep.py --batch, which runs many
+parameter sets through batch.py at once. Keep it in step with
+examplealgo.Trader when changing either one.
+"""
+import numpy as np
+
+from examplealgo import Trader
+
+
+class BatchTrader:
+    """
+    The same strategy for many parameter sets at once, for sweep.py --batch.
+    Every parameter holds one value per simulation.
+    """
+    def __init__(self, n):
+        # Start every simulation from the scalar Trader's parameters
+        defaults = Trader()
+        self.products = defaults.products
+
+        self.parity_const = np.full(n, defaults.parity_const)
+        self.parity_threshold = np.full(n, defaults.parity_threshold)
+
+        self.delta_call = np.full(n, defaults.delta_call)
+        self.delta_put = np.full(n, defaults.delta_put)
+
+        self.hedge_threshold = np.full(n, defaults.hedge_threshold)
+        self.hedge_unit = np.full(n, defaults.hedge_unit)
+
+        self.soft_limit = np.full(n, defaults.soft_limit)
+        self.hard_limit = np.full(n, defaults.hard_limit)
+
+    def run(self, state):
+        call, put, under = (state.products.index(p) for p in self.products)
+        mids, bids, asks = state.mid, state.best_bid, state.best_ask
+        pos = state.positions
+        n = len(pos)
+        # Call and Put get one order, Underlying an arbitrage and a hedge order
+        prices = np.zeros((n, len(state.products), 2), dtype=np.int64)
+        quantities = np.zeros_like(prices)
+
+        # ======================================================
+        # Parity Arbitrage
+        # ======================================================
+        parity_error = mids[call] - mids[put] - mids[under] + self.parity_const
+        over_soft = (np.abs(pos[:, [call, put, under]]) > self.soft_limit[:, None]).any(axis=1)
+        arb_size = np.where(over_soft, 1, 2)
+        hard = self.hard_limit
+
+        sell_call = (
+            (parity_error > self.parity_threshold)
+            & (pos[:, call] - arb_size >= -hard)
+            & (pos[:, put] + arb_size <= hard)
+            & (pos[:, under] + arb_size <= hard)
+        )
+        buy_call = (
+            ~(parity_error > self.parity_threshold)
+            & (parity_error < -self.parity_threshold)
+            & (pos[:, call] + arb_size <= hard)
+            & (pos[:, put] - arb_size >= -hard)
+            & (pos[:, under] - arb_size >= -hard)
+        )
+        for product, sell_price, buy_price, sign in (
+            (call, bids[call], asks[call], -1),
+            (put, asks[put], bids[put], 1),
+            (under, asks[under], bids[under], 1),
+        ):
+            prices[:, product, 0] = np.where(sell_call, sell_price, buy_price)
+            quantities[:, product, 0] = np.where(sell_call, sign * arb_size, np.where(buy_call, -sign * arb_size, 0))
+
+        # ======================================================
+        # Delta Hedging
+        # ======================================================
+        option_delta = pos[:, call] * self.delta_call + pos[:, put] * self.delta_put
+        net_delta = option_delta - pos[:, under]
+        hedge_sell = net_delta > self.hedge_threshold
+        hedge_buy = ~hedge_sell & (net_delta < -self.hedge_threshold)
+        prices[:, under, 1] = np.where(hedge_sell, bids[under], asks[under])
+        quantities[:, under, 1] = np.where(
+            hedge_sell,
+            -np.minimum(self.hedge_unit, hard - pos[:, under]),
+            np.where(hedge_buy, np.minimum(self.hedge_unit, hard + pos[:, under]), 0),
+        )
+
+        return prices, quantities
@@ -0,0 +1,132 @@
+"""
+Rolling history of recent ticks for Trader.run.
+
+A Trader that sets a ``history_size`` attribute gets ``state.history``, which
+holds the best bid, best ask, mid price and the algo's position of every
+product over the last history_size ticks, with the current tick last.
+"""
+from typing import List, Mapping, Optional
+
+import numpy as np
+
+from datamodel import OrderBook
+
+
+class History:
+    """
+    Fixed-capacity ring buffers of the best bid, best ask, mid price and
+    position of every product, one row per tick.
+
+    Every row is written twice, capacity rows apart, so the last n rows are
+    always one contiguous slice and reads return views instead of copies.
+    Views are read-only and show the buffer as it is, so later ticks
+    overwrite them once the buffer wraps. Copy a view to keep it.
+    """
+    __slots__ = ("products", "product_ids", "capacity", "_ticks", "_prices", "_positions", "_next", "_size")
+
+    # Rows of the price buffer
+    PRICES = ("best_bid", "best_ask", "mid")
+    FIELDS = PRICES + ("position",)
+
+    def __init__(self, products: List[str], capacity: int) -> None:
+        """
+        :param products: Products to record, in column order.
+        :param capacity: Number of ticks to keep.
+        """
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.products = list(products)
+        self.product_ids = {product: i for i, product in enumerate(self.products)}
+        self.capacity = capacity
+        self._ticks = np.zeros(2 * capacity, dtype=np.int64)
+        self._prices = np.full((len(self.PRICES), 2 * capacity, len(self.products)), np.nan)
+        self._positions = np.zeros((2 * capacity, len(self.products)), dtype=np.int64)
+        # Slot the next tick is written to, and the number of ticks held
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def record(self, tick: int, orderbook: Mapping[str, OrderBook], positions: List[int]) -> None:
+        """
+        Add a tick, overwriting the oldest once the buffer is full.
+
+        :param tick: Tick number.
+        :param orderbook: Orderbooks of the tick. Products without one are NaN.
+        :param positions: Position of each product, in column order.
+        """
+        row = self._prices[:, self._next]
+        for i, product in enumerate(self.products):
+            book = orderbook.get(product)
+            if book is None:
+                row[:, i] = np.nan
+                continue
+            bid, ask = book.market_top()
+            row[0, i] = np.nan if bid is None else bid
+            row[1, i] = np.nan if ask is None else ask
+        row[2] = (row[0] + row[1]) / 2
+        self._positions[self._next] = positions
+
+        i, j = self._next, self._next + self.capacity
+        self._ticks[i] = self._ticks[j] = tick
+        self._prices[:, j] = row
+        self._positions[j] = self._positions[i]
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _window(self, n: Optional[int]) -> slice:
+        n = self._size if n is None else max(0, min(n, self._size))
+        # The latest tick's second copy is the last row of the window
+        end = self._next + self.capacity if self._size else 0
+        return slice(end - n, end)
+
+    def ticks(self, n: Optional[int] = None) -> np.ndarray:
+        """
+        Tick numbers of the last n ticks, oldest first.
+
+        :param n: Number of ticks, defaults to all held.
+        """
+        return _read_only(self._ticks[self._window(n)])
+
+    def get(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        """
+        The last n rows of a field, of shape (n, products), oldest first.
+
+        :param field: One of History.FIELDS.
+        :param n: Number of ticks, defaults to all held.
+        """
+        window = self._window(n)
+        if field == "position":
+            return _read_only(self._positions[window])
+        if field not in self.PRICES:
+            raise KeyError(f"Unknown history field {field!r}, expected one of {self.FIELDS}")
+        return _read_only(self._prices[self.PRICES.index(field), window])
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.get(field)
+
+    def series(self, field: str, product: str, n: Optional[int] = None) -> np.ndarray:
+        """
+        The last n values of a field for one product, oldest first.
+
+        :param field: One of History.FIELDS.
+        :param product: Product name.
+        :param n: Number of ticks, defaults to all held.
+        """
+        return self.get(field, n)[:, self.product_ids[product]]
+
+
+def _read_only(view: np.ndarray) -> np.ndarray:
+    view = view.view()
+    view.flags.writeable = False
+    return view
+
+
+def history_size(algo) -> int:
+    """
+    Number of ticks of history the algo asked for with a history_size attribute.
+
+    :param algo: Trader instance.
+    """
+    return int(getattr(algo, "history_size", 0) or 0)
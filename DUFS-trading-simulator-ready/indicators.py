@@ -0,0 +1,504 @@
+"""
+Streaming indicators that update in O(1) per value, for Trader.run.
+
+Every indicator takes one value at a time with update() and holds its
+current value in .value, which is None until it has seen enough values.
+They can be used directly in a Trader, or registered with the engine by
+setting an ``indicators`` attribute on the Trader:
+
+    indicators = {
+        "fast": EWMA(span=10),
+        "spread_vol": RollingStd(50, field="spread"),
+        "beta": RollingRegression(200, x="Underlying"),
+    }
+
+The engine then keeps a copy of every indicator for each product, updates
+it with that product's best bid, best ask, mid or spread (the ``field``,
+mid by default) once per tick before Trader.run, and exposes the values as
+``state.indicators["fast"]["Call"]``.
+"""
+import copy
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Mapping, Optional, Tuple
+
+from datamodel import OrderBook
+
+
+class Indicator(ABC):
+    """
+    Base class of the streaming indicators.
+    """
+    __slots__ = ("field",)
+
+    # Prices an indicator can follow when registered with the engine
+    FIELDS = ("best_bid", "best_ask", "mid", "spread")
+
+    def __init__(self, field: str = "mid") -> None:
+        """
+        :param field: Price followed when registered with the engine, one of Indicator.FIELDS.
+        """
+        if field not in self.FIELDS:
+            raise ValueError(f"Unknown indicator field {field!r}, expected one of {self.FIELDS}")
+        self.field = field
+
+    @abstractmethod
+    def update(self, value: float) -> Optional[float]:
+        """
+        Add a value and return the new value of the indicator.
+        """
+
+    @property
+    @abstractmethod
+    def value(self) -> Optional[float]:
+        """
+        Current value, None until enough values have been seen.
+        """
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+
+def _check_window(window: int) -> None:
+    if window <= 0:
+        raise ValueError(f"window must be positive, got {window}")
+
+
+class EWMA(Indicator):
+    """
+    Exponentially weighted moving average, starting from the first value.
+    Matches pandas ``ewm(alpha=..., adjust=False).mean()``.
+    """
+    __slots__ = ("alpha", "_value")
+
+    def __init__(self, span: Optional[float] = None, alpha: Optional[float] = None, field: str = "mid") -> None:
+        """
+        :param span: Decay as a span, alpha = 2 / (span + 1).
+        :param alpha: Weight of each new value, between 0 and 1. Give this or span.
+        """
+        super().__init__(field)
+        if (span is None) == (alpha is None):
+            raise ValueError("Give exactly one of span and alpha")
+        if span is not None:
+            if span < 1:
+                raise ValueError(f"span must be at least 1, got {span}")
+            alpha = 2 / (span + 1)
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], got {alpha}")
+        self.alpha = alpha
+        self._value: Optional[float] = None
+
+    def update(self, value: float) -> float:
+        if self._value is None:
+            self._value = float(value)
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value
+
+
+class RollingMean(Indicator):
+    """
+    Mean of the last window values, once window values have been seen.
+    """
+    __slots__ = ("window", "_values", "_mean", "_updates")
+
+    def __init__(self, window: int, field: str = "mid") -> None:
+        """
+        :param window: Number of values averaged.
+        """
+        super().__init__(field)
+        _check_window(window)
+        self.window = window
+        self._values: Deque[float] = deque()
+        self._mean = 0.0
+        # Updates since the mean was last summed from scratch
+        self._updates = 0
+
+    def update(self, value: float) -> Optional[float]:
+        values = self._values
+        if len(values) == self.window:
+            self._mean += (value - values.popleft()) / self.window
+        else:
+            self._mean += (value - self._mean) / (len(values) + 1)
+        values.append(value)
+        self._updates += 1
+        if self._updates >= self.window:
+            # Once per window, so rounding errors cannot build up
+            self._mean = math.fsum(values) / len(values)
+            self._updates = 0
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._mean if len(self._values) == self.window else None
+
+
+class RollingVariance(Indicator):
+    """
+    Variance of the last window values with Welford's updates, or of every
+    value seen so far without a window. Matches pandas
+    ``rolling(window).var(ddof)`` and ``expanding(2).var(ddof)``.
+    """
+    __slots__ = ("window", "ddof", "_values", "_count", "_mean", "_m2", "_updates", "_repeats", "_last")
+
+    def __init__(self, window: Optional[int] = None, ddof: int = 1, field: str = "mid") -> None:
+        """
+        :param window: Number of values, or None for all values seen.
+        :param ddof: Delta degrees of freedom, 1 for the sample variance.
+        """
+        super().__init__(field)
+        if window is not None:
+            _check_window(window)
+            if window <= ddof:
+                raise ValueError(f"window must be larger than ddof, got {window}")
+        self.window = window
+        self.ddof = ddof
+        # Values in the window, only kept when there is one
+        self._values: Deque[float] = deque()
+        self._count = 0
+        self._mean = 0.0
+        # Sum of squared differences from the mean
+        self._m2 = 0.0
+        self._updates = 0
+        # Number of times in a row the latest value has been seen
+        self._repeats = 0
+        self._last: Optional[float] = None
+
+    def update(self, value: float) -> Optional[float]:
+        if self.window is not None and self._count == self.window:
+            old = self._values.popleft()
+            mean = self._mean + (value - old) / self._count
+            self._m2 += (value - old) * (value - mean + old - self._mean)
+            self._mean = mean
+        else:
+            self._count += 1
+            delta = value - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (value - self._mean)
+        self._repeats = self._repeats + 1 if value == self._last else 1
+        self._last = value
+
+        if self.window is not None:
+            values = self._values
+            values.append(value)
+            self._updates += 1
+            if self._repeats >= self.window:
+                # A constant window, which rounding would leave slightly off zero
+                self._mean, self._m2 = value, 0.0
+            elif self._updates >= self.window:
+                # Once per window, so rounding errors cannot build up
+                self._mean = math.fsum(values) / len(values)
+                self._m2 = math.fsum((v - self._mean) ** 2 for v in values)
+                self._updates = 0
+        self._m2 = max(self._m2, 0.0)
+        return self.value
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._mean if self._full() else None
+
+    def _full(self) -> bool:
+        if self.window is None:
+            return self._count > self.ddof
+        return self._count == self.window
+
+    @property
+    def variance(self) -> Optional[float]:
+        return self._m2 / (self._count - self.ddof) if self._full() else None
+
+    @property
+    def std(self) -> Optional[float]:
+        variance = self.variance
+        return None if variance is None else math.sqrt(variance)
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.variance
+
+
+class RollingStd(RollingVariance):
+    """
+    Standard deviation of the last window values, or of every value seen.
+    """
+    __slots__ = ()
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.std
+
+
+class ZScore(RollingVariance):
+    """
+    Distance of the latest value from the mean of the last window values,
+    in standard deviations, e.g. of a parity error. None while the window
+    is constant.
+    """
+    __slots__ = ()
+
+    def __init__(self, window: int, ddof: int = 1, field: str = "mid") -> None:
+        super().__init__(window, ddof, field)
+
+    @property
+    def value(self) -> Optional[float]:
+        std = self.std
+        if not std:
+            return None
+        return (self._last - self._mean) / std
+
+
+class RollingMax(Indicator):
+    """
+    Largest of the last window values, with a monotone deque.
+    """
+    __slots__ = ("window", "_count", "_deque")
+
+    def __init__(self, window: int, field: str = "mid") -> None:
+        """
+        :param window: Number of values.
+        """
+        super().__init__(field)
+        _check_window(window)
+        self.window = window
+        self._count = 0
+        # (index, value) of the values that can still be the extreme, the
+        # extreme first
+        self._deque: Deque[Tuple[int, float]] = deque()
+
+    def _beats(self, value: float, other: float) -> bool:
+        return value >= other
+
+    def update(self, value: float) -> Optional[float]:
+        queue = self._deque
+        while queue and self._beats(value, queue[-1][1]):
+            queue.pop()
+        queue.append((self._count, value))
+        self._count += 1
+        if queue[0][0] <= self._count - 1 - self.window:
+            queue.popleft()
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._deque[0][1] if self._count >= self.window else None
+
+
+class RollingMin(RollingMax):
+    """
+    Smallest of the last window values, with a monotone deque.
+    """
+    __slots__ = ()
+
+    def _beats(self, value: float, other: float) -> bool:
+        return value <= other
+
+
+class RollingRegression(Indicator):
+    """
+    Least squares regression of y on x over the last window pairs, e.g. for
+    a hedge ratio. The value is the slope, None while x is constant. Matches
+    pandas ``y.rolling(window).cov(x) / x.rolling(window).var()``.
+
+    Registered with the engine, y is each product's field and x is the same
+    field of the product named by x.
+    """
+    __slots__ = (
+        "window", "x", "_pairs", "_count", "_mean_x", "_mean_y", "_m2_x", "_m2_y", "_c_xy",
+        "_updates", "_repeats", "_last_x",
+    )
+
+    def __init__(self, window: int, x: Optional[str] = None, field: str = "mid") -> None:
+        """
+        :param window: Number of pairs.
+        :param x: Product regressed on when registered with the engine.
+        """
+        super().__init__(field)
+        if window < 2:
+            raise ValueError(f"window must be at least 2, got {window}")
+        self.window = window
+        self.x = x
+        self._pairs: Deque[Tuple[float, float]] = deque()
+        self._count = 0
+        self._mean_x = self._mean_y = 0.0
+        # Sums of squared and cross differences from the means
+        self._m2_x = self._m2_y = self._c_xy = 0.0
+        self._updates = 0
+        # Number of times in a row the latest x has been seen
+        self._repeats = 0
+        self._last_x: Optional[float] = None
+
+    def update(self, x: float, y: float) -> Optional[float]:
+        """
+        Add a pair and return the new slope.
+        """
+        if self._count == self.window:
+            old_x, old_y = self._pairs.popleft()
+            dx = x - old_x
+            dy = y - old_y
+            mean_x = self._mean_x + dx / self._count
+            mean_y = self._mean_y + dy / self._count
+            self._m2_x += dx * (x - mean_x + old_x - self._mean_x)
+            self._m2_y += dy * (y - mean_y + old_y - self._mean_y)
+            self._c_xy += dx * (y - mean_y) + (old_x - self._mean_x) * dy
+            self._mean_x, self._mean_y = mean_x, mean_y
+        else:
+            self._count += 1
+            dx = x - self._mean_x
+            dy = y - self._mean_y
+            self._mean_x += dx / self._count
+            self._mean_y += dy / self._count
+            self._m2_x += dx * (x - self._mean_x)
+            self._m2_y += dy * (y - self._mean_y)
+            self._c_xy += dx * (y - self._mean_y)
+        self._repeats = self._repeats + 1 if x == self._last_x else 1
+        self._last_x = x
+
+        pairs = self._pairs
+        pairs.append((x, y))
+        self._updates += 1
+        if self._updates >= self.window:
+            # Once per window, so rounding errors cannot build up
+            n = len(pairs)
+            self._mean_x = math.fsum(px for px, _ in pairs) / n
+            self._mean_y = math.fsum(py for _, py in pairs) / n
+            self._m2_x = math.fsum((px - self._mean_x) ** 2 for px, _ in pairs)
+            self._m2_y = math.fsum((py - self._mean_y) ** 2 for _, py in pairs)
+            self._c_xy = math.fsum((px - self._mean_x) * (py - self._mean_y) for px, py in pairs)
+            self._updates = 0
+        self._m2_x = max(self._m2_x, 0.0)
+        self._m2_y = max(self._m2_y, 0.0)
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return self._count == self.window and self._repeats < self.window and self._m2_x > 0
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._c_xy / self._m2_x if self.ready else None
+
+    @property
+    def slope(self) -> Optional[float]:
+        return self.value
+
+    @property
+    def intercept(self) -> Optional[float]:
+        return self._mean_y - self._c_xy / self._m2_x * self._mean_x if self.ready else None
+
+    @property
+    def correlation(self) -> Optional[float]:
+        if not self.ready or self._m2_y <= 0:
+            return None
+        return self._c_xy / math.sqrt(self._m2_x * self._m2_y)
+
+
+class IndicatorView:
+    """
+    A read-only view of an Indicator, as handed to Trader.run. Its public
+    attributes and properties, e.g. value, slope or intercept, read through
+    to the indicator, while update and the indicator's internal state cannot
+    be reached.
+    """
+    __slots__ = ("_indicator",)
+
+    def __init__(self, indicator: Indicator) -> None:
+        object.__setattr__(self, "_indicator", indicator)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or name == "update":
+            raise AttributeError(f"{type(self._indicator).__name__} view has no attribute {name!r}")
+        return getattr(self._indicator, name)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self._indicator).__name__} view is read-only")
+
+    def __repr__(self) -> str:
+        return f"IndicatorView({type(self._indicator).__name__}, value={self._indicator.value})"
+
+
+class IndicatorSet:
+    """
+    The indicators registered by a Trader, one copy per product, updated by
+    the engine once per tick.
+    """
+    __slots__ = ("products", "_indicators", "_specs")
+
+    def __init__(self, products: List[str], specs: Mapping[str, Indicator]) -> None:
+        """
+        :param products: Products to follow.
+        :param specs: Name and template of every indicator. Each product gets its own copy.
+        """
+        self.products = list(products)
+        self._specs = dict(specs)
+        self._indicators: Dict[str, Dict[str, Indicator]] = {}
+        for name, spec in self._specs.items():
+            if not isinstance(spec, Indicator):
+                raise TypeError(f"Indicator {name!r} is a {type(spec).__name__}, not an Indicator")
+            if isinstance(spec, RollingRegression) and spec.x not in self.products:
+                raise ValueError(f"Indicator {name!r} regresses on unknown product {spec.x!r}")
+            self._indicators[name] = {product: copy.deepcopy(spec) for product in self.products}
+
+    def update(self, orderbook: Mapping[str, OrderBook]) -> None:
+        """
+        Update every indicator with the tick's prices. Products with an empty
+        side of the book are skipped, keeping their previous values.
+
+        :param orderbook: Orderbooks of the tick.
+        """
+        prices = {}
+        for product in self.products:
+            book = orderbook.get(product)
+            if book is None:
+                continue
+            bid, ask = book.market_top()
+            if bid is None or ask is None:
+                continue
+            prices[product] = {"best_bid": bid, "best_ask": ask, "mid": (bid + ask) / 2, "spread": ask - bid}
+
+        for name, spec in self._specs.items():
+            indicators = self._indicators[name]
+            for product, fields in prices.items():
+                if isinstance(spec, RollingRegression):
+                    x = prices.get(spec.x)
+                    if x is not None:
+                        indicators[product].update(x[spec.field], fields[spec.field])
+                else:
+                    indicators[product].update(fields[spec.field])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._indicators
+
+    def __iter__(self):
+        return iter(self._indicators)
+
+    def __getitem__(self, name: str) -> Dict[str, Optional[float]]:
+        """
+        Current value of an indicator for every product.
+        """
+        return {product: indicator.value for product, indicator in self._indicators[name].items()}
+
+    def value(self, name: str, product: str) -> Optional[float]:
+        """
+        Current value of an indicator for one product.
+        """
+        return self._indicators[name][product].value
+
+    def indicator(self, name: str, product: str) -> IndicatorView:
+        """
+        A read-only view of the indicator itself, e.g. for a regression's intercept.
+        """
+        return IndicatorView(self._indicators[name][product])
+
+
+def trader_indicators(algo) -> Dict[str, Indicator]:
+    """
+    Indicators the algo registered with an indicators attribute.
+
+    :param algo: Trader instance.
+    """
+    return dict(getattr(algo, "indicators", None) or {})
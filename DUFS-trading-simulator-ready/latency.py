@@ -0,0 +1,140 @@
+"""
+Per-tick latency budget for Trader.run.
+"""
+import signal
+import threading
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+
+class AlgoTimeout(BaseException):
+    """
+    Raised inside Trader.run when it overruns its latency budget.
+
+    Derived from BaseException so that ``except Exception`` in algo code does
+    not swallow it.
+    """
+
+
+class LatencyBudget:
+    """
+    Enforces a time limit on every Trader.run call.
+
+    A call that overruns has its orders dropped. With the "skip" policy the
+    algo is called again on the next tick; with "kill" it is not called again
+    for the rest of the run.
+
+    While used as a context manager on the main thread of a POSIX process, an
+    overrunning call is interrupted with a SIGALRM timer that raises
+    AlgoTimeout inside it. Otherwise the call runs to completion and is
+    judged on its measured time.
+    """
+    POLICIES = ("skip", "kill")
+
+    def __init__(self, budget_us: float, policy: str = "skip") -> None:
+        """
+        :param budget_us: Time allowed per call in microseconds.
+        :param policy: "skip" to drop the tick's orders, "kill" to stop calling the algo.
+        """
+        if budget_us <= 0:
+            raise ValueError(f"budget_us must be positive, got {budget_us}")
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {self.POLICIES}, got {policy!r}")
+        self.budget_us = budget_us
+        self.policy = policy
+        # Tick being simulated, set by run_simulation
+        self.tick = 0
+        self.calls = 0
+        self.overrun_ticks: List[int] = []
+        self.killed_at: Optional[int] = None
+        self._interrupt = False
+        self._armed = False
+        self._previous_handler = None
+
+    def __enter__(self) -> "LatencyBudget":
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self._previous_handler = signal.signal(signal.SIGALRM, self._on_alarm)
+            self._interrupt = True
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        if self._interrupt:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler)
+            self._interrupt = False
+        return False
+
+    def __getstate__(self) -> dict:
+        # The timer and signal handler belong to the process, so only the
+        # budget and what happened under it are saved in checkpoints
+        return {name: getattr(self, name) for name in ("budget_us", "policy", "tick", "calls", "overrun_ticks", "killed_at")}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["budget_us"], state["policy"])
+        for name in ("tick", "calls", "overrun_ticks", "killed_at"):
+            setattr(self, name, state[name])
+
+    def resume(self, saved: "LatencyBudget") -> None:
+        """
+        Continue the calls, overruns and kill of a budget saved in a
+        checkpoint, so an algo killed before the checkpoint stays killed.
+
+        :param saved: Budget from the checkpoint.
+        """
+        self.calls = saved.calls
+        self.overrun_ticks = list(saved.overrun_ticks)
+        self.killed_at = saved.killed_at
+
+    def _on_alarm(self, signum, frame) -> None:
+        if self._armed:
+            self._armed = False
+            raise AlgoTimeout()
+
+    def run(self, algo, state) -> List[Any]:
+        """
+        Call algo.run within the budget and return its orders, or no orders
+        if it overran or has been killed.
+
+        :param algo: Trader instance to run.
+        :param state: State to pass to Trader.run.
+        """
+        if self.killed_at is not None:
+            return []
+        self.calls += 1
+        budget_s = self.budget_us / 1e6
+
+        timed_out = False
+        start = perf_counter()
+        try:
+            if self._interrupt:
+                self._armed = True
+                signal.setitimer(signal.ITIMER_REAL, budget_s)
+            orders = algo.run(state)
+            self._armed = False
+        except AlgoTimeout:
+            timed_out = True
+        finally:
+            self._armed = False
+            if self._interrupt:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        elapsed = perf_counter() - start
+
+        if timed_out or elapsed > budget_s:
+            self.overrun_ticks.append(self.tick)
+            if self.policy == "kill":
+                self.killed_at = self.tick
+            return []
+        return orders
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Budget, policy, number of calls and the ticks that overran.
+        """
+        return {
+            "budget_us": self.budget_us,
+            "policy": self.policy,
+            "calls": self.calls,
+            "overruns": len(self.overrun_ticks),
+            "overrun_ticks": list(self.overrun_ticks),
+            "killed_at": self.killed_at,
+        }
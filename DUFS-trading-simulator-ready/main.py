@@ -1,18 +1,37 @@
 import logging
-from datetime import datetime
 import argparse
+import json
+import os
 import sys
-from typing import Dict, List
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 import importlib.util
-import pandas as pd
-import matplotlib.pyplot as plt
-import copy
-
-from datamodel import Portfolio, State
-from dataimport import read_file, extract_orders, extract_bot_orders
-from ordermatching import match_order
-from analytics_vis import Visualiser
-from bots_functions import clean_resting_orders, add_bot_orders
+import numpy as np
+
+from datamodel import OrderBook, Portfolio, RestingOrder, State, StateMutationError
+from dataimport import (
+    MarketData,
+    load_round,
+    read_round,
+    index_orders,
+    index_bot_orders,
+    replay_round,
+    stream_round,
+)
+from ordermatching import match_order, refresh_orderbook
+from bots_functions import add_bot_orders
+from metrics import MetricsRecorder
+from profiling import NULL_TIMER, PhaseTimer, Profiler
+
+if TYPE_CHECKING:
+    # pandas and the optional features are only imported by the code paths
+    # that use them, so a cached headless backtest starts without them
+    import pandas as pd
+    from checkpoint import Checkpointer
+    from history import History
+    from indicators import IndicatorSet
+    from latency import LatencyBudget
+    from wake import Wake
 
 # Set up logging
 logging.basicConfig(
@@ -21,23 +40,25 @@ logging.basicConfig(
 
 # Constants
 POSITION_LIMIT = 50
-MAX_TICKS = 1000
 
 
-def import_trader(file_path: str) -> type:
+def import_trader(file_path: str, name: str = "Trader") -> type:
     """
     Import the Trader class from the specified file.
 
     :param file_path: Trading algo filepath.
+    :param name: Name of the class to import, e.g. BatchTrader.
+    :raises ImportError: If the file or class cannot be imported.
     """
     try:
         spec = importlib.util.spec_from_file_location("trader_module", file_path)
         module = importlib.util.module_from_spec(spec)
+        # Registered so Trader instances can be pickled into checkpoints
+        sys.modules[spec.name] = module
         spec.loader.exec_module(module)
-        return module.Trader
+        return getattr(module, name)
     except Exception as e:
-        logging.error(f"Error importing Trader class from {file_path}: {str(e)}")
-        sys.exit(1)
+        raise ImportError(f"Error importing {name} class from {file_path}: {e}") from e
 
 
 def initialise_portfolio(products: List[str]) -> Portfolio:
@@ -46,147 +67,526 @@ def initialise_portfolio(products: List[str]) -> Portfolio:
 
     :param products: Products to be traded.
     """
-    portfolio = Portfolio()
-    for product in products:
-        portfolio.quantity[product] = 0
-    return portfolio
+    return Portfolio(products)
 
 
-def process_tick(state: State, bot_orders: Dict[str, Dict], algo, portfolio) -> None:
-    # Get orders from the trader
+def precompute(algo, market_data: MarketData) -> None:
+    """
+    Call the algo's optional precompute hook with the top of book of the
+    whole round, as returned by MarketData.top_of_book, before the first tick.
 
-    ob_copy = {
-        product: {side: orders.copy() for side, orders in ob.items()}
-        for product, ob in state.orderbook.items()
-    }
-    publicstate = State(
-        ob_copy, state.positions.copy(), state.products, state.pos_limit
-    )
+    :param algo: Trader instance to run.
+    :param market_data: Indexed market data for the round.
+    """
+    hook = getattr(algo, "precompute", None)
+    if hook is not None:
+        hook(market_data.top_of_book())
 
-    algo_orders = algo.run(publicstate)
 
-    # Process algo orders
-    algo_resting_orders = {
-        product: {"BUY": {}, "SELL": {}} for product in state.products
-    }
+def trader_wake(algo) -> Optional["Wake"]:
+    """
+    The wake conditions the algo set with a wake attribute, importing wake.py
+    only for algos that have one.
+
+    :param algo: Trader instance.
+    """
+    if getattr(algo, "wake", None) is None:
+        return None
+    import wake
+    return wake.trader_wake(algo)
+
+
+def process_tick(
+    state: State,
+    bot_orders: Dict[str, Dict],
+    algo,
+    portfolio: Portfolio,
+    debug: bool = False,
+    timer: PhaseTimer = NULL_TIMER,
+    budget: Optional["LatencyBudget"] = None,
+    run_algo: bool = True,
+) -> None:
+    """
+    Run the algo on one tick, match its orders and mark the portfolio.
+
+    :param state: Engine state for the tick. Trader.run gets a read-only view of it.
+    :param bot_orders: Bot orders for the tick.
+    :param algo: Trader instance to run.
+    :param portfolio: The portfolio to be updated.
+    :param debug: Check that Trader.run left the state unchanged and raise
+        StateMutationError if it did not.
+    :param timer: Records the time spent in each phase of the tick.
+    :param budget: Time limit for Trader.run. Orders from a call that
+        overruns it are dropped.
+    :param run_algo: Call Trader.run. Without it the algo sends no orders
+        this tick.
+    """
+    algo_orders = None
+    if run_algo:
+        if debug:
+            snapshot = snapshot_state(state)
+
+        with timer.phase("algo"):
+            if budget is None:
+                algo_orders = algo.run(state.public_view())
+            else:
+                algo_orders = budget.run(algo, state.public_view())
+
+        if debug:
+            changes = find_state_changes(state, snapshot)
+            if changes:
+                raise StateMutationError(
+                    f"Trader.run modified the state it was given: {', '.join(changes)}"
+                )
+
+    with timer.phase("match"):
+        # Mark to the market's quoted prices before any levels are filled and
+        # removed, leaving out the algo's own resting orders
+        midprices = {
+            product: state.orderbook[product].market_mid_price() for product in state.products
+        }
 
-    if algo_orders:
-        algo_resting_orders = match_order(
-            algo_orders, state.orderbook, portfolio, state.pos_limit
+        # Process algo orders, leaving what is unfilled in the orderbook
+        if algo_orders:
+            match_order(algo_orders, state.orderbook, portfolio, state.pos_limit)
+
+    with timer.phase("bots"):
+        # Match bot orders against the orderbook
+        add_bot_orders(
+            bot_orders,
+            state.orderbook,
+            portfolio,
+            state.pos_limit,
         )
 
-    # Add bot orders to the orderbook
-    add_bot_orders(
-        bot_orders,
-        state.orderbook,
-        algo_resting_orders,
-        portfolio,
-        state.pos_limit,
+    with timer.phase("mark"):
+        portfolio.pnl = portfolio.cash
+        for product, position in zip(portfolio.products, portfolio.positions):
+            portfolio.pnl += position * midprices[product]
+
+
+def snapshot_state(state: State) -> State:
+    """
+    Copy a state so later changes to it can be found with find_state_changes.
+
+    :param state: State to copy.
+    """
+    return State(
+        {product: ob.copy() for product, ob in state.orderbook.items()},
+        dict(state.positions),
+        list(state.products),
+        dict(state.pos_limit),
+        state.tick,
+        dict(state.open_orders),
+        state.history,
+        state.indicators,
     )
 
-    portfolio.pnl = portfolio.cash
-    for product in state.products:
-        best_bid = next(iter(state.orderbook[product]["BUY"]))
-        best_ask = next(iter(state.orderbook[product]["SELL"]))
-        midprice = (best_bid + best_ask) / 2
-        portfolio.pnl += portfolio.quantity[product] * midprice
 
+def find_state_changes(state: State, snapshot: State) -> List[str]:
+    """
+    Describe how a state differs from an earlier snapshot of it.
 
-def update_quantity_data(
-    quantity_data: pd.DataFrame, tick: int, portfolio: Portfolio, products: List[str]
-) -> None:
-    quantity_data.loc[tick, "PnL"] = portfolio.pnl
-    quantity_data.loc[tick, "Cash"] = portfolio.cash
-    for product in products:
-        quantity_data.loc[tick, f"{product}_quantity"] = portfolio.quantity[product]
+    :param state: State to check.
+    :param snapshot: Snapshot from snapshot_state.
+    """
+    changes = []
+    if state.orderbook.keys() != snapshot.orderbook.keys():
+        changes.append("orderbook products")
+    for product, ob in snapshot.orderbook.items():
+        for side, orders in ob.items():
+            current = state.orderbook.get(product, {}).get(side)
+            if current != orders:
+                changes.append(f"orderbook[{product!r}][{side!r}]")
+    if state.positions != snapshot.positions:
+        changes.append("positions")
+    if state.products != snapshot.products:
+        changes.append("products")
+    if state.pos_limit != snapshot.pos_limit:
+        changes.append("pos_limit")
+    return changes
 
 
 def prepare_analytics_data(
-    quantity_data: pd.DataFrame, products: List[str], market_data: pd.DataFrame
-) -> pd.DataFrame:
+    quantity_data: "pd.DataFrame", products: List[str], market_data: "pd.DataFrame"
+) -> "pd.DataFrame":
+    """
+    Build the mid, bid and offer price columns per product alongside PnL.
 
-    analytics_df = pd.DataFrame(index=quantity_data.index)
+    :param quantity_data: Per-tick portfolio data indexed by tick.
+    :param products: Products to build price columns for.
+    :param market_data: Dataframe containing market data.
+    """
+    import pandas as pd
 
     ticks = quantity_data.index
-
+    top = market_data.assign(tick=market_data["timestamp"] // 100)
+    top = top.drop_duplicates(["tick", "product"], keep="first")
+    bids = top.pivot(index="tick", columns="product", values="bid_price_1")
+    asks = top.pivot(index="tick", columns="product", values="ask_price_1")
+    bids = bids.reindex(index=ticks, columns=products)
+    asks = asks.reindex(index=ticks, columns=products)
+    mids = (bids + asks) / 2
+
+    columns = {}
     for product in products:
-        mid_prices = []
-        bid_prices = []
-        offer_prices = []
-        for tick in ticks:
-            try:
-                row = market_data[market_data["timestamp"] == tick * 100]
-                row = row[row["product"] == product]
-                best_bid = row["bid_price_1"].iloc[0]
-                best_ask = row["ask_price_1"].iloc[0]
-                mid_price = (best_bid + best_ask) / 2
-                bid_prices.append(best_bid)
-                offer_prices.append(best_ask)
-                mid_prices.append(mid_price)
-            except:
-                # If data missing, use NaN
-                mid_prices.append(None)
-                bid_prices.append(None)
-                offer_prices.append(None)
-        analytics_df[product] = mid_prices
-        analytics_df[f"{product}_bid"] = bid_prices
-        analytics_df[f"{product}_offer"] = offer_prices
+        columns[product] = mids[product]
+        columns[f"{product}_bid"] = bids[product]
+        columns[f"{product}_offer"] = asks[product]
+    analytics_df = pd.DataFrame(columns, index=ticks)
+    analytics_df.columns.name = None
     analytics_df["pnl"] = quantity_data["PnL"]
 
     return analytics_df
 
 
-def main(round_data_path: str, trading_algo: str) -> None:
-    products, ticks, df = read_file(round_data_path)
-    bot_df = pd.read_csv(round_data_path[:-4] + "_bots.csv")
-    market_data = df.copy()
-    portfolio = initialise_portfolio(products)
+def run_simulation(
+    ticks: Iterable[Tuple[int, Dict[str, Dict], Dict[str, Dict]]],
+    products: List[str],
+    algo,
+    verbose: bool = False,
+    debug: bool = False,
+    timer: PhaseTimer = NULL_TIMER,
+    recorder: Optional[MetricsRecorder] = None,
+    budget: Optional["LatencyBudget"] = None,
+    portfolio: Optional[Portfolio] = None,
+    checkpointer: Optional["Checkpointer"] = None,
+    persist_orders: bool = False,
+    orderbook: Optional[Dict[str, OrderBook]] = None,
+    history: Optional["History"] = None,
+    indicators: Optional["IndicatorSet"] = None,
+    wake: Optional["Wake"] = None,
+) -> Tuple[Portfolio, MetricsRecorder]:
+    """
+    Run an algo over a round and record the portfolio after every tick and
+    every fill.
+
+    :param ticks: Tick, orderbooks and bot orders for every tick, from
+        replay_round or stream_round.
+    :param products: Products to be traded.
+    :param algo: Trader instance to run.
+    :param verbose: Print progress every 100 ticks.
+    :param debug: Raise StateMutationError if the algo modifies its state.
+    :param timer: Records the time spent in each phase of every tick.
+    :param recorder: Recorder to fill in, sized for the run if the tick count
+        is known. A new one is created by default.
+    :param budget: Time limit for each Trader.run call.
+    :param portfolio: Portfolio to continue from, e.g. from a checkpoint.
+        An empty one is created by default.
+    :param checkpointer: Called after every tick to save checkpoints.
+    :param persist_orders: Keep the algo's unfilled orders resting across
+        ticks until they fill or are cancelled, carrying each orderbook over
+        to the next tick's market orders instead of rebuilding it.
+    :param orderbook: Orderbooks to continue from with persist_orders, e.g.
+        from a checkpoint.
+    :param history: History to continue from, e.g. from a checkpoint. One
+        is created by default if the algo has a history_size.
+    :param indicators: Indicators to continue from, e.g. from a checkpoint.
+        They are created by default from the algo's indicators attribute.
+    :param wake: Wake conditions to continue from, e.g. from a checkpoint.
+        They are copied by default from the algo's wake attribute.
+    """
+    if portfolio is None:
+        portfolio = initialise_portfolio(products)
     pos_limit = {product: POSITION_LIMIT for product in products}
 
+    if recorder is None:
+        recorder = MetricsRecorder(products)
+    recorder.attach(portfolio)
+    if persist_orders and orderbook is None:
+        orderbook = {}
+    open_orders: Dict[str, List[RestingOrder]] = {}
+    if history is None and getattr(algo, "history_size", None):
+        from history import History, history_size
+        if history_size(algo) > 0:
+            history = History(products, history_size(algo))
+    if indicators is None and getattr(algo, "indicators", None):
+        from indicators import IndicatorSet, trader_indicators
+        indicators = IndicatorSet(products, trader_indicators(algo))
+    if wake is None:
+        wake = trader_wake(algo)
+
+    ticks = iter(ticks)
+    while True:
+        try:
+            with timer.phase("extract"):
+                tick, market_orders, bot_orders = next(ticks)
+                if not persist_orders:
+                    orderbook = {
+                        product: OrderBook(orders["BUY"], orders["SELL"])
+                        for product, orders in market_orders.items()
+                    }
+        except StopIteration:
+            break
+
+        if verbose and tick % 100 == 0:
+            print(tick)
 
-    # Import the Trader class
+        recorder.tick = tick
+        if budget is not None:
+            budget.tick = tick
+        if persist_orders:
+            with timer.phase("refresh"):
+                # Fills resting orders that the new market orders cross
+                refresh_orderbook(orderbook, market_orders, portfolio, pos_limit)
+                open_orders = {product: book.resting_orders("algo") for product, book in orderbook.items()}
+        if history is not None:
+            with timer.phase("history"):
+                history.record(tick, orderbook, portfolio.positions)
+        if indicators is not None:
+            with timer.phase("indicators"):
+                indicators.update(orderbook)
+        run_algo = True
+        if wake is not None:
+            with timer.phase("wake"):
+                run_algo = wake.check(tick, orderbook, portfolio)
+        state = State(orderbook, portfolio.quantity, products, pos_limit, tick, open_orders, history, indicators)
+        process_tick(state, bot_orders, algo, portfolio, debug, timer, budget, run_algo)
+        with timer.phase("record"):
+            recorder.record(tick, portfolio)
+        if checkpointer is not None:
+            checkpointer(
+                tick, products, portfolio, algo, recorder, orderbook if persist_orders else None,
+                history, indicators, wake, budget,
+            )
+
+    return portfolio, recorder
+
+
+def max_drawdown(pnl: Iterable[float]) -> float:
+    """
+    Largest fall in PnL from a previous peak.
+
+    :param pnl: PnL after every tick.
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    if not len(pnl):
+        return 0.0
+    peak = np.maximum.accumulate(np.maximum(pnl, 0))
+    return float(max((peak - pnl).max(), 0))
+
+
+def sharpe_ratio(pnl: Iterable[float]) -> float:
+    """
+    Mean over standard deviation of the per-tick change in PnL.
+
+    :param pnl: PnL after every tick.
+    """
+    returns = np.diff(np.asarray(pnl, dtype=float), prepend=0.0)
+    std = returns.std()
+    return float(returns.mean() / std) if std > 0 else 0.0
+
+
+def run_backtest(
+    round_data_path: str,
+    trading_algo: str,
+    max_ticks: Optional[int] = None,
+    debug: bool = False,
+    use_cache: bool = True,
+    stream: bool = False,
+    chunksize: int = 10000,
+    metrics_path: Optional[str] = None,
+    fills_path: Optional[str] = None,
+    latency_budget_us: Optional[float] = None,
+    on_overrun: str = "skip",
+    checkpoint_path: Optional[str] = None,
+    checkpoint_every: int = 1000,
+    resume: bool = False,
+    persist_orders: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run a backtest without building analytics or plotting and summarise it,
+    including the time spent in each phase of the tick loop.
+
+    Exceptions raised by the algo are not caught.
+
+    :param round_data_path: File path of CSV containing market data.
+    :param trading_algo: Trading algo filepath.
+    :param max_ticks: Tick to stop the simulation at, defaults to the end of the data.
+    :param debug: Raise StateMutationError if the algo modifies its state.
+    :param use_cache: Load the round through the binary cache in dataimport.
+    :param stream: Read the round CSVs chunk by chunk while simulating instead
+        of loading the whole round first.
+    :param chunksize: Rows per chunk when streaming.
+    :param metrics_path: Write the per-tick metrics to this CSV or Parquet file.
+    :param fills_path: Write every fill to this CSV or Parquet file.
+    :param latency_budget_us: Time limit for each Trader.run call in microseconds.
+    :param on_overrun: "skip" to drop the orders of a call that overruns the
+        budget, "kill" to also stop calling the algo.
+    :param checkpoint_path: Save a checkpoint of the run to this file.
+    :param checkpoint_every: Ticks between checkpoints.
+    :param resume: Continue from the checkpoint at checkpoint_path if there is
+        one. It must have been saved for the same round and algo files.
+    :param persist_orders: Keep the algo's unfilled orders resting across ticks.
+    """
     Trader = import_trader(trading_algo)
-    algo = Trader()
 
-    # Create a DataFrame to store the quantity data
-    quantity_data = pd.DataFrame(
-        index=range(1, ticks),
-        columns=[f"{product}_quantity" for product in products] + ["PnL", "Cash"],
-    )
-    start = datetime.now()
+    checkpoint = None
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        from checkpoint import load_checkpoint
+        checkpoint = load_checkpoint(checkpoint_path)
+        for kind, saved, current in (
+            ("round", checkpoint.round_data_path, round_data_path),
+            ("algo", checkpoint.trading_algo, trading_algo),
+        ):
+            if saved is not None and os.path.realpath(saved) != os.path.realpath(current):
+                raise ValueError(f"Checkpoint was saved for {kind} {saved}, not {current}")
+        logging.info(f"Resuming from tick {checkpoint.tick} of {checkpoint_path}")
+    start_tick = checkpoint.tick + 1 if checkpoint else 1
+
+    if stream:
+        products, ticks = stream_round(
+            round_data_path, chunksize=chunksize, start_tick=start_tick, end_tick=max_ticks
+        )
+        recorder = MetricsRecorder(products)
+    else:
+        products, market_book, bot_book = load_round(
+            round_data_path, use_cache=use_cache
+        )
+        ticks = replay_round(
+            market_book, bot_book, start_tick=start_tick, end_tick=max_ticks
+        )
+        recorder = MetricsRecorder(products, capacity=market_book.ticks)
+
+    portfolio = orderbook = history = indicators = wake = None
+    if checkpoint:
+        if checkpoint.products != products:
+            raise ValueError(
+                f"Checkpoint products {checkpoint.products} do not match round products {products}"
+            )
+        if (checkpoint.orderbook is not None) != persist_orders:
+            raise ValueError(
+                "Checkpoint was saved " + ("with" if checkpoint.orderbook is not None else "without")
+                + " persistent orders, resume it the same way"
+            )
+        algo, portfolio, recorder = checkpoint.algo, checkpoint.portfolio, checkpoint.recorder
+        orderbook, history, indicators = checkpoint.orderbook, checkpoint.history, checkpoint.indicators
+        wake = checkpoint.wake
+    else:
+        algo = Trader()
+        wake = trader_wake(algo)
+
+    timer = PhaseTimer()
+    if not stream:
+        with timer.phase("precompute"):
+            precompute(algo, market_book)
+    elif hasattr(algo, "precompute"):
+        logging.warning("Trader.precompute is not called when streaming the round")
+
+    checkpointer = None
+    if checkpoint_path:
+        from checkpoint import Checkpointer
+        checkpointer = Checkpointer(
+            checkpoint_path, checkpoint_every,
+            os.path.abspath(round_data_path), os.path.abspath(trading_algo),
+        )
 
-    metrics = {"tick": [], "PnL": [], "Cash": []}
-    for product in products:
-        metrics[f"{product}_quantity"] = []
+    budget = None
+    if latency_budget_us is not None:
+        from latency import LatencyBudget
+        budget = LatencyBudget(latency_budget_us, on_overrun)
+    if checkpoint:
+        if (checkpoint.budget is not None) != (budget is not None):
+            raise ValueError(
+                "Checkpoint was saved " + ("with" if checkpoint.budget is not None else "without")
+                + " a latency budget, resume it the same way"
+            )
+        if budget is not None:
+            budget.resume(checkpoint.budget)
+    with budget or nullcontext():
+        portfolio, recorder = run_simulation(
+            ticks,
+            products,
+            algo,
+            debug=debug,
+            timer=timer,
+            recorder=recorder,
+            budget=budget,
+            portfolio=portfolio,
+            checkpointer=checkpointer,
+            persist_orders=persist_orders,
+            orderbook=orderbook,
+            history=history,
+            indicators=indicators,
+            wake=wake,
+        )
+    recorder.flush(metrics_path, fills_path)
+    summary = {
+        "round": round_data_path,
+        "algo": trading_algo,
+        "ticks": recorder.size,
+        "pnl": portfolio.pnl,
+        "cash": portfolio.cash,
+        "max_drawdown": max_drawdown(recorder.pnl),
+        "positions": dict(portfolio.quantity),
+        "fills": dict(portfolio.fills),
+        "timings": timer.summary(),
+    }
+    if budget is not None:
+        summary["latency_budget"] = budget.summary()
+    if wake is not None:
+        summary["wake"] = wake.summary()
+    if checkpoint:
+        summary["resumed_from"] = checkpoint.tick
+    return summary
+
+
+def main(
+    round_data_path: str,
+    trading_algo: str,
+    debug: bool = False,
+    profile: bool = False,
+    max_ticks: Optional[int] = None,
+    metrics_path: Optional[str] = None,
+    fills_path: Optional[str] = None,
+    persist_orders: bool = False,
+) -> None:
+    import pandas as pd
 
-    for tick in range(1, MAX_TICKS):
-        if tick % 100 == 0:
-            print(tick)
+    from analytics_vis import Visualiser
+
+    products, ticks, df, bot_df = read_round(round_data_path)
+    market_book = index_orders(df, products)
+    bot_book = index_bot_orders(bot_df, products)
+
+    # Import the Trader class
+    Trader = import_trader(trading_algo)
+    algo = Trader()
+    wake = trader_wake(algo)
+
+    timer = PhaseTimer()
+    profiler = Profiler() if profile else nullcontext()
+    with profiler:
+        with timer.phase("precompute"):
+            precompute(algo, market_book)
+        portfolio, recorder = run_simulation(
+            replay_round(market_book, bot_book, end_tick=max_ticks),
+            products,
+            algo,
+            verbose=True,
+            debug=debug,
+            timer=timer,
+            recorder=MetricsRecorder(products, capacity=market_book.ticks),
+            persist_orders=persist_orders,
+            wake=wake,
+        )
+    recorder.flush(metrics_path, fills_path)
+    quantity_data = recorder.to_frame()
 
-        orderbook = {product: extract_orders(df, tick, product) for product in products}
-        bot_orders = {
-            product: extract_bot_orders(bot_df, tick, product) for product in products
-        }
-        state = State(orderbook, portfolio.quantity, products, pos_limit)
-        # try:
-        process_tick(state, bot_orders, algo, portfolio)
-        metrics["tick"].append(tick)
-        metrics["PnL"].append(portfolio.pnl)
-        metrics["Cash"].append(portfolio.cash)
-        for product in products:
-            metrics[f"{product}_quantity"].append(portfolio.quantity[product])
-
-        # except:
-        #     break
-
-    end = datetime.now()
-    quantity_data = pd.DataFrame(metrics).set_index("tick")
-
-   
     print("\n=== Final Portfolio State ===")
     print(f"PnL: {portfolio.pnl:.2f}")
-
-    analytics_df = prepare_analytics_data(quantity_data, products, market_data)
+    if wake is not None:
+        summary = wake.summary()
+        print(f"Trader.run called on {summary['runs']} ticks, skipped {summary['skipped']} "
+              f"({summary['skip_ratio']:.1%})")
+
+    print("\n=== Tick Timings ===")
+    print(timer.report())
+    if profile:
+        print("\n=== Profile ===")
+        print(profiler.report())
+
+    analytics_df = prepare_analytics_data(quantity_data, products, df)
     positions_df = pd.DataFrame(index=quantity_data.index)
     for product in products:
         positions_df[product] = quantity_data[f"{product}_quantity"]
@@ -206,8 +606,125 @@ if __name__ == "__main__":
     parser.add_argument(
         "--algo", default="examplealgo.py", help="Trading alngorithm path"
     )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Skip analytics and plotting and print a JSON summary",
+    )
+    parser.add_argument(
+        "--output", help="Write the --headless JSON summary to this file"
+    )
+    parser.add_argument(
+        "--debug-state",
+        action="store_true",
+        help="Fail if the algo modifies the state passed to Trader.run",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse the round CSVs instead of using the binary cache in --headless mode",
+    )
+    parser.add_argument(
+        "--max-ticks",
+        type=int,
+        help="Tick to stop at, defaults to the end of the round data",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read the round CSVs chunk by chunk in --headless mode",
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=10000, help="Rows per chunk with --stream"
+    )
+    parser.add_argument(
+        "--metrics-out", help="Write per-tick metrics to this CSV or .parquet file"
+    )
+    parser.add_argument(
+        "--fills-out", help="Write every fill to this CSV or .parquet file"
+    )
+    parser.add_argument(
+        "--latency-budget-us",
+        type=float,
+        help="Time limit for each Trader.run call in --headless mode",
+    )
+    parser.add_argument(
+        "--on-overrun",
+        # LatencyBudget.POLICIES, without importing latency.py for runs without a budget
+        choices=("skip", "kill"),
+        default="skip",
+        help="Drop the tick's orders (skip) or stop calling the algo (kill)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Save a checkpoint of the run to this file in --headless mode",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=1000,
+        help="Ticks between checkpoints",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the --checkpoint file if it exists",
+    )
+    parser.add_argument(
+        "--persist-orders",
+        action="store_true",
+        help="Keep unfilled algo orders resting across ticks until filled or cancelled",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Capture a cProfile profile and tracemalloc allocations of the run",
+    )
     args = parser.parse_args()
 
-    main(args.round, args.algo)
-    
-    
\ No newline at end of file
+    if args.headless:
+        profiler = Profiler() if args.profile else nullcontext()
+        try:
+            with profiler:
+                summary = run_backtest(
+                    args.round,
+                    args.algo,
+                    max_ticks=args.max_ticks,
+                    debug=args.debug_state,
+                    use_cache=not args.no_cache,
+                    stream=args.stream,
+                    chunksize=args.chunksize,
+                    metrics_path=args.metrics_out,
+                    fills_path=args.fills_out,
+                    latency_budget_us=args.latency_budget_us,
+                    on_overrun=args.on_overrun,
+                    checkpoint_path=args.checkpoint,
+                    checkpoint_every=args.checkpoint_every,
+                    resume=args.resume,
+                    persist_orders=args.persist_orders,
+                )
+        except Exception:
+            logging.exception("Backtest failed")
+            sys.exit(1)
+        if args.profile:
+            print(profiler.report(), file=sys.stderr)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(summary, f, indent=2)
+        else:
+            print(json.dumps(summary, indent=2))
+    else:
+        try:
+            main(
+                args.round,
+                args.algo,
+                args.debug_state,
+                args.profile,
+                args.max_ticks,
+                args.metrics_out,
+                args.fills_out,
+                args.persist_orders,
+            )
+        except ImportError as e:
+            logging.error(e)
+            sys.exit(1)
@@ -0,0 +1,184 @@
+"""
+Per-tick portfolio metrics and fill events recorded into preallocated arrays.
+"""
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+from datamodel import Portfolio
+
+if TYPE_CHECKING:
+    # Only imported to build the dataframes at the end of a run
+    import pandas as pd
+
+COUNTERPARTIES = ("book", "bot")
+
+
+class MetricsRecorder:
+    """
+    Records the portfolio after every tick and every fill during a run.
+
+    Values are written into NumPy arrays sized up front, which double in size
+    if a run outgrows them, and are only turned into dataframes at the end.
+    """
+    def __init__(self, products: List[str], capacity: int = 1024, fill_capacity: int = 1024) -> None:
+        """
+        :param products: Products traded, in the order positions are stored.
+        :param capacity: Number of ticks to allocate for.
+        :param fill_capacity: Number of fills to allocate for.
+        """
+        self.products = list(products)
+        self.product_ids = {product: i for i, product in enumerate(self.products)}
+        self.size = 0
+        self.fill_count = 0
+        # Tick that fills are currently being recorded for
+        self.tick = 0
+
+        capacity = max(capacity, 1)
+        self._ticks = np.zeros(capacity, dtype=np.int64)
+        self._pnl = np.zeros(capacity, dtype=np.float64)
+        self._cash = np.zeros(capacity, dtype=np.float64)
+        self._positions = np.zeros((capacity, len(self.products)), dtype=np.int64)
+
+        fill_capacity = max(fill_capacity, 1)
+        self._fill_ticks = np.zeros(fill_capacity, dtype=np.int64)
+        self._fill_products = np.zeros(fill_capacity, dtype=np.int32)
+        self._fill_prices = np.zeros(fill_capacity, dtype=np.float64)
+        self._fill_quantities = np.zeros(fill_capacity, dtype=np.int64)
+        self._fill_counterparties = np.zeros(fill_capacity, dtype=np.int8)
+
+    def __getstate__(self) -> dict:
+        # Only the recorded rows are pickled, to keep checkpoints small
+        state = self.__dict__.copy()
+        for name in ("_ticks", "_pnl", "_cash", "_positions"):
+            state[name] = state[name][: self.size].copy()
+        for name in ("_fill_ticks", "_fill_products", "_fill_prices",
+                     "_fill_quantities", "_fill_counterparties"):
+            state[name] = state[name][: self.fill_count].copy()
+        return state
+
+    def attach(self, portfolio: Portfolio) -> None:
+        """
+        Record every fill applied to a portfolio.
+
+        :param portfolio: Portfolio to record fills for. Its products must be
+            in the same order as the recorder's.
+        """
+        if portfolio.products != self.products:
+            raise ValueError(
+                f"Portfolio products {portfolio.products} do not match recorder products {self.products}"
+            )
+        portfolio.on_fill = self.record_fill
+
+    def record(self, tick: int, portfolio: Portfolio) -> None:
+        """
+        Record the portfolio at the end of a tick.
+
+        :param tick: Tick just simulated.
+        :param portfolio: The portfolio after the tick.
+        """
+        i = self.size
+        if i == len(self._ticks):
+            self._ticks, self._pnl, self._cash, self._positions = _grow(
+                self._ticks, self._pnl, self._cash, self._positions
+            )
+        self._ticks[i] = tick
+        self._pnl[i] = portfolio.pnl
+        self._cash[i] = portfolio.cash
+        self._positions[i] = portfolio.positions
+        self.size = i + 1
+
+    def record_fill(self, product: str, price: int, quantity: int, counterparty: str) -> None:
+        """
+        Record a fill at the current tick. Matches Portfolio.on_fill.
+
+        :param product: Product traded.
+        :param price: Price of the fill.
+        :param quantity: Quantity bought, negative when selling.
+        :param counterparty: "book" or "bot".
+        """
+        i = self.fill_count
+        if i == len(self._fill_ticks):
+            (self._fill_ticks, self._fill_products, self._fill_prices,
+             self._fill_quantities, self._fill_counterparties) = _grow(
+                self._fill_ticks, self._fill_products, self._fill_prices,
+                self._fill_quantities, self._fill_counterparties,
+            )
+        self._fill_ticks[i] = self.tick
+        self._fill_products[i] = self.product_ids[product]
+        self._fill_prices[i] = price
+        self._fill_quantities[i] = quantity
+        self._fill_counterparties[i] = COUNTERPARTIES.index(counterparty)
+        self.fill_count = i + 1
+
+    @property
+    def ticks(self) -> np.ndarray:
+        return self._ticks[: self.size]
+
+    @property
+    def pnl(self) -> np.ndarray:
+        return self._pnl[: self.size]
+
+    @property
+    def cash(self) -> np.ndarray:
+        return self._cash[: self.size]
+
+    def positions(self, product: str) -> np.ndarray:
+        return self._positions[: self.size, self.product_ids[product]]
+
+    def to_frame(self) -> "pd.DataFrame":
+        """
+        Per-tick PnL, cash and positions indexed by tick.
+        """
+        import pandas as pd
+
+        df = pd.DataFrame({"PnL": self.pnl, "Cash": self.cash}, index=pd.Index(self.ticks, name="tick"))
+        for product in self.products:
+            df[f"{product}_quantity"] = self.positions(product)
+        return df
+
+    def fills_frame(self) -> "pd.DataFrame":
+        """
+        One row per fill with its tick, product, side, price, quantity and counterparty.
+        """
+        import pandas as pd
+
+        n = self.fill_count
+        quantities = self._fill_quantities[:n]
+        return pd.DataFrame({
+            "tick": self._fill_ticks[:n],
+            "product": pd.Categorical.from_codes(self._fill_products[:n], self.products),
+            "side": np.where(quantities > 0, "BUY", "SELL"),
+            "price": self._fill_prices[:n],
+            "quantity": np.abs(quantities),
+            "counterparty": pd.Categorical.from_codes(self._fill_counterparties[:n], COUNTERPARTIES),
+        })
+
+    def flush(self, metrics_path: Optional[str] = None, fills_path: Optional[str] = None) -> None:
+        """
+        Write the per-tick metrics and the fills to CSV, or Parquet for paths
+        ending in .parquet (which needs pyarrow or fastparquet).
+
+        :param metrics_path: File for the per-tick metrics.
+        :param fills_path: File for the fills.
+        """
+        if metrics_path:
+            _write_frame(self.to_frame(), metrics_path, index=True)
+        if fills_path:
+            _write_frame(self.fills_frame(), fills_path, index=False)
+
+
+def _grow(*arrays: np.ndarray) -> List[np.ndarray]:
+    grown = []
+    for array in arrays:
+        new = np.zeros((max(2 * len(array), 1),) + array.shape[1:], dtype=array.dtype)
+        new[: len(array)] = array
+        grown.append(new)
+    return grown
+
+
+def _write_frame(df: "pd.DataFrame", file_path: str, index: bool) -> None:
+    if file_path.endswith(".parquet"):
+        df.to_parquet(file_path, index=index)
+    else:
+        df.to_csv(file_path, index=index)
@@ -1,133 +1,169 @@
-from typing import Dict, List
-from datamodel import Order, Portfolio
+from typing import Dict, List, Optional, Union
+from datamodel import Cancel, Order, OrderBook, Portfolio, RestingOrder
 
 def match_order(
-    algo_orders: List[Order],
-    orderbook: Dict[str, Dict[str, Dict[int, int]]],
+    algo_orders: List[Union[Order, Cancel]],
+    orderbook: Dict[str, OrderBook],
     portfolio: Portfolio,
     pos_limit: Dict[str, int],
-) -> Dict[str, Dict[str, Dict[int, int]]]:
+) -> Dict[str, List[RestingOrder]]:
     """
-    Match an order with an order in the orderbook.
+    Match the algo's orders against the orderbook in the order they were sent,
+    and rest what is left of each in the same orderbook. Cancels take effect
+    where they appear in the list, so a quote can be cancelled and replaced.
 
-    :param order: The order to be matched.
+    :param algo_orders: The orders to be matched and cancels to apply.
     :param orderbook: The orderbook to match with.
     :param portfolio: The portfolio to be updated.
     :param pos_limit: The maximum quantity the portfolio can hold.
+    :return: The algo's new resting orders per product.
     """
 
-    algo_resting_orders: Dict[str, Dict[str, Dict[int, int]]] = {}
-
-    all_products = set(order.product for order in algo_orders)
-    for product in all_products:
-        if product not in algo_resting_orders:
-            algo_resting_orders[product] = {"BUY": {}, "SELL": {}}
+    algo_resting_orders: Dict[str, List[RestingOrder]] = {}
 
     for order in algo_orders:
-        product = order.product
-        unfilled_quantity = 0
-
-        if order.quantity > 0:
-            unfilled_quantity = match_buy_order(
-                order, orderbook[product]["SELL"], portfolio, pos_limit
-            )
-
-            if unfilled_quantity > 0:
-                price = order.price
-                book = algo_resting_orders[product]["BUY"]
-                if price in book:
-                    book[price] += unfilled_quantity
-                else:
-                    book[price] = unfilled_quantity
-
-        elif order.quantity < 0:
-            unfilled_quantity = match_sell_order(
-                order, orderbook[product]["BUY"], portfolio, pos_limit
-            )
-
-            if unfilled_quantity < 0:
-                price = order.price
-                book = algo_resting_orders[product]["SELL"]
-                unfilled_abs = -unfilled_quantity
-                if price in book:
-                    book[price] += unfilled_abs
-                else:
-                    book[price] = unfilled_abs
-        else:
-            pass
+        if isinstance(order, Cancel):
+            cancel_algo_order(order, orderbook[order.product])
+            continue
+        resting = match_algo_order(order, orderbook[order.product], portfolio, pos_limit)
+        if resting is not None:
+            algo_resting_orders.setdefault(order.product, []).append(resting)
 
     return algo_resting_orders
 
 
-def match_buy_order(
+def match_algo_order(
     order: Order,
-    sell_orders: Dict[int, int],
+    book: OrderBook,
     portfolio: Portfolio,
     pos_limit: Dict[str, int],
-) -> int:
+) -> Optional[RestingOrder]:
+    """
+    Match one algo order against a product's orderbook up to the position
+    limit and rest the unfilled quantity behind the orders at its price.
+
+    :param order: The order to be matched.
+    :param book: Orderbook of the order's product.
+    :param portfolio: The portfolio to be updated.
+    :param pos_limit: The maximum quantity the portfolio can hold.
+    :return: The resting order, or None if the order was filled.
+    """
+    if order.quantity == 0:
+        return None
+
     product = order.product
-    product_limit = pos_limit[product]
-    limit_price = order.price
-    outstanding_quantity = order.quantity
+    product_id = portfolio.product_ids[product]
+    position = portfolio.positions[product_id]
+    if order.quantity > 0:
+        side, sign, quantity = "BUY", 1, order.quantity
+    else:
+        side, sign, quantity = "SELL", -1, -order.quantity
+    # quantity before order limit
+    room = int(pos_limit[product] - sign * position)
 
-    for pricepoint in sorted(sell_orders.keys()):
-        if outstanding_quantity == 0:
-            break
+    unfilled, fills = book.execute(side, order.price, quantity, "algo", room=room)
+    for fill in fills:
+        portfolio.record_fill_id(product_id, fill.price, sign * fill.quantity, "book")
 
-        if pricepoint > limit_price:
-            break
+    if unfilled > 0:
+        return book.submit(side, order.price, unfilled, "algo")
+    return None
 
-        if sell_orders[pricepoint] > 0:
-            fulfilled_amount = min(
-                int(product_limit - portfolio.quantity.get(product, 0)),
-                outstanding_quantity,
-                sell_orders[pricepoint],
-            )  # quantity before order limit, order quantity remaining, quantity avaliable,
 
-            if fulfilled_amount > 0:
-                # Update portfolio
-                portfolio.quantity[product] += fulfilled_amount
-                portfolio.cash -= fulfilled_amount * pricepoint
+def cancel_algo_order(cancel: Cancel, book: OrderBook) -> None:
+    """
+    Cancel one of the algo's resting orders, or all of them in the product.
+    Orders that have already filled or belong to another owner are ignored.
 
-                sell_orders[pricepoint] -= fulfilled_amount
-                outstanding_quantity -= fulfilled_amount
-                # print(f"selling {fulfilled_amount} at {buy_prices[i]}")
+    :param cancel: The cancel to apply.
+    :param book: Orderbook of the cancel's product.
+    """
+    if cancel.order_id is None:
+        book.cancel_all("algo")
+        return
+    order = book.order(cancel.order_id)
+    if order is not None and order.owner == "algo":
+        book.cancel(cancel.order_id)
 
-    return outstanding_quantity
 
+def refresh_orderbook(
+    orderbook: Dict[str, OrderBook],
+    market_orders: Dict[str, Dict],
+    portfolio: Portfolio,
+    pos_limit: Dict[str, int],
+) -> None:
+    """
+    Carry the orderbooks over to a new tick's market orders, keeping the
+    algo's resting orders in their queues. New market orders that cross a
+    resting algo order trade with it at the algo's price, best price first.
 
-def match_sell_order(
-    order: Order,
-    buy_orders: Dict[int, int],
+    :param orderbook: Orderbooks from the last tick, updated in place.
+    :param market_orders: Market orders for the new tick.
+    :param portfolio: The portfolio to be updated.
+    :param pos_limit: The maximum quantity the portfolio can hold.
+    """
+    for product, orders in market_orders.items():
+        book = orderbook.get(product)
+        if book is None:
+            orderbook[product] = OrderBook(orders["BUY"], orders["SELL"])
+            continue
+        book.load_snapshot(orders["BUY"], orders["SELL"])
+        resting = book.resting_orders("algo")
+        if resting:
+            match_crossed_orders(product, book, orders, resting, portfolio, pos_limit)
+
+
+def match_crossed_orders(
+    product: str,
+    book: OrderBook,
+    orders: Dict[str, Dict[int, int]],
+    resting: List[RestingOrder],
     portfolio: Portfolio,
     pos_limit: Dict[str, int],
-) -> int:
-    product = order.product
-    product_limit = pos_limit[product]
-    limit_price = order.price
-    outstanding_quantity = order.quantity
-
-    for pricepoint in sorted(buy_orders.keys(), reverse=True):
-        if outstanding_quantity == 0:
-            break
-
-        if pricepoint < limit_price:
-            break
-
-        if buy_orders[pricepoint] > 0:
-            fulfilled_amount = min(
-                int(product_limit + portfolio.quantity.get(product, 0)),
-                -outstanding_quantity,
-                buy_orders[pricepoint],
-            )  # quantity before order limit, order quantity remaining, quantity avaliable,
-
-            if fulfilled_amount > 0:
-                # Update portfolio
-                portfolio.quantity[product] -= fulfilled_amount
-                portfolio.cash += fulfilled_amount * pricepoint
-
-                buy_orders[pricepoint] -= fulfilled_amount
-                outstanding_quantity += fulfilled_amount
-                # print(f"selling {fulfilled_amount} at {buy_prices[i]}")
-
-    return outstanding_quantity
\ No newline at end of file
+) -> None:
+    """
+    Trade the market levels of a new snapshot that cross the algo's resting
+    orders, as if those market orders had just arrived, up to each level's
+    quantity. The snapshot is the book after those trades, so its levels are
+    left as they are, and whatever the position limit kept from filling is
+    cancelled so the book is never left crossed.
+
+    :param product: Product of the orderbook.
+    :param book: Orderbook already loaded with the snapshot.
+    :param orders: The snapshot.
+    :param resting: The algo's resting orders in the orderbook.
+    :param portfolio: The portfolio to be updated.
+    :param pos_limit: The maximum quantity the portfolio can hold.
+    """
+    product_id = portfolio.product_ids[product]
+    for side, sign in (("BUY", 1), ("SELL", -1)):
+        market_side = "SELL" if side == "BUY" else "BUY"
+        market = orders[market_side]
+        if not market:
+            continue
+        # Market levels best first, and the best market price the algo's
+        # orders on this side may rest at
+        levels = sorted(market, reverse=market_side == "BUY")
+        crossed = [
+            order for order in resting
+            if order.side == side and ((order.price >= levels[0]) if side == "BUY" else (order.price <= levels[0]))
+        ]
+        if not crossed:
+            continue
+
+        limit = max(order.price for order in crossed) if side == "BUY" else min(order.price for order in crossed)
+        passive_room = {"algo": int(pos_limit[product] - sign * portfolio.positions[product_id])}
+        for price in levels:
+            if (price > limit) if side == "BUY" else (price < limit):
+                break
+            if passive_room["algo"] <= 0:
+                break
+            if market[price] <= 0:
+                continue
+            # "book" never trades with itself, so this only fills algo orders
+            _, fills = book.execute(market_side, price, market[price], "book", passive_room=passive_room)
+            for fill in fills:
+                portfolio.record_fill_id(product_id, fill.price, sign * fill.quantity, "book")
+
+        for order in crossed:
+            book.cancel(order.order_id)
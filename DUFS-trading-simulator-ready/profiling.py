@@ -0,0 +1,150 @@
+"""
+Timing and profiling instrumentation for the simulator loop.
+"""
+import tracemalloc
+from array import array
+from math import ceil
+from time import perf_counter_ns
+from typing import Dict, List, Optional
+
+
+class PhaseTimer:
+    """
+    Records how long each phase of every tick takes, in nanoseconds.
+
+    Time a phase with ``with timer.phase("algo"): ...``. Phases must not be
+    nested. A phase ended by StopIteration is not recorded, so a timed call
+    to next() on an exhausted iterator does not count as a call.
+    """
+    def __init__(self) -> None:
+        self.samples: Dict[str, array] = {}
+        self._phase: Optional[str] = None
+        self._start = 0
+
+    def phase(self, name: str) -> "PhaseTimer":
+        self._phase = name
+        return self
+
+    def __enter__(self) -> "PhaseTimer":
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        elapsed = perf_counter_ns() - self._start
+        if exc_type is StopIteration:
+            return False
+        samples = self.samples.get(self._phase)
+        if samples is None:
+            samples = self.samples[self._phase] = array("q")
+        samples.append(elapsed)
+        return False
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Call count, total time and per-call latency percentiles for each phase.
+        """
+        summary = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            total = sum(ordered)
+            summary[name] = {
+                "calls": len(ordered),
+                "total_ms": total / 1e6,
+                "mean_us": total / len(ordered) / 1e3,
+                "p50_us": percentile(ordered, 50) / 1e3,
+                "p99_us": percentile(ordered, 99) / 1e3,
+                "max_us": ordered[-1] / 1e3,
+            }
+        return summary
+
+    def report(self) -> str:
+        """
+        Format the summary as a table, slowest phase first.
+        """
+        summary = self.summary()
+        grand_total = sum(row["total_ms"] for row in summary.values()) or 1
+        lines = [
+            f"{'phase':<10}{'calls':>8}{'total ms':>12}{'share':>8}"
+            f"{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"
+        ]
+        for name, row in sorted(summary.items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(
+                f"{name:<10}{row['calls']:>8}{row['total_ms']:>12.2f}"
+                f"{row['total_ms'] / grand_total:>8.1%}{row['mean_us']:>10.1f}"
+                f"{row['p50_us']:>10.1f}{row['p99_us']:>10.1f}{row['max_us']:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+class NullTimer:
+    """
+    Stands in for a PhaseTimer when timings are not wanted.
+    """
+    def phase(self, name: str) -> "NullTimer":
+        return self
+
+    def __enter__(self) -> "NullTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+def percentile(ordered: List[int], q: float) -> int:
+    """
+    Nearest-rank percentile of sorted samples.
+
+    :param ordered: Samples sorted ascending.
+    :param q: Percentile between 0 and 100.
+    """
+    rank = max(1, ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Profiler:
+    """
+    Captures a cProfile profile and tracemalloc allocations around a block.
+    """
+    def __init__(self, top: int = 20) -> None:
+        """
+        :param top: Number of functions and allocation sites to report.
+        """
+        # cProfile and pstats are only imported for profiled runs
+        import cProfile
+
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_memory = 0
+
+    def __enter__(self) -> "Profiler":
+        tracemalloc.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.profile.disable()
+        self.snapshot = tracemalloc.take_snapshot()
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return False
+
+    def report(self) -> str:
+        """
+        Format the slowest functions by cumulative time and the largest allocation sites.
+        """
+        import io
+        import pstats
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(self.top)
+
+        lines = [stream.getvalue().rstrip(), "", f"Peak traced memory: {self.peak_memory / 1024:.1f} KiB"]
+        if self.snapshot is not None:
+            for stat in self.snapshot.statistics("lineno")[: self.top]:
+                lines.append(str(stat))
+        return "\n".join(lines)
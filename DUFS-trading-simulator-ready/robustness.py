@@ -0,0 +1,301 @@
+"""
+Walk-forward and Monte Carlo robustness tests for a Trader.
+
+Runs an algo many times on variations of one round and reports the spread
+of PnL instead of a single number:
+
+- walk_forward: a Trader trained on one window of consecutive ticks and
+  scored on the window after it.
+- bootstrap: the round rebuilt from randomly drawn blocks of consecutive
+  ticks, with market and bot orders kept together.
+- bot_jitter: each bot order moved by a random number of ticks, and
+  optionally dropped.
+
+Every run is an independent simulation. Runs are spread over a process pool
+whose workers attach to one copy of the round published in shared memory.
+
+Example:
+    python robustness.py --round Round_3.csv --algo examplealgo.py \\
+        --window 200 --train 400 --step 100 --bootstrap 200 --block 50 --bot-jitter 100
+"""
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dataimport import MarketData
+
+# Per-process state filled in by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def block_bootstrap(market_data: MarketData, bot_data: MarketData, block: int,
+                    rng: np.random.Generator) -> Tuple[MarketData, MarketData]:
+    """
+    Rebuild a round from randomly drawn blocks of consecutive ticks.
+
+    Replays start at tick 1, so blocks are drawn from ticks 1 onwards and
+    fill ticks 1 onwards of the new round, which keeps tick 0 as it was.
+
+    :param market_data: Indexed market data for the round.
+    :param bot_data: Indexed bot orders for the round.
+    :param block: Number of consecutive ticks per block.
+    :param rng: Random generator to draw blocks with.
+    """
+    n_ticks = min(market_data.ticks, bot_data.ticks)
+    replayed = n_ticks - 1
+    if replayed < 1:
+        return market_data.take(np.arange(n_ticks)), bot_data.take(np.arange(n_ticks))
+    block = max(1, min(block, replayed))
+    starts = rng.integers(1, n_ticks - block + 1, size=-(-replayed // block))
+    ticks = np.concatenate([[0], (starts[:, None] + np.arange(block)).ravel()[:replayed]])
+    return market_data.take(ticks), bot_data.take(ticks)
+
+
+def perturb_bots(bot_data: MarketData, jitter: int, drop: float, rng: np.random.Generator) -> MarketData:
+    """
+    Move each bot order to a random nearby tick and drop some of them.
+
+    Each (tick, product) takes the bot order from up to ``jitter`` ticks
+    either side, so some orders are repeated and others lost.
+
+    :param bot_data: Indexed bot orders for the round.
+    :param jitter: Largest number of ticks to move an order by.
+    :param drop: Probability of removing each bot order.
+    :param rng: Random generator.
+    """
+    n_ticks, n_products = bot_data.present.shape
+    offsets = rng.integers(-jitter, jitter + 1, size=(n_ticks, n_products))
+    source = np.clip(np.arange(n_ticks)[:, None] + offsets, 0, n_ticks - 1)
+    product_ids = np.arange(n_products)[None, :]
+    arrays = {name: getattr(bot_data, name)[source, product_ids] for name in MarketData.ARRAYS}
+    keep = rng.random((n_ticks, n_products)) >= drop
+    arrays["bid_volumes"] = arrays["bid_volumes"] * keep[:, :, None]
+    arrays["ask_volumes"] = arrays["ask_volumes"] * keep[:, :, None]
+    return MarketData.from_arrays(bot_data.products, arrays, bot_data.skip_empty)
+
+
+def build_runs(n_ticks: int, window: Optional[int] = None, step: Optional[int] = None,
+               bootstrap: int = 0, block: int = 50, bot_jitter: int = 0, jitter: int = 5,
+               drop: float = 0.0, seed: int = 0, train: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    List the runs to make. Each run gets its own seed derived from ``seed``.
+
+    :param n_ticks: Number of ticks in the round.
+    :param window: Ticks per walk-forward test window, or None for no
+        walk-forward runs.
+    :param step: Ticks between walk-forward window starts, defaults to ``window``.
+    :param bootstrap: Number of block bootstrap runs.
+    :param block: Ticks per bootstrap block.
+    :param bot_jitter: Number of bot perturbation runs.
+    :param jitter: Largest number of ticks to move a bot order by.
+    :param drop: Probability of dropping each bot order.
+    :param seed: Base seed.
+    :param train: Ticks before each walk-forward window to train the Trader
+        on, defaults to ``window``. With 0 every window gets an untrained Trader.
+    """
+    runs = []
+    if window:
+        train = window if train is None else train
+        for start in range(1 + train, n_ticks - window + 1, step or window):
+            runs.append({"kind": "walk_forward", "train_start": start - train, "start": start, "end": start + window})
+    for i in range(bootstrap):
+        runs.append({"kind": "bootstrap", "block": block, "seed": seed + i})
+    for i in range(bot_jitter):
+        runs.append({"kind": "bot_jitter", "jitter": jitter, "drop": drop, "seed": seed + bootstrap + i})
+    return runs
+
+
+def _init_worker(round_spec: Dict[str, Any], trading_algo: str) -> None:
+    from dataimport import attach_round
+    from main import import_trader
+
+    products, market_book, bot_book = attach_round(round_spec)
+    _worker["products"] = products
+    _worker["market_book"] = market_book
+    _worker["bot_book"] = bot_book
+    _worker["Trader"] = import_trader(trading_algo)
+
+
+def _train(algo, market_book: MarketData, bot_book: MarketData, start_tick: int,
+           end_tick: int) -> Dict[str, Any]:
+    """
+    Run an algo over the training ticks of a walk-forward run and return
+    its history, indicators and wake conditions, to carry into the test
+    window with the trained algo.
+    """
+    from dataimport import replay_round
+    from history import History, history_size
+    from indicators import IndicatorSet, trader_indicators
+    from main import run_simulation, trader_wake
+    from metrics import MetricsRecorder
+
+    products = _worker["products"]
+    carried = {
+        "history": History(products, history_size(algo)) if history_size(algo) > 0 else None,
+        "indicators": IndicatorSet(products, trader_indicators(algo)) if trader_indicators(algo) else None,
+        "wake": trader_wake(algo),
+    }
+    if start_tick < end_tick:
+        run_simulation(
+            replay_round(market_book, bot_book, start_tick, end_tick),
+            products,
+            algo,
+            recorder=MetricsRecorder(products, capacity=end_tick - start_tick),
+            **carried,
+        )
+    return carried
+
+
+def _run(run: Dict[str, Any]) -> Dict[str, Any]:
+    from dataimport import replay_round
+    from main import max_drawdown, precompute, run_simulation
+    from metrics import MetricsRecorder
+
+    market_book, bot_book = _worker["market_book"], _worker["bot_book"]
+    start_tick, end_tick = 1, None
+    if run["kind"] == "walk_forward":
+        start_tick, end_tick = run["start"], run["end"]
+    elif run["kind"] == "bootstrap":
+        rng = np.random.default_rng(run["seed"])
+        market_book, bot_book = block_bootstrap(market_book, bot_book, run["block"], rng)
+    elif run["kind"] == "bot_jitter":
+        rng = np.random.default_rng(run["seed"])
+        bot_book = perturb_bots(bot_book, run["jitter"], run["drop"], rng)
+
+    row = dict(run)
+    try:
+        algo = _worker["Trader"]()
+        precompute(algo, market_book)
+        carried = {}
+        if run["kind"] == "walk_forward":
+            # Only the test window is scored, starting from a flat portfolio
+            carried = _train(algo, market_book, bot_book, run["train_start"], start_tick)
+        portfolio, recorder = run_simulation(
+            replay_round(market_book, bot_book, start_tick, end_tick),
+            _worker["products"],
+            algo,
+            recorder=MetricsRecorder(_worker["products"], capacity=market_book.ticks),
+            **carried,
+        )
+    except Exception as e:
+        row.update(pnl=None, max_drawdown=None, error=repr(e))
+        return row
+    row.update(pnl=portfolio.pnl, max_drawdown=max_drawdown(recorder.pnl), error="")
+    return row
+
+
+def run_robustness(round_data_path: str, trading_algo: str, runs: List[Dict[str, Any]],
+                   workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Make every run across a process pool and return one result row per run.
+
+    :param round_data_path: File path of CSV containing market data.
+    :param trading_algo: Trading algo filepath.
+    :param runs: Runs from build_runs.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :raises ImportError: If the Trader class cannot be imported.
+    """
+    from dataimport import SharedRound
+    from main import import_trader
+
+    # Fails here rather than in every worker's initializer, which would
+    # break the pool
+    import_trader(trading_algo)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(runs) // (workers * 4))
+    with SharedRound.publish(round_data_path) as shared, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(shared.spec, trading_algo),
+    ) as executor:
+        return list(executor.map(_run, runs, chunksize=chunksize))
+
+
+def summarise(results: List[Dict[str, Any]], confidence: float = 0.95) -> Dict[str, Dict[str, float]]:
+    """
+    Summarise the PnL distribution of each kind of run.
+
+    ``pnl_low``/``pnl_high`` bound the central ``confidence`` share of run
+    PnLs. ``mean_low``/``mean_high`` are a normal-approximation confidence
+    interval for the mean PnL.
+
+    :param results: Rows from run_robustness.
+    :param confidence: Confidence level of the intervals.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    tail = (1 - confidence) / 2 * 100
+    summary = {}
+    for kind in dict.fromkeys(row["kind"] for row in results):
+        pnl = np.array([row["pnl"] for row in results if row["kind"] == kind and row["pnl"] is not None])
+        failed = sum(1 for row in results if row["kind"] == kind and row["pnl"] is None)
+        if not len(pnl):
+            summary[kind] = {"runs": 0, "failed": failed}
+            continue
+        std = float(pnl.std(ddof=1)) if len(pnl) > 1 else 0.0
+        half_width = z * std / np.sqrt(len(pnl))
+        summary[kind] = {
+            "runs": len(pnl),
+            "failed": failed,
+            "mean": float(pnl.mean()),
+            "std": std,
+            "mean_low": float(pnl.mean() - half_width),
+            "mean_high": float(pnl.mean() + half_width),
+            "pnl_low": float(np.percentile(pnl, tail)),
+            "median": float(np.median(pnl)),
+            "pnl_high": float(np.percentile(pnl, 100 - tail)),
+            "min": float(pnl.min()),
+            "max": float(pnl.max()),
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    from dataimport import load_round
+    from sweep import write_results
+
+    parser = argparse.ArgumentParser(description="Walk-forward and Monte Carlo backtests.")
+    parser.add_argument("--round", default="Round_3.csv", help="Main data file path")
+    parser.add_argument("--algo", default="examplealgo.py", help="Trading algorithm path")
+    parser.add_argument("--window", type=int, help="Ticks per walk-forward test window")
+    parser.add_argument("--train", type=int,
+                        help="Ticks to train on before each walk-forward window, defaults to --window")
+    parser.add_argument("--step", type=int, help="Ticks between walk-forward windows")
+    parser.add_argument("--bootstrap", type=int, default=0, help="Number of block bootstrap runs")
+    parser.add_argument("--block", type=int, default=50, help="Ticks per bootstrap block")
+    parser.add_argument("--bot-jitter", type=int, default=0, help="Number of bot perturbation runs")
+    parser.add_argument("--jitter", type=int, default=5, help="Largest bot order shift in ticks")
+    parser.add_argument("--drop", type=float, default=0.0, help="Probability of dropping a bot order")
+    parser.add_argument("--seed", type=int, default=0, help="Base random seed")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of intervals")
+    parser.add_argument("--workers", type=int, help="Number of worker processes")
+    parser.add_argument("--out", help="Write every run's result to this CSV")
+    args = parser.parse_args()
+
+    # Builds the round cache before the workers start
+    _, market_book, _ = load_round(args.round)
+    runs = build_runs(market_book.ticks, args.window, args.step, args.bootstrap, args.block,
+                      args.bot_jitter, args.jitter, args.drop, args.seed, args.train)
+    try:
+        results = run_robustness(args.round, args.algo, runs, args.workers)
+    except ImportError as e:
+        logging.error(e)
+        sys.exit(1)
+    if args.out:
+        write_results(results, args.out)
+
+    print(f"{'kind':<14}{'runs':>6}{'failed':>8}{'mean':>12}{'std':>12}"
+          f"{'mean CI':>26}{'PnL interval':>26}")
+    for kind, row in summarise(results, args.confidence).items():
+        if not row["runs"]:
+            print(f"{kind:<14}{0:>6}{row['failed']:>8}")
+            continue
+        mean_ci = f"[{row['mean_low']:.1f}, {row['mean_high']:.1f}]"
+        interval = f"[{row['pnl_low']:.1f}, {row['pnl_high']:.1f}]"
+        print(f"{kind:<14}{row['runs']:>6}{row['failed']:>8}{row['mean']:>12.1f}{row['std']:>12.1f}"
+              f"{mean_ci:>26}{interval:>26}")
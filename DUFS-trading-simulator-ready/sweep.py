@@ -0,0 +1,335 @@
+"""
+Backtest many Trader configurations across a process pool.
+
+Each worker loads the round and the Trader class once, then runs every
+configuration it is handed. A configuration is a set of constructor keyword
+arguments (--init) and attribute overrides applied after construction (--set).
+
+With --warmup N the default Trader is run once up to tick N and every
+configuration forks from a checkpoint of that run, with its --set overrides
+applied from tick N onwards.
+
+With --batch the algo file's BatchTrader runs each worker's share of the
+configurations in lockstep over one replay of the round (see batch.py), with
+every --init and --set parameter passed as an array of one value per
+configuration.
+
+Example:
+    python sweep.py --round Round_3.csv --algo examplealgo.py \\
+        --set parity_threshold=3.5,3.9,4.5 --set hedge_threshold=3,5 --out sweep.csv
+"""
+import argparse
+import ast
+import csv
+import logging
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# Per-process state filled in by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def parse_param(spec: str) -> Tuple[str, List[Any]]:
+    """
+    Parse a parameter spec of the form ``name=value1,value2,...``.
+
+    :param spec: Parameter spec from the command line.
+    """
+    name, sep, values = spec.partition("=")
+    if not sep or not name or not values:
+        raise argparse.ArgumentTypeError(f"Expected name=value1,value2,... got {spec!r}")
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(ast.literal_eval(value))
+        except (ValueError, SyntaxError):
+            parsed.append(value)
+    return name, parsed
+
+
+def build_configs(
+    init_grid: List[Tuple[str, List[Any]]],
+    attr_grid: List[Tuple[str, List[Any]]],
+    samples: Optional[int] = None,
+    seed: int = 0,
+) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    Expand parameter grids into configurations.
+
+    :param init_grid: Constructor keyword arguments and their candidate values.
+    :param attr_grid: Trader attributes and their candidate values.
+    :param samples: Draw this many configurations at random instead of the full grid.
+    :param seed: Seed for the random draw.
+    """
+    grid = [("init", name, values) for name, values in init_grid]
+    grid += [("attrs", name, values) for name, values in attr_grid]
+
+    total = 1
+    for _, _, values in grid:
+        total *= len(values)
+    if samples is not None and samples < total:
+        indices = sorted(random.Random(seed).sample(range(total), samples))
+    else:
+        indices = range(total)
+
+    configs = []
+    for index in indices:
+        # Decode the grid position as a mixed-radix number so large grids
+        # never need to be materialised
+        positions = []
+        for _, _, values in reversed(grid):
+            index, position = divmod(index, len(values))
+            positions.append(position)
+        config = {"init": {}, "attrs": {}}
+        for (kind, name, values), position in zip(grid, reversed(positions)):
+            config[kind][name] = values[position]
+        configs.append(config)
+    return configs
+
+
+def _init_worker(round_spec: Dict[str, Any], trading_algo: str, prefix: Optional[bytes] = None,
+                 class_name: str = "Trader") -> None:
+    from dataimport import attach_round
+    from main import import_trader
+
+    # Views of the round published by run_sweep, so workers share the data
+    products, market_book, bot_book = attach_round(round_spec)
+    _worker["products"] = products
+    _worker["market_book"] = market_book
+    _worker["bot_book"] = bot_book
+    _worker["Trader"] = import_trader(trading_algo, class_name)
+    _worker["prefix"] = prefix
+
+
+def _run_config(config: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    from checkpoint import Checkpoint
+    from dataimport import replay_round
+    from main import precompute, run_simulation, max_drawdown
+    from metrics import MetricsRecorder
+
+    row: Dict[str, Any] = {**config["init"], **config["attrs"]}
+    try:
+        if _worker["prefix"] is not None:
+            # Every load is an independent copy of the warmed-up run
+            checkpoint = Checkpoint.loads(_worker["prefix"])
+            algo, portfolio, recorder = checkpoint.algo, checkpoint.portfolio, checkpoint.recorder
+            history, indicators, wake = checkpoint.history, checkpoint.indicators, checkpoint.wake
+            start_tick = checkpoint.tick + 1
+        else:
+            algo = _worker["Trader"](**config["init"])
+            portfolio = history = indicators = wake = None
+            recorder = MetricsRecorder(
+                _worker["products"], capacity=_worker["market_book"].ticks
+            )
+            start_tick = 1
+        for name, value in config["attrs"].items():
+            if not hasattr(algo, name):
+                raise AttributeError(f"Trader has no attribute {name!r}")
+            setattr(algo, name, value)
+        precompute(algo, _worker["market_book"])
+        portfolio, recorder = run_simulation(
+            replay_round(_worker["market_book"], _worker["bot_book"], start_tick=start_tick),
+            _worker["products"],
+            algo,
+            recorder=recorder,
+            portfolio=portfolio,
+            history=history,
+            indicators=indicators,
+            wake=wake,
+        )
+    except Exception as e:
+        row.update(pnl=None, max_drawdown=None, fills=None, error=repr(e))
+        return row
+    row.update(
+        pnl=portfolio.pnl,
+        max_drawdown=max_drawdown(recorder.pnl),
+        fills=sum(portfolio.fills.values()),
+        error="",
+    )
+    return row
+
+
+def _run_batch(configs: List[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    import numpy as np
+
+    from batch import run_batch_simulation
+    from main import POSITION_LIMIT, precompute
+
+    rows = [{**config["init"], **config["attrs"]} for config in configs]
+    try:
+        init = {name: np.array([config["init"][name] for config in configs]) for name in configs[0]["init"]}
+        algo = _worker["Trader"](len(configs), **init)
+        for name in configs[0]["attrs"]:
+            if not hasattr(algo, name):
+                raise AttributeError(f"BatchTrader has no attribute {name!r}")
+            setattr(algo, name, np.array([config["attrs"][name] for config in configs]))
+        precompute(algo, _worker["market_book"])
+        portfolio = run_batch_simulation(
+            _worker["market_book"], _worker["bot_book"], algo, len(configs), POSITION_LIMIT
+        )
+    except Exception as e:
+        for row in rows:
+            row.update(pnl=None, max_drawdown=None, fills=None, error=repr(e))
+        return rows
+    fills = portfolio.fill_counts.sum(axis=1)
+    for i, row in enumerate(rows):
+        row.update(
+            pnl=float(portfolio.pnl[i]),
+            max_drawdown=float(portfolio.max_drawdown[i]),
+            fills=int(fills[i]),
+            error="",
+        )
+    return rows
+
+
+def run_sweep(
+    round_data_path: str,
+    trading_algo: str,
+    configs: List[Dict[str, Dict[str, Any]]],
+    workers: Optional[int] = None,
+    warmup: Optional[int] = None,
+    batch: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Backtest every configuration and return one result row per configuration.
+
+    :param round_data_path: File path of CSV containing market data.
+    :param trading_algo: Trading algo filepath.
+    :param configs: Configurations from build_configs.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :param warmup: Run the default Trader once up to this tick and fork
+        every configuration from the end of it. Only attribute overrides can
+        be swept with a warmup.
+    :param batch: Run the algo's BatchTrader on each worker's share of the
+        configurations at once instead of one Trader per configuration.
+    :raises ImportError: If the Trader or BatchTrader class cannot be imported.
+    """
+    from dataimport import SharedRound
+    from main import import_trader
+
+    prefix = None
+    if warmup and batch:
+        raise ValueError("A batch sweep cannot start from a warmup")
+    # Fails here rather than in every worker's initializer, which would
+    # break the pool
+    import_trader(trading_algo, "BatchTrader" if batch else "Trader")
+    if warmup:
+        if any(config["init"] for config in configs):
+            raise ValueError("Constructor arguments cannot be swept with a warmup")
+        prefix = warm_up(round_data_path, trading_algo, warmup)
+
+    workers = workers or os.cpu_count() or 1
+    with SharedRound.publish(round_data_path) as shared, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(shared.spec, trading_algo, prefix, "BatchTrader" if batch else "Trader"),
+    ) as executor:
+        if batch:
+            # One batch per worker, so each replays the round once
+            size = -(-len(configs) // workers)
+            batches = [configs[i:i + size] for i in range(0, len(configs), size)]
+            return [row for rows in executor.map(_run_batch, batches) for row in rows]
+        chunksize = max(1, len(configs) // (workers * 4))
+        return list(executor.map(_run_config, configs, chunksize=chunksize))
+
+
+def warm_up(round_data_path: str, trading_algo: str, ticks: int) -> bytes:
+    """
+    Run the default Trader over the start of a round and return a checkpoint
+    of the run for configurations to fork from.
+
+    :param round_data_path: File path of CSV containing market data.
+    :param trading_algo: Trading algo filepath.
+    :param ticks: Tick to stop the warmup before.
+    """
+    from checkpoint import Checkpoint
+    from dataimport import load_round, replay_round
+    from history import History, history_size
+    from indicators import IndicatorSet, trader_indicators
+    from main import import_trader, precompute, run_simulation
+    from metrics import MetricsRecorder
+    from wake import trader_wake
+
+    products, market_book, bot_book = load_round(round_data_path)
+    algo = import_trader(trading_algo)()
+    precompute(algo, market_book)
+    history = History(products, history_size(algo)) if history_size(algo) > 0 else None
+    indicators = IndicatorSet(products, trader_indicators(algo)) if trader_indicators(algo) else None
+    wake = trader_wake(algo)
+    portfolio, recorder = run_simulation(
+        replay_round(market_book, bot_book, end_tick=ticks),
+        products,
+        algo,
+        recorder=MetricsRecorder(products, capacity=market_book.ticks),
+        history=history,
+        indicators=indicators,
+        wake=wake,
+    )
+    last_tick = int(recorder.ticks[-1]) if recorder.size else 0
+    return Checkpoint(
+        last_tick, products, portfolio, algo, recorder, round_data_path, trading_algo,
+        history=history, indicators=indicators, wake=wake,
+    ).dumps()
+
+
+def write_results(results: List[Dict[str, Any]], file_path: str) -> None:
+    """
+    Write sweep results to a CSV file.
+
+    :param results: Result rows from run_sweep.
+    :param file_path: Output CSV path.
+    """
+    fieldnames: List[str] = []
+    for row in results:
+        fieldnames += [key for key in row if key not in fieldnames]
+    with open(file_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep Trader parameters over a round.")
+    parser.add_argument("--round", default="Round_3.csv", help="Main data file path")
+    parser.add_argument("--algo", default="examplealgo.py", help="Trading algorithm path")
+    parser.add_argument(
+        "--init", action="append", type=parse_param, default=[],
+        help="Constructor argument values, e.g. --init size=1,2,3",
+    )
+    parser.add_argument(
+        "--set", action="append", type=parse_param, default=[],
+        help="Attribute values set after construction, e.g. --set parity_threshold=3.5,4",
+    )
+    parser.add_argument("--samples", type=int, help="Randomly sample this many configurations")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --samples")
+    parser.add_argument("--workers", type=int, help="Number of worker processes")
+    parser.add_argument(
+        "--warmup", type=int,
+        help="Fork every configuration from one run of the default Trader up to this tick",
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Run the algo's BatchTrader on many configurations at once per worker",
+    )
+    parser.add_argument("--out", default="sweep_results.csv", help="Results CSV path")
+    args = parser.parse_args()
+
+    configs = build_configs(args.init, args.set, args.samples, args.seed)
+    try:
+        results = run_sweep(args.round, args.algo, configs, args.workers, args.warmup, args.batch)
+    except ImportError as e:
+        logging.error(e)
+        sys.exit(1)
+    write_results(results, args.out)
+
+    ranked = sorted(
+        (row for row in results if row["pnl"] is not None),
+        key=lambda row: row["pnl"],
+        reverse=True,
+    )
+    print(f"\n=== Top configurations ({len(ranked)}/{len(results)} ran) ===")
+    for row in ranked[:10]:
+        print(row)
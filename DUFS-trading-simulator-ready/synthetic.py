@@ -0,0 +1,282 @@
+"""
+Generate synthetic rounds in the Round_N.csv and Round_N_bots.csv schemas.
+
+Each product is either a random walk or a linear combination of other
+products plus noise, which gives structural relationships such as
+put-call parity (Call = Put + Underlying - 10000) or an ETF worth the sum of
+its bonds. Volatility, spread and bot arrival rate follow a schedule of
+regimes. Everything is generated with NumPy for all ticks at once, so
+millions of rows take seconds.
+
+Example:
+    python synthetic.py --out Round_9.csv --ticks 100000 --preset options \\
+        --preset etf --products 50 --regime 5000,1,1,0.7 --regime 1000,3,2,0.9
+"""
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LEVELS = 3
+
+
+class Product:
+    """
+    How to generate the fair price, spread, depth and bot orders of a product.
+    """
+    def __init__(
+        self,
+        name: str,
+        start: float = 1000,
+        volatility: float = 1.0,
+        components: Optional[Dict[str, float]] = None,
+        offset: float = 0.0,
+        noise: float = 0.0,
+        spread: int = 1,
+        depth: int = 30,
+        bot_size: int = 2,
+        bot_aggression: int = 0,
+    ) -> None:
+        """
+        :param name: Product name.
+        :param start: Fair price at tick 0 of a random walk.
+        :param volatility: Standard deviation of the random walk's steps.
+        :param components: Weights of other products whose sum, plus offset,
+            is this product's fair price instead of a random walk.
+        :param offset: Added to the weighted sum of components.
+        :param noise: Standard deviation of the mispricing added to the
+            weighted sum of components at every tick.
+        :param spread: Best bid to best ask in ticks, before regime scaling.
+        :param depth: Mean volume of the best level. Deeper levels hold more.
+        :param bot_size: Largest bot order volume.
+        :param bot_aggression: Largest number of ticks a bot order is placed
+            through the touch, so that it fills resting orders behind it.
+        """
+        self.name = name
+        self.start = start
+        self.volatility = volatility
+        self.components = components or {}
+        self.offset = offset
+        self.noise = noise
+        self.spread = spread
+        self.depth = depth
+        self.bot_size = bot_size
+        self.bot_aggression = bot_aggression
+
+
+class Regime:
+    """
+    Market conditions for a stretch of ticks.
+    """
+    def __init__(self, ticks: int, volatility: float = 1.0, spread: float = 1.0, bot_rate: float = 0.7) -> None:
+        """
+        :param ticks: Number of ticks the regime lasts.
+        :param volatility: Multiplier for random walk steps and mispricing noise.
+        :param spread: Multiplier for product spreads.
+        :param bot_rate: Probability of a bot order on each side of each
+            product at each tick.
+        """
+        if ticks <= 0:
+            raise ValueError(f"ticks must be positive, got {ticks}")
+        self.ticks = ticks
+        self.volatility = volatility
+        self.spread = spread
+        self.bot_rate = bot_rate
+
+    @classmethod
+    def parse(cls, text: str) -> "Regime":
+        """
+        Create a regime from "TICKS,VOLATILITY,SPREAD,BOT_RATE", where all but
+        TICKS may be left out.
+
+        :param text: Regime description.
+        """
+        fields = text.split(",")
+        return cls(int(fields[0]), *(float(field) for field in fields[1:]))
+
+
+def option_products(parity_const: float = 10000) -> List[Product]:
+    """
+    Underlying, Put and a Call priced by put-call parity, as in Round 3.
+
+    :param parity_const: Call - Put - Underlying + parity_const is zero
+        apart from noise.
+    """
+    return [
+        Product("Call", components={"Put": 1, "Underlying": 1}, offset=-parity_const, noise=1.5),
+        Product("Put", start=1000, volatility=10),
+        Product("Underlying", start=parity_const, volatility=20),
+    ]
+
+
+def etf_products() -> List[Product]:
+    """
+    Four bonds and two ETFs worth the sum of some of them, as in Round 2.
+    """
+    return [
+        Product("bond1", start=150),
+        Product("bond2", start=80),
+        Product("bond3", start=120),
+        Product("bond4", start=140, spread=20, bot_size=5, bot_aggression=10),
+        Product("ETF1", components={"bond1": 1, "bond2": 1, "bond3": 1}, noise=1.0, depth=40),
+        Product("ETF2", components={"bond2": 1, "bond4": 1}, noise=1.0, depth=40),
+    ]
+
+
+def random_walk_products(count: int, prefix: str = "P") -> List[Product]:
+    """
+    Independent random walk products, for testing with many products.
+
+    :param count: Number of products.
+    :param prefix: Product names are the prefix followed by a number.
+    """
+    return [Product(f"{prefix}{i}") for i in range(count)]
+
+
+PRESETS = {"options": option_products, "etf": etf_products}
+
+
+def regime_arrays(regimes: List[Regime], n_ticks: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Volatility, spread and bot rate at every tick, cycling through the regimes.
+
+    :param regimes: Regimes in the order they occur.
+    :param n_ticks: Number of ticks.
+    """
+    ends = np.cumsum([regime.ticks for regime in regimes])
+    index = np.searchsorted(ends, np.arange(n_ticks) % ends[-1], side="right")
+    volatility = np.array([regime.volatility for regime in regimes])[index]
+    spread = np.array([regime.spread for regime in regimes])[index]
+    bot_rate = np.array([regime.bot_rate for regime in regimes])[index]
+    return volatility, spread, bot_rate
+
+
+def fair_prices(products: List[Product], volatility: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Fair price of every product at every tick, of shape (ticks, products).
+
+    :param products: Products to price. Products with components may use
+        any random walk product, but only combined products listed before them.
+    :param volatility: Volatility multiplier at every tick.
+    :param rng: Random generator.
+    """
+    n_ticks = len(volatility)
+    columns: Dict[str, np.ndarray] = {}
+    # Random walks first, so that derived products can use any of them
+    for product in products:
+        if not product.components:
+            steps = rng.normal(0, product.volatility, n_ticks) * volatility
+            steps[0] = 0
+            columns[product.name] = product.start + np.cumsum(steps)
+    for product in products:
+        if product.components:
+            missing = [name for name in product.components if name not in columns]
+            if missing:
+                raise ValueError(f"{product.name} depends on {missing[0]}, which is not a random walk or an earlier product")
+            value = np.full(n_ticks, product.offset, dtype=np.float64)
+            for name, weight in product.components.items():
+                value += weight * columns[name]
+            if product.noise:
+                value += rng.normal(0, product.noise, n_ticks) * volatility
+            columns[product.name] = value
+    return np.stack([columns[product.name] for product in products], axis=1)
+
+
+def generate_round(
+    n_ticks: int,
+    products: List[Product],
+    regimes: Optional[List[Regime]] = None,
+    seed: int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Market and bot order frames for a synthetic round, one row per tick and
+    product in the column order of the Round_N.csv files.
+
+    :param n_ticks: Number of ticks.
+    :param products: Products to generate, in row order within a tick.
+    :param regimes: Schedule of market conditions, cycled if it is shorter
+        than the round. Defaults to a single regime with default settings.
+    :param seed: Seed for all random draws.
+    """
+    rng = np.random.default_rng(seed)
+    volatility, spread_scale, bot_rate = regime_arrays(regimes or [Regime(n_ticks)], n_ticks)
+    fair = fair_prices(products, volatility, rng)
+    shape = fair.shape
+
+    base_spread = np.array([product.spread for product in products])
+    spread = np.maximum(1, np.rint(spread_scale[:, None] * base_spread)).astype(np.int64)
+    # Keep every level at a positive price
+    bid = np.maximum(np.rint(fair - spread / 2).astype(np.int64), LEVELS)
+    ask = bid + spread
+
+    depth = np.array([product.depth for product in products], dtype=np.float64)
+    timestamps = np.repeat(np.arange(n_ticks, dtype=np.int64) * 100, len(products))
+    names = np.tile(np.array([product.name for product in products], dtype=object), n_ticks)
+
+    market = {"timestamp": timestamps}
+    for side, best, step in (("bid", bid, -1), ("ask", ask, 1)):
+        for i in range(LEVELS):
+            market[f"{side}_price_{i + 1}"] = (best + step * i).ravel()
+            market[f"{side}_volume_{i + 1}"] = rng.poisson(depth * (1 + 0.8 * i), size=shape).ravel()
+    market["product"] = names
+    market_df = pd.DataFrame(market)
+    # Column order of the round files: bids, then asks, then product
+    market_df = market_df[
+        ["timestamp"]
+        + [f"bid_{field}_{i + 1}" for i in range(LEVELS) for field in ("price", "volume")]
+        + [f"ask_{field}_{i + 1}" for i in range(LEVELS) for field in ("price", "volume")]
+        + ["product"]
+    ]
+
+    bot_size = np.array([product.bot_size for product in products])
+    aggression = np.array([product.bot_aggression for product in products])
+    bots = {}
+    for side, best, step in (("bid", bid, 1), ("ask", ask, -1)):
+        arrived = rng.random(shape) < bot_rate[:, None]
+        volume = np.where(arrived, rng.integers(1, bot_size + 1, size=shape), 0)
+        price = best + step * rng.integers(0, aggression + 1, size=shape)
+        bots[f"{side}_price_1"] = np.maximum(price, 1).ravel()
+        bots[f"{side}_volume_1"] = volume.ravel()
+    bots["product"] = names
+    bots["timestamp"] = timestamps
+    return market_df, pd.DataFrame(bots)
+
+
+def write_round(file_path: str, market_df: pd.DataFrame, bot_df: pd.DataFrame) -> None:
+    """
+    Write a round's market orders to file_path and its bot orders to the
+    matching _bots.csv file.
+
+    :param file_path: File path of the market data CSV, ending in .csv.
+    :param market_df: Market orders from generate_round.
+    :param bot_df: Bot orders from generate_round.
+    """
+    market_df.to_csv(file_path, index=False)
+    bot_df.to_csv(file_path[:-4] + "_bots.csv", index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic round.")
+    parser.add_argument("--out", required=True, help="Market data file path, e.g. Round_9.csv")
+    parser.add_argument("--ticks", type=int, default=1000, help="Number of ticks")
+    parser.add_argument(
+        "--preset", action="append", choices=sorted(PRESETS),
+        help="Product set to include, can be repeated",
+    )
+    parser.add_argument("--products", type=int, default=0, help="Number of extra random walk products")
+    parser.add_argument(
+        "--regime", action="append", type=Regime.parse,
+        help="TICKS,VOLATILITY,SPREAD,BOT_RATE, can be repeated to cycle through regimes",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    products = []
+    for preset in args.preset or ([] if args.products else ["options"]):
+        products += PRESETS[preset]()
+    products += random_walk_products(args.products)
+
+    market_df, bot_df = generate_round(args.ticks, products, args.regime, args.seed)
+    write_round(args.out, market_df, bot_df)
+    print(f"Wrote {len(market_df)} rows of {len(products)} products to {args.out}")
@@ -0,0 +1,36 @@
+"""
+prepare_analytics_data against its output before it was rewritten as a
+pivot, frozen in tests/data/analytics_<round>.csv.gz.
+
+The frozen frames were built by the original per-tick implementation over
+ticks 1-1599 of each round, with the PnL column of _quantity_data. Both
+rounds end before tick 1599, so the last rows have no prices.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataimport import read_file
+from main import prepare_analytics_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, "tests", "data")
+
+
+def _quantity_data() -> pd.DataFrame:
+    ticks = pd.Index(np.arange(1, 1600), name="tick")
+    return pd.DataFrame({"PnL": np.arange(len(ticks)) * 1.5 - 100}, index=ticks)
+
+
+@pytest.mark.parametrize("round_name", ["Round_2", "Round_3"])
+def test_matches_frozen_output(round_name):
+    products, _, market_data = read_file(os.path.join(ROOT, f"{round_name}.csv"))
+    expected = pd.read_csv(os.path.join(DATA, f"analytics_{round_name}.csv.gz"), index_col="tick")
+
+    analytics_df = prepare_analytics_data(_quantity_data(), products, market_data)
+
+    pd.testing.assert_frame_equal(analytics_df, expected)
+    # Ticks past the end of the round have no prices
+    assert analytics_df.drop(columns="pnl").iloc[-1].isna().all()
@@ -0,0 +1,68 @@
+"""
+run_batch_simulation against the scalar engine, with examplealgo_batch.py
+against the examplealgo.py strategy it vectorises.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from batch import run_batch_simulation
+from dataimport import load_round, replay_round
+from main import POSITION_LIMIT, import_trader, max_drawdown, run_simulation
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One configuration per simulation, the first being the defaults
+CONFIGS = [
+    {},
+    {"parity_threshold": 3.0},
+    {"parity_threshold": 4.5, "hedge_threshold": 3},
+    {"hedge_unit": 4, "soft_limit": 20, "hard_limit": 30},
+]
+
+
+@pytest.fixture(scope="module")
+def round_3():
+    return load_round(os.path.join(ROOT, "Round_3.csv"))
+
+
+def _batch(round_3, end_tick=None):
+    _, market_book, bot_book = round_3
+    algo = import_trader(os.path.join(ROOT, "examplealgo_batch.py"), "BatchTrader")(len(CONFIGS))
+    for i, config in enumerate(CONFIGS):
+        for name, value in config.items():
+            getattr(algo, name)[i] = value
+    return run_batch_simulation(market_book, bot_book, algo, len(CONFIGS), POSITION_LIMIT, end_tick=end_tick)
+
+
+def _scalar(round_3, config, end_tick=None):
+    products, market_book, bot_book = round_3
+    algo = import_trader(os.path.join(ROOT, "examplealgo.py"))()
+    for name, value in config.items():
+        setattr(algo, name, value)
+    portfolio, recorder = run_simulation(replay_round(market_book, bot_book, end_tick=end_tick), products, algo)
+    return portfolio, recorder
+
+
+@pytest.mark.parametrize("end_tick", [200, None])
+def test_batch_matches_the_scalar_engine(round_3, end_tick):
+    batch = _batch(round_3, end_tick)
+
+    for i, config in enumerate(CONFIGS):
+        portfolio, recorder = _scalar(round_3, config, end_tick)
+        assert batch.pnl[i] == portfolio.pnl, config
+        assert batch.cash[i] == portfolio.cash, config
+        for j, product in enumerate(batch.products):
+            assert batch.positions[i, j] == portfolio.quantity[product], (config, product)
+            assert batch.fill_counts[i, j] == portfolio.fills[product], (config, product)
+        assert batch.max_drawdown[i] == pytest.approx(max_drawdown(recorder.pnl)), config
+
+
+def test_batch_defaults_follow_the_scalar_trader():
+    trader = import_trader(os.path.join(ROOT, "examplealgo.py"))()
+    batch = import_trader(os.path.join(ROOT, "examplealgo_batch.py"), "BatchTrader")(3)
+
+    for name, value in vars(batch).items():
+        if isinstance(value, np.ndarray):
+            assert (value == getattr(trader, name)).all(), name
@@ -0,0 +1,100 @@
+"""
+The binary round cache of load_round.
+"""
+import hashlib
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataimport
+from dataimport import MarketData, load_round
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def round_path(tmp_path):
+    for name in ("Round_3.csv", "Round_3_bots.csv"):
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    return str(tmp_path / "Round_3.csv")
+
+
+def _assert_same_data(loaded: MarketData, parsed: MarketData) -> None:
+    assert loaded.products == parsed.products
+    assert loaded.skip_empty == parsed.skip_empty
+    for name in MarketData.ARRAYS:
+        array, expected = getattr(loaded, name), getattr(parsed, name)
+        assert array.dtype == expected.dtype, name
+        np.testing.assert_array_equal(array, expected, err_msg=name)
+
+
+def _assert_same_round(loaded: tuple, parsed: tuple) -> None:
+    assert loaded[0] == parsed[0]
+    _assert_same_data(loaded[1], parsed[1])
+    _assert_same_data(loaded[2], parsed[2])
+
+
+def _cache_entries(cache_dir) -> list:
+    return sorted(entry for entry in os.listdir(cache_dir) if not entry.startswith("."))
+
+
+def _no_parse(*args, **kwargs):
+    raise AssertionError("the CSVs were parsed")
+
+
+def test_cache_hit_matches_a_fresh_parse(round_path, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    parsed = load_round(round_path, use_cache=False)
+
+    written = load_round(round_path, cache_dir=str(cache_dir))
+    monkeypatch.setattr(dataimport, "read_round", _no_parse)
+    hit = load_round(round_path, cache_dir=str(cache_dir))
+
+    assert len(_cache_entries(cache_dir)) == 1
+    assert isinstance(hit[1].bid_prices, np.memmap)
+    _assert_same_round(written, parsed)
+    _assert_same_round(hit, parsed)
+
+
+@pytest.mark.parametrize("edited", ["Round_3.csv", "Round_3_bots.csv"])
+def test_editing_a_csv_invalidates_the_cache(round_path, tmp_path, monkeypatch, edited):
+    cache_dir = tmp_path / "cache"
+    load_round(round_path, cache_dir=str(cache_dir))
+    (old_entry,) = _cache_entries(cache_dir)
+
+    csv_path = tmp_path / edited
+    df = pd.read_csv(csv_path)
+    df.loc[0, "bid_volume_1"] += 7
+    df.to_csv(csv_path, index=False)
+    reloaded = load_round(round_path, cache_dir=str(cache_dir))
+
+    (new_entry,) = _cache_entries(cache_dir)
+    assert new_entry != old_entry
+    assert new_entry.startswith("Round_3-")
+    _assert_same_round(reloaded, load_round(round_path, use_cache=False))
+    data = reloaded[1] if edited == "Round_3.csv" else reloaded[2]
+    product = data.product_ids[df.loc[0, "product"]]
+    assert data.bid_volumes[df.loc[0, "timestamp"] // 100, product, 0] == df.loc[0, "bid_volume_1"]
+
+    # The new entry is a cache hit from now on
+    monkeypatch.setattr(dataimport, "read_round", _no_parse)
+    _assert_same_round(load_round(round_path, cache_dir=str(cache_dir)), reloaded)
+
+
+def test_cache_key_is_the_sha256_of_both_csvs(round_path, tmp_path):
+    bot_path = round_path[:-4] + "_bots.csv"
+    digest = dataimport.file_digest(round_path)
+
+    with open(round_path, "rb") as f:
+        contents = f.read()
+    assert digest == hashlib.sha256(contents).hexdigest()
+
+    # Touching a file without changing it keeps the same entry
+    cache_dir = tmp_path / "cache"
+    load_round(round_path, cache_dir=str(cache_dir))
+    os.utime(bot_path, (0, 0))
+    load_round(round_path, cache_dir=str(cache_dir))
+    assert len(_cache_entries(cache_dir)) == 1
@@ -0,0 +1,97 @@
+"""
+Resuming a backtest from a checkpoint gives the same result as running it
+without stopping.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from main import run_backtest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUND = os.path.join(ROOT, "Round_3.csv")
+ALGO = os.path.join(ROOT, "examplealgo.py")
+
+# Overruns its latency budget on tick 50 only
+SLOW_ALGO = """
+import time
+
+from datamodel import Order
+
+
+class Trader:
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, state):
+        self.calls += 1
+        if state.tick == 50:
+            time.sleep(0.05)
+        return [Order("Underlying", 10010, 1)] if state.tick % 10 == 0 else []
+"""
+
+
+def _run(tmp_path, name: str, trading_algo: str = ALGO, **kwargs) -> dict:
+    metrics_path = str(tmp_path / f"{name}_metrics.csv")
+    fills_path = str(tmp_path / f"{name}_fills.csv")
+    summary = run_backtest(ROUND, trading_algo, metrics_path=metrics_path, fills_path=fills_path, **kwargs)
+    summary["metrics"] = pd.read_csv(metrics_path)
+    summary["fill_rows"] = pd.read_csv(fills_path)
+    return summary
+
+
+def _assert_same_run(resumed: dict, full: dict) -> None:
+    for key in ("ticks", "pnl", "cash", "positions", "fills"):
+        assert resumed[key] == full[key], key
+    pd.testing.assert_frame_equal(resumed["metrics"], full["metrics"])
+    pd.testing.assert_frame_equal(resumed["fill_rows"], full["fill_rows"])
+
+
+@pytest.mark.parametrize("persist_orders", [False, True])
+def test_resume_matches_an_uninterrupted_run(tmp_path, persist_orders):
+    checkpoint_path = str(tmp_path / "run.ckpt")
+    full = _run(tmp_path, "full", max_ticks=700, persist_orders=persist_orders)
+
+    # Stops after tick 399, with the last checkpoint at tick 300
+    _run(tmp_path, "first", max_ticks=400, persist_orders=persist_orders,
+         checkpoint_path=checkpoint_path, checkpoint_every=150)
+    resumed = _run(tmp_path, "resumed", max_ticks=700, persist_orders=persist_orders,
+                   checkpoint_path=checkpoint_path, checkpoint_every=150, resume=True)
+
+    assert resumed["resumed_from"] == 300
+    _assert_same_run(resumed, full)
+
+
+def test_resume_keeps_a_killed_algo_killed(tmp_path):
+    algo_path = tmp_path / "slow_algo.py"
+    algo_path.write_text(SLOW_ALGO)
+    checkpoint_path = str(tmp_path / "run.ckpt")
+    options = dict(trading_algo=str(algo_path), latency_budget_us=20000, on_overrun="kill")
+    full = _run(tmp_path, "full", max_ticks=300, **options)
+    assert full["latency_budget"]["killed_at"] == 50
+
+    _run(tmp_path, "first", max_ticks=150, checkpoint_path=checkpoint_path, checkpoint_every=100, **options)
+    resumed = _run(tmp_path, "resumed", max_ticks=300, checkpoint_path=checkpoint_path,
+                   checkpoint_every=100, resume=True, **options)
+
+    assert resumed["latency_budget"] == full["latency_budget"]
+    _assert_same_run(resumed, full)
+
+
+def test_resume_needs_the_same_latency_budget_setting(tmp_path):
+    checkpoint_path = str(tmp_path / "run.ckpt")
+    run_backtest(ROUND, ALGO, max_ticks=150, checkpoint_path=checkpoint_path, checkpoint_every=100,
+                 latency_budget_us=1e6)
+
+    with pytest.raises(ValueError, match="latency budget"):
+        run_backtest(ROUND, ALGO, max_ticks=300, checkpoint_path=checkpoint_path, resume=True)
+
+
+def test_resume_rejects_another_algo(tmp_path):
+    checkpoint_path = str(tmp_path / "run.ckpt")
+    run_backtest(ROUND, ALGO, max_ticks=150, checkpoint_path=checkpoint_path, checkpoint_every=100)
+
+    with pytest.raises(ValueError, match="algo"):
+        run_backtest(ROUND, os.path.join(ROOT, "Round_2_code.py"), max_ticks=300,
+                     checkpoint_path=checkpoint_path, resume=True)
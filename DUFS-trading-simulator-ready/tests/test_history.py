@@ -0,0 +1,104 @@
+"""
+The ring buffers of History as they fill up and wrap around.
+"""
+import numpy as np
+import pytest
+
+from datamodel import OrderBook
+from history import History
+
+PRODUCTS = ["A", "B"]
+
+
+def _record(history: History, tick: int) -> dict:
+    """
+    Record a tick where A's best bid is 10 * tick and B's is 5 * tick, and
+    return the row History should hold for it.
+    """
+    orderbook = {
+        "A": OrderBook({10 * tick: 1}, {10 * tick + 2: 1}),
+        "B": OrderBook({5 * tick: 1}, {5 * tick + 4: 1}),
+    }
+    positions = [tick, -tick]
+    history.record(tick, orderbook, positions)
+    return {
+        "tick": tick,
+        "best_bid": [10 * tick, 5 * tick],
+        "best_ask": [10 * tick + 2, 5 * tick + 4],
+        "mid": [10 * tick + 1, 5 * tick + 2],
+        "position": positions,
+    }
+
+
+def _assert_holds(history: History, rows: list, n=None) -> None:
+    expected = rows if n is None else rows[max(len(rows) - n, 0):]
+    np.testing.assert_array_equal(history.ticks(n), [row["tick"] for row in expected])
+    for field in History.FIELDS:
+        values = history.get(field, n)
+        assert values.shape == (len(expected), len(PRODUCTS)), field
+        np.testing.assert_array_equal(values, np.array([row[field] for row in expected]).reshape(-1, 2), field)
+        np.testing.assert_array_equal(history.series(field, "B", n), [row[field][1] for row in expected])
+
+
+def test_empty_history():
+    history = History(PRODUCTS, 3)
+
+    assert len(history) == 0
+    _assert_holds(history, [])
+    _assert_holds(history, [], n=2)
+
+
+@pytest.mark.parametrize("capacity", [1, 3, 4])
+def test_last_ticks_come_oldest_first_through_every_wraparound(capacity):
+    history = History(PRODUCTS, capacity)
+    rows = []
+
+    for tick in range(1, 3 * capacity + 3):
+        rows.append(_record(history, tick))
+        held = rows[-capacity:]
+        assert len(history) == len(held)
+        _assert_holds(history, held)
+        for n in range(0, capacity + 2):
+            _assert_holds(history, held, n=n)
+
+
+def test_missing_and_one_sided_books_are_nan():
+    history = History(PRODUCTS, 2)
+    _record(history, 1)
+    _record(history, 2)
+
+    # Overwrites tick 1's slot, which had both books
+    history.record(3, {"A": OrderBook({30: 1}, {})}, [0, 0])
+
+    np.testing.assert_array_equal(history.series("best_bid", "A"), [20, 30])
+    np.testing.assert_array_equal(history.series("best_ask", "A"), [22, np.nan])
+    np.testing.assert_array_equal(history.series("mid", "A"), [21, np.nan])
+    for field, value in zip(History.PRICES, (10, 14, 12)):
+        np.testing.assert_array_equal(history.series(field, "B"), [value, np.nan])
+
+
+def test_reads_are_read_only_views_until_the_buffer_wraps():
+    history = History(PRODUCTS, 2)
+    _record(history, 1)
+    _record(history, 2)
+
+    bids = history.series("best_bid", "A")
+    kept = bids.copy()
+    with pytest.raises(ValueError):
+        bids[0] = 0
+    _record(history, 3)
+    _record(history, 4)
+
+    # The view shows the buffer as it is now, the copy what it was
+    np.testing.assert_array_equal(kept, [10, 20])
+    assert not np.array_equal(bids, kept)
+    np.testing.assert_array_equal(history.series("best_bid", "A"), [30, 40])
+
+
+def test_unknown_field():
+    history = History(PRODUCTS, 2)
+
+    with pytest.raises(KeyError, match="Unknown history field"):
+        history.get("volume")
+    with pytest.raises(ValueError):
+        History(PRODUCTS, 0)
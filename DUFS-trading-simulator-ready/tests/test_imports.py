@@ -0,0 +1,28 @@
+"""
+A cached headless backtest only imports what the run needs.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPTIONAL = ("pandas", "checkpoint", "history", "indicators", "wake", "latency", "cProfile", "pstats")
+
+
+def _python(code: str) -> str:
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def test_cached_backtest_skips_optional_imports():
+    # Builds the cache if it is missing, which does need pandas
+    _python('from dataimport import load_round; load_round("Round_3.csv")')
+
+    loaded = _python(
+        "import sys, main\n"
+        'main.run_backtest("Round_3.csv", "examplealgo.py", max_ticks=50)\n'
+        f'print(",".join(name for name in {OPTIONAL!r} if name in sys.modules))'
+    )
+
+    assert loaded == ""
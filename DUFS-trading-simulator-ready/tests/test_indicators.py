@@ -0,0 +1,171 @@
+"""
+The streaming indicators against their pandas rolling and ewm equivalents.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import (
+    EWMA, Indicator, RollingMax, RollingMean, RollingMin, RollingRegression, RollingStd,
+    RollingVariance, ZScore,
+)
+
+
+def _series() -> pd.Series:
+    """
+    A random walk around a price level, with a constant stretch.
+    """
+    rng = np.random.default_rng(0)
+    values = np.round(10000 + np.cumsum(rng.normal(size=2000)), 1)
+    values[500:560] = 10010.0
+    return pd.Series(values)
+
+
+def _run(indicator: Indicator, *inputs: pd.Series) -> np.ndarray:
+    """
+    Feed the inputs to the indicator and collect its value after each, NaN for None.
+    """
+    out = []
+    for values in zip(*inputs):
+        value = indicator.update(*values)
+        out.append(np.nan if value is None else value)
+    return np.array(out, dtype=float)
+
+
+def _constant(x: pd.Series, window: int) -> pd.Series:
+    """
+    Whether each window of x holds a single value. pandas leaves rounding
+    noise in the variance of such windows, where the indicators give exactly
+    zero, or None for anything divided by it.
+    """
+    return x.rolling(window).max() == x.rolling(window).min()
+
+
+def _assert_matches(got: np.ndarray, expected: pd.Series) -> None:
+    np.testing.assert_allclose(got, expected.to_numpy(dtype=float), rtol=1e-7, atol=1e-6, equal_nan=True)
+
+
+@pytest.mark.parametrize("span", [1, 10, 100])
+def test_ewma_span(span):
+    x = _series()
+    _assert_matches(_run(EWMA(span=span), x), x.ewm(span=span, adjust=False).mean())
+
+
+def test_ewma_alpha():
+    x = _series()
+    _assert_matches(_run(EWMA(alpha=0.3), x), x.ewm(alpha=0.3, adjust=False).mean())
+
+
+@pytest.mark.parametrize("window", [1, 5, 50])
+def test_rolling_mean(window):
+    x = _series()
+    _assert_matches(_run(RollingMean(window), x), x.rolling(window).mean())
+
+
+@pytest.mark.parametrize("window", [2, 5, 50])
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_rolling_variance(window, ddof):
+    x = _series()
+    _assert_matches(_run(RollingVariance(window, ddof=ddof), x), x.rolling(window).var(ddof=ddof))
+
+
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_expanding_variance(ddof):
+    x = _series()
+    expected = x.expanding(ddof + 1).var(ddof=ddof)
+    _assert_matches(_run(RollingVariance(ddof=ddof), x), expected)
+
+
+@pytest.mark.parametrize("window", [2, 5, 50])
+def test_rolling_std(window):
+    x = _series()
+    expected = x.rolling(window).std()
+    expected[_constant(x, window)] = 0.0
+    _assert_matches(_run(RollingStd(window), x), expected)
+
+
+def test_constant_window_has_zero_variance():
+    x = _series()
+    variance = _run(RollingVariance(20), x)
+    std = _run(RollingStd(20), x)
+    # Windows wholly inside the constant stretch
+    assert (variance[519:560] == 0).all()
+    assert (std[519:560] == 0).all()
+
+
+@pytest.mark.parametrize("window", [5, 50])
+def test_zscore(window):
+    x = _series()
+    expected = (x - x.rolling(window).mean()) / x.rolling(window).std()
+    expected[_constant(x, window)] = np.nan
+    _assert_matches(_run(ZScore(window), x), expected)
+
+
+def test_zscore_constant_window_is_none():
+    indicator = ZScore(5)
+    for _ in range(10):
+        assert indicator.update(3.0) is None
+    assert not indicator.ready
+
+
+@pytest.mark.parametrize("window", [1, 5, 50])
+def test_rolling_max(window):
+    x = _series()
+    _assert_matches(_run(RollingMax(window), x), x.rolling(window).max())
+
+
+@pytest.mark.parametrize("window", [1, 5, 50])
+def test_rolling_min(window):
+    x = _series()
+    _assert_matches(_run(RollingMin(window), x), x.rolling(window).min())
+
+
+@pytest.mark.parametrize("window", [5, 50])
+def test_rolling_regression(window):
+    x = _series()
+    rng = np.random.default_rng(1)
+    y = 0.46 * x + rng.normal(scale=3, size=len(x))
+    slope = x.rolling(window).cov(y) / x.rolling(window).var()
+    slope[_constant(x, window)] = np.nan
+    intercept = y.rolling(window).mean() - slope * x.rolling(window).mean()
+    correlation = x.rolling(window).corr(y)
+    correlation[_constant(x, window)] = np.nan
+
+    indicator = RollingRegression(window)
+    slopes, intercepts, correlations = [], [], []
+    for a, b in zip(x, y):
+        indicator.update(a, b)
+        slopes.append(np.nan if indicator.slope is None else indicator.slope)
+        intercepts.append(np.nan if indicator.intercept is None else indicator.intercept)
+        correlations.append(np.nan if indicator.correlation is None else indicator.correlation)
+    _assert_matches(np.array(slopes), slope)
+    # The intercept is the difference of two terms of several thousand, so
+    # is only as precise as those
+    np.testing.assert_allclose(intercepts, intercept, rtol=1e-5, atol=1e-3, equal_nan=True)
+    _assert_matches(np.array(correlations), correlation)
+
+
+def test_rolling_regression_constant_x_is_none():
+    indicator = RollingRegression(5)
+    for y in range(10):
+        assert indicator.update(2.0, float(y)) is None
+    assert not indicator.ready
+    assert indicator.intercept is None
+    assert indicator.correlation is None
+
+
+def test_not_ready_until_window_full():
+    for indicator in (RollingMean(3), RollingVariance(3), RollingStd(3), RollingMax(3), RollingMin(3)):
+        assert indicator.update(1.0) is None
+        assert indicator.update(2.0) is None
+        assert indicator.update(4.0) is not None
+        assert indicator.ready
+
+
+def test_indicator_is_abstract():
+    class Incomplete(Indicator):
+        def update(self, value):
+            return value
+
+    with pytest.raises(TypeError):
+        Incomplete()
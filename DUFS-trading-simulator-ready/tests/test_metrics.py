@@ -0,0 +1,112 @@
+"""
+MetricsRecorder growing its arrays during a run and building the dataframes
+at the end of it.
+"""
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from datamodel import Portfolio
+from metrics import MetricsRecorder
+
+PRODUCTS = ["A", "B"]
+
+
+def _record_ticks(recorder: MetricsRecorder, portfolio: Portfolio, ticks: range) -> list:
+    rows = []
+    for tick in ticks:
+        portfolio.cash = -10.5 * tick
+        portfolio.pnl = 3.25 * tick
+        portfolio.quantity["A"] = tick % 7
+        portfolio.quantity["B"] = -(tick % 5)
+        recorder.record(tick, portfolio)
+        rows.append({"tick": tick, "PnL": portfolio.pnl, "Cash": portfolio.cash,
+                     "A_quantity": tick % 7, "B_quantity": -(tick % 5)})
+    return rows
+
+
+def _record_fills(recorder: MetricsRecorder, count: int) -> list:
+    rows = []
+    for i in range(count):
+        recorder.tick = i // 3
+        product, price, quantity = PRODUCTS[i % 2], 100 + i, (i % 4) - 2 or 1
+        counterparty = "bot" if i % 3 == 0 else "book"
+        recorder.record_fill(product, price, quantity, counterparty)
+        rows.append({"tick": i // 3, "product": product, "side": "BUY" if quantity > 0 else "SELL",
+                     "price": float(price), "quantity": abs(quantity), "counterparty": counterparty})
+    return rows
+
+
+def _expected_metrics(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows).set_index("tick")
+
+
+def _expected_fills(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    df["product"] = pd.Categorical(df["product"], categories=PRODUCTS)
+    df["counterparty"] = pd.Categorical(df["counterparty"], categories=["book", "bot"])
+    return df
+
+
+def test_ticks_grow_past_capacity_without_losing_rows():
+    recorder = MetricsRecorder(PRODUCTS, capacity=2)
+    portfolio = Portfolio(PRODUCTS)
+
+    rows = _record_ticks(recorder, portfolio, range(1, 40))
+
+    assert recorder.size == 39
+    assert len(recorder._ticks) == 64
+    np.testing.assert_array_equal(recorder.ticks, np.arange(1, 40))
+    np.testing.assert_array_equal(recorder.pnl, [row["PnL"] for row in rows])
+    np.testing.assert_array_equal(recorder.cash, [row["Cash"] for row in rows])
+    np.testing.assert_array_equal(recorder.positions("B"), [row["B_quantity"] for row in rows])
+    pd.testing.assert_frame_equal(recorder.to_frame(), _expected_metrics(rows))
+
+
+def test_fills_grow_past_capacity_without_losing_rows():
+    recorder = MetricsRecorder(PRODUCTS, fill_capacity=1)
+
+    rows = _record_fills(recorder, 25)
+
+    assert recorder.fill_count == 25
+    assert len(recorder._fill_ticks) == 32
+    pd.testing.assert_frame_equal(recorder.fills_frame(), _expected_fills(rows))
+
+
+def test_empty_recorder_gives_empty_frames():
+    recorder = MetricsRecorder(PRODUCTS, capacity=0, fill_capacity=0)
+
+    assert list(recorder.to_frame().columns) == ["PnL", "Cash", "A_quantity", "B_quantity"]
+    assert recorder.to_frame().empty
+    assert recorder.fills_frame().empty
+
+
+def test_pickled_recorder_keeps_its_rows_and_grows_again():
+    recorder = MetricsRecorder(PRODUCTS, capacity=4, fill_capacity=4)
+    portfolio = Portfolio(PRODUCTS)
+    rows = _record_ticks(recorder, portfolio, range(1, 6))
+    fills = _record_fills(recorder, 5)
+
+    restored = pickle.loads(pickle.dumps(recorder))
+
+    # Only the recorded rows are kept, so the next row grows the arrays
+    assert len(restored._ticks) == 5 and len(restored._fill_ticks) == 5
+    rows += _record_ticks(restored, portfolio, range(6, 20))
+    restored.record_fill("B", 99, -3, "book")
+    fills.append({"tick": restored.tick, "product": "B", "side": "SELL", "price": 99.0,
+                  "quantity": 3, "counterparty": "book"})
+    pd.testing.assert_frame_equal(restored.to_frame(), _expected_metrics(rows))
+    pd.testing.assert_frame_equal(restored.fills_frame(), _expected_fills(fills))
+
+
+def test_flush_writes_the_frames(tmp_path):
+    recorder = MetricsRecorder(PRODUCTS, capacity=1, fill_capacity=1)
+    rows = _record_ticks(recorder, Portfolio(PRODUCTS), range(1, 10))
+    fills = _record_fills(recorder, 10)
+
+    recorder.flush(str(tmp_path / "metrics.csv"), str(tmp_path / "fills.csv"))
+
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "metrics.csv", index_col="tick"), _expected_metrics(rows))
+    written = pd.read_csv(tmp_path / "fills.csv")
+    pd.testing.assert_frame_equal(written, _expected_fills(fills).astype({"product": str, "counterparty": str}))
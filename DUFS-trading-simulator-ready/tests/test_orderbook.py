@@ -0,0 +1,239 @@
+"""
+The FIFO matching engine: BookSide queues and OrderBook.execute, submit and
+cancel, and the algo order matching built on them in ordermatching.py.
+"""
+from datamodel import Fill, OrderBook, Order, Portfolio, RestingOrder
+from ordermatching import match_algo_order
+
+
+def _queue(book: OrderBook, side: str, price: int) -> list:
+    return [(order.owner, order.order_id, order.quantity) for order in book[side].queue(price)]
+
+
+def test_snapshot_levels_read_like_dicts():
+    book = OrderBook({100: 5, 99: 4}, {101: 3, 103: 2})
+    assert dict(book["BUY"]) == {100: 5, 99: 4}
+    assert list(book["SELL"]) == [101, 103]
+    assert book["BUY"].best_price() == 100
+    assert book["SELL"].best_price() == 101
+    assert book.mid_price() == 100.5
+
+
+def test_book_before_algo_at_one_price():
+    book = OrderBook({100: 5}, {})
+    algo = book.submit("BUY", 100, 3, "algo")
+    assert _queue(book, "BUY", 100) == [("book", None, 5), ("algo", algo.order_id, 3)]
+
+    unfilled, fills = book.execute("SELL", 100, 6, "bot")
+
+    assert unfilled == 0
+    assert fills == [
+        Fill(100, 5, "SELL", "bot", "book", None),
+        Fill(100, 1, "SELL", "bot", "algo", algo.order_id),
+    ]
+    assert _queue(book, "BUY", 100) == [("algo", algo.order_id, 2)]
+    assert book["BUY"][100] == 2
+
+
+def test_algo_before_later_book_quantity_at_one_price():
+    book = OrderBook({}, {})
+    algo = book.submit("SELL", 101, 3, "algo")
+    # Market quantity arriving after the algo order queues behind it
+    book["SELL"].set_book_quantity(101, 4)
+    assert _queue(book, "SELL", 101) == [("algo", algo.order_id, 3), ("book", None, 4)]
+
+    _, fills = book.execute("BUY", 101, 5, "bot")
+
+    assert [(fill.owner, fill.quantity) for fill in fills] == [("algo", 3), ("book", 2)]
+    assert book.order(algo.order_id) is None
+
+
+def test_orders_of_one_owner_fill_in_submit_order():
+    book = OrderBook({}, {})
+    first = book.submit("BUY", 100, 2, "algo")
+    second = book.submit("BUY", 100, 2, "algo")
+
+    _, fills = book.execute("SELL", 100, 3, "bot")
+
+    assert [(fill.order_id, fill.quantity) for fill in fills] == [(first.order_id, 2), (second.order_id, 1)]
+
+
+def test_best_price_first_and_at_resting_price():
+    book = OrderBook({}, {101: 2, 102: 2, 104: 2})
+
+    unfilled, fills = book.execute("BUY", 103, 10, "algo")
+
+    assert unfilled == 6
+    assert [(fill.price, fill.quantity) for fill in fills] == [(101, 2), (102, 2)]
+    assert dict(book["SELL"]) == {104: 2}
+
+
+def test_partial_fill_leaves_the_rest_resting():
+    book = OrderBook({100: 5}, {})
+
+    unfilled, fills = book.execute("SELL", 100, 3, "bot")
+
+    assert unfilled == 0
+    assert fills == [Fill(100, 3, "SELL", "bot", "book", None)]
+    assert dict(book["BUY"]) == {100: 2}
+
+
+def test_leftover_quantity_returned_without_resting():
+    book = OrderBook({100: 5}, {})
+
+    unfilled, _ = book.execute("SELL", 100, 8, "bot")
+
+    assert unfilled == 3
+    assert len(book["BUY"]) == 0
+    # execute never rests the leftover, so the other side is untouched
+    assert len(book["SELL"]) == 0
+
+
+def test_emptied_level_is_removed():
+    book = OrderBook({100: 2, 99: 4}, {})
+    algo = book.submit("BUY", 100, 1, "algo")
+
+    book.execute("SELL", 100, 3, "bot")
+
+    assert 100 not in book["BUY"]
+    assert list(book["BUY"]) == [99]
+    assert book["BUY"].best_price() == 99
+    assert list(book["BUY"].queue(100)) == []
+    assert book.order(algo.order_id) is None
+    assert book.resting_orders() == []
+
+
+def test_owner_never_trades_with_itself():
+    book = OrderBook({}, {})
+    own = book.submit("BUY", 100, 3, "algo")
+    other = book.submit("BUY", 100, 2, "bot")
+
+    unfilled, fills = book.execute("SELL", 100, 4, "algo")
+
+    assert unfilled == 2
+    assert fills == [Fill(100, 2, "SELL", "algo", "bot", other.order_id)]
+    assert _queue(book, "BUY", 100) == [("algo", own.order_id, 3)]
+
+
+def test_book_orders_do_not_fill_against_snapshot_levels():
+    book = OrderBook({100: 5}, {})
+
+    unfilled, fills = book.execute("SELL", 100, 5, "book")
+
+    assert (unfilled, fills) == (5, [])
+    assert dict(book["BUY"]) == {100: 5}
+
+
+def test_room_clips_the_incoming_order():
+    book = OrderBook({}, {101: 10})
+
+    unfilled, fills = book.execute("BUY", 101, 8, "algo", room=3)
+
+    assert unfilled == 5
+    assert sum(fill.quantity for fill in fills) == 3
+    assert dict(book["SELL"]) == {101: 7}
+
+
+def test_passive_room_clips_the_resting_owner():
+    book = OrderBook({}, {})
+    algo = book.submit("BUY", 100, 5, "algo")
+    bot = book.submit("BUY", 100, 5, "bot")
+    passive_room = {"algo": 2}
+
+    unfilled, fills = book.execute("SELL", 100, 6, "book", passive_room=passive_room)
+
+    assert unfilled == 0
+    assert [(fill.order_id, fill.quantity) for fill in fills] == [(algo.order_id, 2), (bot.order_id, 4)]
+    # Updated in place, and the clipped order keeps its place and quantity
+    assert passive_room == {"algo": 0}
+    assert _queue(book, "BUY", 100) == [("algo", algo.order_id, 3), ("bot", bot.order_id, 1)]
+
+
+def test_match_algo_order_stops_at_the_position_limit():
+    book = OrderBook({}, {101: 10, 102: 10})
+    portfolio = Portfolio(["A"])
+    portfolio.quantity["A"] = 15
+
+    resting = match_algo_order(Order("A", 102, 12), book, portfolio, {"A": 20})
+
+    assert portfolio.quantity["A"] == 20
+    assert portfolio.cash == -5 * 101
+    assert portfolio.fills["A"] == 1
+    # What the limit kept from filling rests behind the book at its price
+    assert isinstance(resting, RestingOrder)
+    assert (resting.owner, resting.side, resting.price, resting.quantity) == ("algo", "BUY", 102, 7)
+    assert _queue(book, "SELL", 101) == [("book", None, 5)]
+
+
+def test_match_algo_order_fills_and_records_sells():
+    book = OrderBook({100: 3, 99: 3}, {})
+    portfolio = Portfolio(["A"])
+
+    resting = match_algo_order(Order("A", 99, -5), book, portfolio, {"A": 10})
+
+    assert resting is None
+    assert portfolio.quantity["A"] == -5
+    assert portfolio.cash == 3 * 100 + 2 * 99
+    assert portfolio.fills["A"] == 2
+
+
+def test_order_ids_count_up_per_book():
+    book = OrderBook({}, {})
+    ids = [book.submit("BUY", 100 - i, 1, "algo").order_id for i in range(3)]
+
+    assert ids == [1, 2, 3]
+    assert [order.order_id for order in book.resting_orders("algo")] == ids
+
+
+def test_cancel():
+    book = OrderBook({100: 5}, {})
+    algo = book.submit("BUY", 100, 3, "algo")
+
+    assert book.cancel(algo.order_id)
+    assert not book.cancel(algo.order_id)
+    assert book.order(algo.order_id) is None
+    assert _queue(book, "BUY", 100) == [("book", None, 5)]
+    assert dict(book["BUY"]) == {100: 5}
+
+
+def test_cancel_removes_a_level_only_the_order_held():
+    book = OrderBook({}, {})
+    algo = book.submit("SELL", 105, 3, "algo")
+
+    book.cancel(algo.order_id)
+
+    assert 105 not in book["SELL"]
+    assert book["SELL"].best_price() is None
+
+
+def test_cancel_after_fill():
+    book = OrderBook({}, {})
+    algo = book.submit("BUY", 100, 3, "algo")
+    book.execute("SELL", 100, 3, "bot")
+
+    assert not book.cancel(algo.order_id)
+
+
+def test_cancel_all_only_cancels_the_owner():
+    book = OrderBook({}, {})
+    book.submit("BUY", 100, 1, "algo")
+    book.submit("SELL", 102, 1, "algo")
+    bot = book.submit("BUY", 100, 2, "bot")
+
+    assert book.cancel_all("algo") == 2
+    assert book.cancel_all("algo") == 0
+    assert [order.order_id for order in book.resting_orders()] == [bot.order_id]
+    assert dict(book["BUY"]) == {100: 2}
+    assert len(book["SELL"]) == 0
+
+
+def test_copy_is_independent():
+    book = OrderBook({100: 5}, {})
+    algo = book.submit("BUY", 100, 3, "algo")
+    copy = book.copy()
+
+    copy.execute("SELL", 100, 8, "bot")
+
+    assert dict(book["BUY"]) == {100: 8}
+    assert book.order(algo.order_id).quantity == 3
+    assert copy.order(algo.order_id) is None
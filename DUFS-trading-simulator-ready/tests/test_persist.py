@@ -0,0 +1,143 @@
+"""
+Algo orders carried across ticks: refresh_orderbook loading each new
+snapshot into the books and trading the market levels that cross the
+algo's resting orders.
+"""
+from datamodel import BookSide, Cancel, Order, OrderBook, Portfolio
+from ordermatching import match_order, refresh_orderbook
+
+
+def _snapshot(buy: dict, sell: dict) -> dict:
+    return {"A": {"BUY": buy, "SELL": sell}}
+
+
+def _queue(book: OrderBook, side: str, price: int) -> list:
+    return [(order.owner, order.order_id, order.quantity) for order in book[side].queue(price)]
+
+
+def _setup(buy: dict, sell: dict, position: int = 0):
+    orderbook = {"A": OrderBook(buy, sell)}
+    portfolio = Portfolio(["A"])
+    portfolio.quantity["A"] = position
+    return orderbook, portfolio
+
+
+def test_new_product_gets_a_book():
+    orderbook, portfolio = {}, Portfolio(["A"])
+
+    refresh_orderbook(orderbook, _snapshot({100: 1}, {102: 1}), portfolio, {"A": 10})
+
+    assert dict(orderbook["A"]["BUY"]) == {100: 1}
+    assert dict(orderbook["A"]["SELL"]) == {102: 1}
+
+
+def test_resting_order_survives_a_changed_market_level():
+    orderbook, portfolio = _setup({100: 5}, {102: 5})
+    algo = orderbook["A"].submit("BUY", 100, 3, "algo")
+
+    # More market quantity at the level joins behind the algo order
+    refresh_orderbook(orderbook, _snapshot({100: 7, 99: 1}, {102: 5}), portfolio, {"A": 10})
+    assert _queue(orderbook["A"], "BUY", 100) == [("book", None, 5), ("algo", algo.order_id, 3), ("book", None, 2)]
+    assert orderbook["A"]["BUY"][100] == 10
+
+    # Less market quantity comes off the back, keeping the algo's place
+    refresh_orderbook(orderbook, _snapshot({100: 2}, {102: 5}), portfolio, {"A": 10})
+    assert _queue(orderbook["A"], "BUY", 100) == [("book", None, 2), ("algo", algo.order_id, 3)]
+    assert dict(orderbook["A"]["BUY"]) == {100: 5}
+
+
+def test_resting_order_keeps_its_level_when_the_market_leaves():
+    orderbook, portfolio = _setup({100: 5, 99: 1}, {102: 5})
+    algo = orderbook["A"].submit("BUY", 100, 3, "algo")
+
+    refresh_orderbook(orderbook, _snapshot({99: 1}, {102: 5}), portfolio, {"A": 10})
+
+    assert _queue(orderbook["A"], "BUY", 100) == [("algo", algo.order_id, 3)]
+    assert orderbook["A"].market_top() == (99, 102)
+    assert portfolio.fills["A"] == 0
+
+
+def test_snapshot_without_algo_orders_replaces_the_levels():
+    side = BookSide("SELL", {101: 1, 103: 2})
+
+    side.load_snapshot({102: 4, 101: 2})
+
+    assert dict(side) == {101: 2, 102: 4}
+    assert list(side) == [101, 102]
+
+
+def test_crossed_order_fills_at_its_own_price_in_fifo_order():
+    orderbook, portfolio = _setup({99: 2}, {102: 5})
+    book = orderbook["A"]
+    first = book.submit("BUY", 101, 2, "algo")
+    second = book.submit("BUY", 101, 2, "algo")
+    lower = book.submit("BUY", 100, 2, "algo")
+    fills = []
+    portfolio.on_fill = lambda product, price, quantity, counterparty: fills.append((price, quantity))
+
+    # Market sells at 99 and 100 arrive, crossing all three algo orders
+    refresh_orderbook(orderbook, _snapshot({98: 1}, {99: 3, 100: 2, 103: 1}), portfolio, {"A": 10})
+
+    # Best bid first, oldest first within it, each at the algo's price
+    assert fills == [(101, 2), (101, 1), (101, 1), (100, 1)]
+    assert portfolio.quantity["A"] == 5
+    assert portfolio.cash == -(4 * 101 + 100)
+    # What is left of the crossed orders is cancelled, leaving the snapshot
+    for order in (first, second, lower):
+        assert book.order(order.order_id) is None
+    assert dict(book["BUY"]) == {98: 1}
+    assert dict(book["SELL"]) == {99: 3, 100: 2, 103: 1}
+
+
+def test_uncrossed_order_keeps_resting():
+    orderbook, portfolio = _setup({99: 2}, {102: 5})
+    book = orderbook["A"]
+    crossed = book.submit("SELL", 100, 1, "algo")
+    uncrossed = book.submit("SELL", 104, 1, "algo")
+
+    refresh_orderbook(orderbook, _snapshot({100: 3}, {102: 5}), portfolio, {"A": 10})
+
+    assert portfolio.quantity["A"] == -1
+    assert portfolio.cash == 100
+    assert book.order(crossed.order_id) is None
+    assert book.order(uncrossed.order_id).quantity == 1
+
+
+def test_crossed_orders_stop_at_the_position_limit():
+    orderbook, portfolio = _setup({98: 1}, {102: 5}, position=7)
+    book = orderbook["A"]
+    algo = book.submit("BUY", 101, 6, "algo")
+
+    refresh_orderbook(orderbook, _snapshot({98: 1}, {100: 10}), portfolio, {"A": 10})
+
+    assert portfolio.quantity["A"] == 10
+    assert portfolio.cash == -3 * 101
+    # The rest would leave the book crossed, so it is cancelled
+    assert book.order(algo.order_id) is None
+    assert dict(book["SELL"]) == {100: 10}
+
+
+def test_cancelled_carried_order_does_not_fill():
+    orderbook, portfolio = _setup({98: 1}, {102: 5})
+    resting = match_order([Order("A", 100, 3)], orderbook, portfolio, {"A": 10})
+    order_id = resting["A"][0].order_id
+
+    match_order([Cancel("A", order_id)], orderbook, portfolio, {"A": 10})
+    refresh_orderbook(orderbook, _snapshot({98: 1}, {99: 5}), portfolio, {"A": 10})
+
+    assert portfolio.quantity["A"] == 0
+    assert portfolio.fills["A"] == 0
+    assert orderbook["A"].resting_orders() == []
+
+
+def test_cancel_all_carried_orders_of_a_product():
+    orderbook, portfolio = _setup({98: 1}, {102: 5})
+    match_order([Order("A", 100, 3), Order("A", 104, -2)], orderbook, portfolio, {"A": 10})
+    refresh_orderbook(orderbook, _snapshot({98: 2}, {102: 4}), portfolio, {"A": 10})
+    assert len(orderbook["A"].resting_orders("algo")) == 2
+
+    match_order([Cancel("A")], orderbook, portfolio, {"A": 10})
+
+    assert orderbook["A"].resting_orders("algo") == []
+    assert dict(orderbook["A"]["BUY"]) == {98: 2}
+    assert dict(orderbook["A"]["SELL"]) == {102: 4}
@@ -0,0 +1,100 @@
+"""
+The resampling and walk-forward runs of robustness.py.
+"""
+import os
+
+import numpy as np
+
+import robustness
+from dataimport import MarketData, load_round
+from main import import_trader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Buys once it has seen 20 ticks, whichever window they were in
+LEARNING_ALGO = """
+from datamodel import Order
+
+
+class Trader:
+    def __init__(self):
+        self.seen = 0
+
+    def run(self, state):
+        self.seen += 1
+        if self.seen == 20:
+            return [Order("Underlying", 20000, 1)]
+        return []
+"""
+
+
+def _numbered(n_ticks: int) -> MarketData:
+    """
+    Market data whose best bid on each tick is the tick number.
+    """
+    shape = (n_ticks, 1, 1)
+    prices = np.arange(n_ticks).reshape(shape)
+    arrays = {
+        "present": np.ones(shape[:2], dtype=bool),
+        "bid_prices": prices,
+        "bid_volumes": np.ones(shape, dtype=int),
+        "ask_prices": prices + 1,
+        "ask_volumes": np.ones(shape, dtype=int),
+    }
+    return MarketData.from_arrays(["A"], arrays)
+
+
+def test_bootstrap_blocks_come_from_replayed_ticks():
+    market = _numbered(101)
+    drawn = []
+    for seed in range(200):
+        resampled, bots = robustness.block_bootstrap(market, _numbered(101), 10, np.random.default_rng(seed))
+        ticks = resampled.bid_prices[:, 0, 0]
+        assert resampled.ticks == bots.ticks == 101
+        assert ticks[0] == 0
+        assert (bots.bid_prices[:, 0, 0] == ticks).all()
+        blocks = ticks[1:].reshape(10, 10)
+        # Consecutive ticks within each block
+        assert (np.diff(blocks, axis=1) == 1).all()
+        drawn.extend(blocks[:, 0])
+    # Every start from tick 1 to the last full block is drawn
+    assert min(drawn) == 1
+    assert sorted(set(drawn)) == list(range(1, 92))
+
+
+def test_bootstrap_keeps_a_partial_last_block():
+    resampled, _ = robustness.block_bootstrap(_numbered(24), _numbered(24), 10, np.random.default_rng(0))
+
+    ticks = resampled.bid_prices[:, 0, 0]
+    assert len(ticks) == 24
+    assert ticks.min() >= 0 and (ticks[1:] >= 1).all()
+
+
+def test_walk_forward_windows_follow_their_training_ticks():
+    runs = robustness.build_runs(1000, window=200, step=100, train=300)
+
+    assert [(run["train_start"], run["start"], run["end"]) for run in runs] == [
+        (1, 301, 501), (101, 401, 601), (201, 501, 701), (301, 601, 801), (401, 701, 901)
+    ]
+    assert robustness.build_runs(1000, window=250)[0] == {"kind": "walk_forward", "train_start": 1, "start": 251, "end": 501}
+
+
+def test_walk_forward_carries_the_trained_algo_into_the_window(tmp_path):
+    algo_path = tmp_path / "learning_algo.py"
+    algo_path.write_text(LEARNING_ALGO)
+    products, market_book, bot_book = load_round(os.path.join(ROOT, "Round_3.csv"))
+    robustness._worker.update(products=products, market_book=market_book, bot_book=bot_book,
+                              Trader=import_trader(str(algo_path)))
+    try:
+        untrained = robustness._run({"kind": "walk_forward", "train_start": 101, "start": 101, "end": 111})
+        trained = robustness._run({"kind": "walk_forward", "train_start": 82, "start": 101, "end": 111})
+        late = robustness._run({"kind": "walk_forward", "train_start": 1, "start": 101, "end": 111})
+    finally:
+        robustness._worker.clear()
+
+    # Untrained, the algo has not seen 20 ticks by the end of the window
+    assert untrained["pnl"] == 0
+    # Trained on 19 ticks, it buys on the window's first tick, which is scored
+    assert trained["error"] == "" and trained["pnl"] != 0
+    # It bought during training, which is not scored
+    assert late["pnl"] == 0
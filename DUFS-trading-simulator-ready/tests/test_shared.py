@@ -0,0 +1,123 @@
+"""
+Publishing a round in shared memory with SharedRound and attaching to it
+with attach_round.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import dataimport
+import tournament
+from dataimport import MarketData, SharedRound, attach_round, load_round
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUND = os.path.join(ROOT, "Round_3.csv")
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+
+
+def _segment(name: str) -> str:
+    return os.path.join("/dev/shm", name.lstrip("/"))
+
+
+def _arrays(products: list, market_data: MarketData, bot_data: MarketData) -> dict:
+    arrays = {"products": products}
+    for prefix, data in (("market", market_data), ("bots", bot_data)):
+        arrays[f"{prefix}_skip_empty"] = data.skip_empty
+        for name in MarketData.ARRAYS:
+            arrays[f"{prefix}_{name}"] = np.array(getattr(data, name))
+    return arrays
+
+
+def _attached_arrays(spec: dict) -> dict:
+    return _arrays(*attach_round(spec))
+
+
+def _assert_same_arrays(attached: dict, original: dict) -> None:
+    assert attached.keys() == original.keys()
+    for key, value in original.items():
+        if isinstance(value, np.ndarray):
+            assert attached[key].dtype == value.dtype, key
+            np.testing.assert_array_equal(attached[key], value, err_msg=key)
+        else:
+            assert attached[key] == value, key
+
+
+@pytest.fixture
+def detach():
+    names = []
+    yield names
+    for name in names:
+        shm = dataimport._attached.pop(name, None)
+        if shm is not None:
+            shm.close()
+
+
+def test_attached_arrays_equal_the_originals(detach):
+    original = _arrays(*load_round(ROUND))
+
+    with SharedRound.publish(ROUND) as shared:
+        detach.append(shared.spec["name"])
+        assert os.path.exists(_segment(shared.spec["name"]))
+
+        products, market_data, bot_data = attach_round(shared.spec)
+        _assert_same_arrays(_arrays(products, market_data, bot_data), original)
+        assert not market_data.bid_prices.flags.writeable
+        for name in MarketData.ARRAYS:
+            assert getattr(market_data, name).ctypes.data % SharedRound.ALIGN == 0
+
+        with ProcessPoolExecutor(2) as executor:
+            for attached in executor.map(_attached_arrays, [shared.spec] * 2):
+                _assert_same_arrays(attached, original)
+
+
+def test_close_unlinks_the_segment():
+    shared = SharedRound.publish(ROUND)
+    segment = _segment(shared.spec["name"])
+    assert os.path.getsize(segment) >= shared.nbytes
+
+    shared.close()
+
+    assert not os.path.exists(segment)
+
+
+def test_error_in_with_block_unlinks_the_segment():
+    with pytest.raises(RuntimeError):
+        with SharedRound.publish(ROUND) as shared:
+            segment = _segment(shared.spec["name"])
+            raise RuntimeError("worker failed")
+
+    assert not os.path.exists(segment)
+
+
+def test_failed_publish_unlinks_the_segment(monkeypatch):
+    names = []
+
+    class TooSmall(shared_memory.SharedMemory):
+        def __init__(self, name=None, create=False, size=0):
+            super().__init__(name, create, size // 2)
+            names.append(self.name)
+
+    # The arrays do not fit in the block, so copying them in fails
+    monkeypatch.setattr(shared_memory, "SharedMemory", TooSmall)
+    with pytest.raises(TypeError):
+        SharedRound.publish(ROUND)
+
+    assert names and not os.path.exists(_segment(names[0]))
+
+
+def test_failed_tournament_unlinks_the_segment(monkeypatch):
+    names = []
+
+    def fail(round_spec, *args):
+        names.append(round_spec["name"])
+        raise RuntimeError("worker failed")
+
+    monkeypatch.setattr(tournament, "_run_all", fail)
+    with pytest.raises(RuntimeError):
+        tournament.run_tournament(ROUND, [os.path.join(ROOT, "examplealgo.py")])
+
+    assert names and not os.path.exists(_segment(names[0]))
@@ -0,0 +1,87 @@
+"""
+The read-only view of the state handed to Trader.run.
+"""
+import pytest
+
+from datamodel import OrderBook, State
+from indicators import IndicatorSet, RollingMean
+
+
+def _state() -> State:
+    book = OrderBook({100: 5, 99: 2}, {101: 3})
+    book.submit("BUY", 100, 2, "algo")
+    return State({"A": book}, {"A": 4}, ["A"], {"A": 10}, tick=7)
+
+
+def test_view_reads_like_the_books():
+    state = _state()
+    view = state.public_view()
+
+    book = view.orderbook["A"]
+    assert dict(book["BUY"]) == {100: 7, 99: 2}
+    assert dict(book["SELL"]) == {101: 3}
+    assert list(book["BUY"]) == [100, 99]
+    assert book["BUY"].best_price() == 100
+    assert book.market_top() == (100, 101)
+    assert book.mid_price() == 100.5
+    assert [order.order_id for order in book.resting_orders("algo")] == [1]
+    assert list(view.orderbook) == ["A"]
+    assert view.positions["A"] == 4
+    assert view.products == ("A",)
+    assert view.tick == 7
+
+
+def test_view_has_no_mutators():
+    view = _state().public_view()
+    book = view.orderbook["A"]
+
+    for name in ("submit", "execute", "cancel", "cancel_all", "load_snapshot", "copy"):
+        assert not hasattr(book, name)
+    for name in ("add", "fill", "take", "remove", "load_snapshot", "set_book_quantity"):
+        assert not hasattr(book["BUY"], name)
+    with pytest.raises(TypeError):
+        book["BUY"][100] = 1
+    with pytest.raises(TypeError):
+        view.orderbook["A"] = book
+    with pytest.raises(TypeError):
+        view.positions["A"] = 0
+
+
+def test_view_hands_out_copies_of_resting_orders():
+    state = _state()
+    book = state.public_view().orderbook["A"]
+
+    for order in book["BUY"].queue(100):
+        order.quantity = 0
+    book.order(1).quantity = 0
+
+    assert dict(state.orderbook["A"]["BUY"]) == {100: 7, 99: 2}
+    assert state.orderbook["A"].order(1).quantity == 2
+
+
+def test_view_follows_the_engine_book():
+    state = _state()
+    book = state.public_view().orderbook["A"]
+
+    state.orderbook["A"].execute("SELL", 100, 6, "bot")
+
+    assert dict(book["BUY"]) == {100: 1, 99: 2}
+
+
+def test_indicator_view_is_read_only():
+    indicators = IndicatorSet(["A"], {"mean": RollingMean(2)})
+    indicators.update({"A": OrderBook({100: 1}, {102: 1})})
+    indicators.update({"A": OrderBook({102: 1}, {104: 1})})
+
+    view = indicators.indicator("mean", "A")
+
+    assert view.value == 102
+    assert view.ready
+    assert view.window == 2
+    with pytest.raises(AttributeError):
+        view.update(1.0)
+    with pytest.raises(AttributeError):
+        view._values
+    with pytest.raises(AttributeError):
+        view.window = 3
+    assert indicators.value("mean", "A") == 102
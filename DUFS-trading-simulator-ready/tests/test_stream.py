@@ -0,0 +1,81 @@
+"""
+stream_round against replay_round over the same round.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from dataimport import index_bot_orders, index_orders, read_round, replay_round, stream_round
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _replayed(round_path: str, **kwargs) -> list:
+    products, _, df, bot_df = read_round(round_path)
+    return list(replay_round(index_orders(df, products), index_bot_orders(bot_df, products), **kwargs))
+
+
+def _streamed(round_path: str, **kwargs) -> list:
+    _, ticks = stream_round(round_path, **kwargs)
+    return list(ticks)
+
+
+def _write_round(directory, market: pd.DataFrame, bots: pd.DataFrame) -> str:
+    round_path = os.path.join(directory, "Round_9.csv")
+    market.to_csv(round_path, index=False)
+    bots.to_csv(os.path.join(directory, "Round_9_bots.csv"), index=False)
+    return round_path
+
+
+@pytest.mark.parametrize("round_name", ["Round_2", "Round_3"])
+@pytest.mark.parametrize("chunksize", [64, 10000])
+def test_stream_matches_replay(round_name, chunksize):
+    round_path = os.path.join(ROOT, f"{round_name}.csv")
+
+    assert _streamed(round_path, chunksize=chunksize) == _replayed(round_path)
+
+
+def test_stream_matches_replay_between_ticks():
+    round_path = os.path.join(ROOT, "Round_3.csv")
+
+    streamed = _streamed(round_path, chunksize=5, start_tick=40, end_tick=60)
+
+    assert [tick for tick, _, _ in streamed] == list(range(40, 60))
+    assert streamed == _replayed(round_path, start_tick=40, end_tick=60)
+
+
+def test_missing_bot_rows_give_no_bot_orders(tmp_path):
+    market = pd.read_csv(os.path.join(ROOT, "Round_3.csv"))
+    bots = pd.read_csv(os.path.join(ROOT, "Round_3_bots.csv"))
+    market = market[market["timestamp"] < 2000]
+    # No bot rows at all on tick 5, and none for Put on tick 7
+    bots = bots[(bots["timestamp"] < 2000) & (bots["timestamp"] != 500)]
+    bots = bots[~((bots["timestamp"] == 700) & (bots["product"] == "Put"))]
+    round_path = _write_round(tmp_path, market, bots)
+
+    replayed = _replayed(round_path)
+
+    assert _streamed(round_path, chunksize=4) == replayed
+    assert replayed[4][0] == 5 and replayed[4][2] == {}
+    assert replayed[6][0] == 7 and sorted(replayed[6][2]) == ["Call", "Underlying"]
+
+
+def test_empty_market_data_is_an_error(tmp_path):
+    market = pd.read_csv(os.path.join(ROOT, "Round_3.csv")).iloc[:0]
+    bots = pd.read_csv(os.path.join(ROOT, "Round_3_bots.csv")).iloc[:0]
+    round_path = _write_round(tmp_path, market, bots)
+
+    with pytest.raises(ValueError, match="no market data"):
+        stream_round(round_path)
+
+
+def test_start_past_the_data_is_an_error():
+    round_path = os.path.join(ROOT, "Round_3.csv")
+
+    # One past the last tick is the end of a finished run
+    assert _streamed(round_path, start_tick=1000) == _replayed(round_path, start_tick=1000) == []
+    with pytest.raises(ValueError, match="past the last tick"):
+        _streamed(round_path, start_tick=1001)
+    with pytest.raises(ValueError, match="past the last tick"):
+        _replayed(round_path, start_tick=1001)
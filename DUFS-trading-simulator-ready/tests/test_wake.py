@@ -0,0 +1,134 @@
+"""
+Wake conditions deciding which ticks Trader.run is called on.
+"""
+import pytest
+
+from datamodel import Order, OrderBook, Portfolio
+from main import run_simulation
+from wake import Wake, trader_wake
+
+
+def _books(bid: int = 100, ask: int = 102) -> dict:
+    return {"A": OrderBook({bid: 5}, {ask: 5}), "B": OrderBook({50: 5}, {52: 5})}
+
+
+def _ran(wake: Wake, ticks: dict, portfolio: Portfolio = None) -> list:
+    """
+    Check every tick of {tick: (orderbook, change to the portfolio)} and
+    return those the algo ran on.
+    """
+    portfolio = portfolio or Portfolio(["A", "B"])
+    ran = []
+    for tick, (orderbook, change) in ticks.items():
+        if change:
+            change(portfolio)
+        if wake.check(tick, orderbook, portfolio):
+            ran.append(tick)
+    return ran
+
+
+def _buy(portfolio: Portfolio) -> None:
+    portfolio.quantity["A"] += 1
+    portfolio.fills["A"] += 1
+
+
+def _round_trip(portfolio: Portfolio) -> None:
+    # Two fills that leave the position where it was
+    portfolio.fills["A"] += 2
+
+
+def test_first_tick_always_runs():
+    wake = Wake(quotes=["A"])
+
+    assert _ran(wake, {5: (_books(), None), 6: (_books(), None)}) == [5]
+
+
+def test_quote_change_wakes():
+    wake = Wake(quotes=["A"])
+    ticks = {
+        1: (_books(), None),
+        2: (_books(), None),
+        3: (_books(bid=101), None),
+        4: (_books(bid=101), None),
+        5: (_books(bid=101, ask=103), None),
+        # B is not watched
+        6: ({"A": OrderBook({101: 9}, {103: 1}), "B": OrderBook({40: 1}, {60: 1})}, None),
+        # A has no book
+        7: ({"B": OrderBook({50: 5}, {52: 5})}, None),
+        8: ({"B": OrderBook({50: 5}, {52: 5})}, None),
+    }
+
+    assert _ran(wake, ticks) == [1, 3, 5, 7]
+
+
+def test_position_change_wakes():
+    ticks = {1: (_books(), None), 2: (_books(), _buy), 3: (_books(), None), 4: (_books(), _round_trip)}
+
+    assert _ran(Wake(positions=True), ticks) == [1, 2]
+    assert _ran(Wake(every=100), ticks) == [1]
+
+
+def test_fill_wakes_even_without_a_position_change():
+    ticks = {1: (_books(), None), 2: (_books(), _buy), 3: (_books(), None), 4: (_books(), _round_trip)}
+
+    assert _ran(Wake(fills=True), ticks) == [1, 2, 4]
+
+
+def test_every_wakes_on_multiples_of_the_interval():
+    wake = Wake(every=4)
+
+    assert _ran(wake, {tick: (_books(), None) for tick in range(1, 14)}) == [1, 4, 8, 12]
+    assert wake.summary() == {"runs": 4, "skipped": 9, "skip_ratio": 9 / 13}
+
+
+def test_any_condition_wakes():
+    wake = Wake(quotes=["B"], fills=True, every=5)
+    ticks = {tick: (_books(), None) for tick in range(1, 11)}
+    ticks[3] = (_books(), _buy)
+    ticks[7] = ({"A": OrderBook({100: 5}, {102: 5}), "B": OrderBook({51: 5}, {52: 5})}, None)
+
+    assert _ran(wake, ticks) == [1, 3, 5, 7, 8, 10]
+
+
+def test_needs_a_condition():
+    with pytest.raises(ValueError, match="at least one condition"):
+        Wake()
+    with pytest.raises(ValueError, match="every"):
+        Wake(every=0)
+
+
+def test_every_run_starts_from_a_fresh_copy():
+    class Trader:
+        wake = Wake(every=3)
+
+    algo = Trader()
+    first = trader_wake(algo)
+    _ran(first, {1: (_books(), None), 2: (_books(), None)})
+
+    assert trader_wake(algo) is not algo.wake
+    assert trader_wake(algo).runs == 0 and algo.wake.runs == 0
+    assert trader_wake(object()) is None
+
+
+def test_run_simulation_calls_the_algo_when_woken():
+    class Trader:
+        wake = Wake(quotes=["A"], fills=True, every=10)
+
+        def __init__(self):
+            self.ticks = []
+
+        def run(self, state):
+            self.ticks.append(state.tick)
+            # Lifts the ask on the first tick, which fills
+            return [Order("A", 102, 1)] if state.tick == 1 else []
+
+    def market(tick: int) -> dict:
+        bid = 101 if tick >= 12 else 100
+        return {"A": {"BUY": {bid: 5}, "SELL": {102: 5}}}
+
+    algo = Trader()
+    portfolio, _ = run_simulation(((tick, market(tick), {}) for tick in range(1, 31)), ["A"], algo)
+
+    # The fill wakes it on tick 2 and the new bid on tick 12
+    assert algo.ticks == [1, 2, 10, 12, 20, 30]
+    assert portfolio.quantity["A"] == 1
@@ -0,0 +1,161 @@
+"""
+Rank several Trader files by backtesting them against the same round.
+
+Each algo runs in its own process so a crash or a hang only costs that
+algo. The round is loaded once and published in shared memory, so every
+process reads the same copy of the data.
+
+Example:
+    python tournament.py --round Round_2.csv algos/ --timeout 60 --out leaderboard.csv
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+from typing import Any, Dict, List, Optional
+
+
+def _play(round_spec: Dict[str, Any], trading_algo: str, conn) -> None:
+    row: Dict[str, Any] = {"algo": trading_algo}
+    try:
+        from dataimport import attach_round, replay_round
+        from main import import_trader, max_drawdown, precompute, run_simulation, sharpe_ratio
+        from metrics import MetricsRecorder
+        from profiling import PhaseTimer
+
+        products, market_book, bot_book = attach_round(round_spec)
+        algo = import_trader(trading_algo)()
+        timer = PhaseTimer()
+        with timer.phase("precompute"):
+            precompute(algo, market_book)
+        portfolio, recorder = run_simulation(
+            replay_round(market_book, bot_book),
+            products,
+            algo,
+            timer=timer,
+            recorder=MetricsRecorder(products, capacity=market_book.ticks),
+        )
+        row.update(
+            pnl=portfolio.pnl,
+            sharpe=sharpe_ratio(recorder.pnl),
+            max_drawdown=max_drawdown(recorder.pnl),
+            fills=sum(portfolio.fills.values()),
+            run_us=timer.summary()["algo"]["mean_us"],
+            error="",
+        )
+    except Exception as e:
+        row["error"] = repr(e)
+    conn.send(row)
+    conn.close()
+
+
+def run_tournament(
+    round_data_path: str,
+    algo_paths: List[str],
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Backtest every algo and return a leaderboard sorted by PnL.
+
+    :param round_data_path: File path of CSV containing market data.
+    :param algo_paths: Trading algo filepaths.
+    :param workers: Number of algos to run at once, defaults to the CPU count.
+    :param timeout: Seconds each algo may run before it is stopped.
+    """
+    from dataimport import SharedRound
+
+    with SharedRound.publish(round_data_path) as shared:
+        results = _run_all(shared.spec, algo_paths, workers or os.cpu_count() or 1, timeout)
+    return sorted(results, key=lambda row: (row.get("pnl") is None, -(row.get("pnl") or 0)))
+
+
+def _run_all(round_spec: Dict[str, Any], algo_paths: List[str], workers: int,
+             timeout: Optional[float]) -> List[Dict[str, Any]]:
+    ctx = multiprocessing.get_context()
+    pending = list(algo_paths)
+    running: Dict[Any, tuple] = {}  # connection: (algo, process, deadline)
+    results = []
+
+    while pending or running:
+        while pending and len(running) < workers:
+            trading_algo = pending.pop(0)
+            recv, send = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_play, args=(round_spec, trading_algo, send), daemon=True)
+            process.start()
+            send.close()
+            deadline = time.monotonic() + timeout if timeout else None
+            running[recv] = (trading_algo, process, deadline)
+
+        deadlines = [deadline for _, _, deadline in running.values() if deadline]
+        wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        for recv in wait(list(running), timeout=wait_for):
+            trading_algo, process, _ = running.pop(recv)
+            try:
+                results.append(recv.recv())
+            except EOFError:
+                process.join()
+                results.append({"algo": trading_algo, "error": f"process exited with code {process.exitcode}"})
+            process.join()
+
+        now = time.monotonic()
+        for recv, (trading_algo, process, deadline) in list(running.items()):
+            if deadline and now >= deadline:
+                process.terminate()
+                process.join()
+                del running[recv]
+                results.append({"algo": trading_algo, "error": f"timed out after {timeout}s"})
+
+    return results
+
+
+def find_algos(paths: List[str]) -> List[str]:
+    """
+    Expand directories into the .py files they contain.
+
+    :param paths: Algo files and directories of algo files.
+    """
+    algos = []
+    for path in paths:
+        if os.path.isdir(path):
+            algos += sorted(glob.glob(os.path.join(path, "*.py")))
+        else:
+            algos.append(path)
+    return algos
+
+
+def format_leaderboard(results: List[Dict[str, Any]]) -> str:
+    """
+    Format tournament results as a table.
+
+    :param results: Rows from run_tournament.
+    """
+    lines = [f"{'rank':<6}{'algo':<40}{'pnl':>12}{'sharpe':>9}{'drawdown':>12}{'fills':>8}{'run us':>9}"]
+    for rank, row in enumerate(results, 1):
+        if row.get("error"):
+            lines.append(f"{'-':<6}{row['algo']:<40}  {row['error']}")
+            continue
+        lines.append(
+            f"{rank:<6}{row['algo']:<40}{row['pnl']:>12.2f}{row['sharpe']:>9.3f}"
+            f"{row['max_drawdown']:>12.2f}{row['fills']:>8}{row['run_us']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from sweep import write_results
+
+    parser = argparse.ArgumentParser(description="Rank Trader files on the same round.")
+    parser.add_argument("algos", nargs="+", help="Trading algorithm files or directories of them")
+    parser.add_argument("--round", default="Round_3.csv", help="Main data file path")
+    parser.add_argument("--workers", type=int, help="Number of algos to run at once")
+    parser.add_argument("--timeout", type=float, help="Seconds each algo may run")
+    parser.add_argument("--out", help="Write the leaderboard to this CSV")
+    args = parser.parse_args()
+
+    results = run_tournament(args.round, find_algos(args.algos), args.workers, args.timeout)
+    print(format_leaderboard(results))
+    if args.out:
+        write_results(results, args.out)
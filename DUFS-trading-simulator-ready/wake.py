@@ -0,0 +1,110 @@
+"""
+Wake conditions, so Trader.run is only called on ticks where something it
+cares about has changed.
+
+A Trader opts in by setting a ``wake`` attribute:
+
+    wake = Wake(quotes=["Call", "Put"], fills=True, every=100)
+
+Trader.run is then called on the first tick and afterwards only when a
+condition fires. On other ticks the algo sends no orders, while the bots
+still trade against the orderbook and the portfolio is still marked.
+"""
+import copy
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from datamodel import OrderBook, Portfolio
+
+
+class Wake:
+    """
+    When to call Trader.run, each condition comparing against the tick the
+    algo last ran on.
+    """
+    __slots__ = ("quotes", "positions", "fills", "every", "runs", "skipped", "_quotes", "_positions", "_fills")
+
+    def __init__(
+        self,
+        quotes: Iterable[str] = (),
+        positions: bool = False,
+        fills: bool = False,
+        every: Optional[int] = None,
+    ) -> None:
+        """
+        :param quotes: Products whose best market bid or ask changing wakes the algo.
+        :param positions: Wake the algo when any of its positions changed.
+        :param fills: Wake the algo when any of its orders filled.
+        :param every: Wake the algo every this many ticks.
+        """
+        if every is not None and every <= 0:
+            raise ValueError(f"every must be positive, got {every}")
+        self.quotes = tuple(quotes)
+        self.positions = positions
+        self.fills = fills
+        self.every = every
+        if not (self.quotes or positions or fills or every):
+            raise ValueError("Wake needs at least one condition")
+        # Ticks the algo was run and skipped on
+        self.runs = 0
+        self.skipped = 0
+        # What the algo saw when it last ran
+        self._quotes: Optional[Tuple[Tuple[Optional[int], Optional[int]], ...]] = None
+        self._positions: Optional[Tuple[int, ...]] = None
+        self._fills = 0
+
+    def _top(self, orderbook: Mapping[str, OrderBook]) -> Tuple[Tuple[Optional[int], Optional[int]], ...]:
+        top = []
+        for product in self.quotes:
+            book = orderbook.get(product)
+            if book is None:
+                top.append((None, None))
+            else:
+                top.append(book.market_top())
+        return tuple(top)
+
+    def check(self, tick: int, orderbook: Mapping[str, OrderBook], portfolio: Portfolio) -> bool:
+        """
+        Whether to run the algo on a tick, counting the tick as run or skipped.
+
+        :param tick: Tick number.
+        :param orderbook: Orderbooks of the tick.
+        :param portfolio: The portfolio before the algo runs.
+        """
+        quotes = self._top(orderbook) if self.quotes else None
+        positions = tuple(portfolio.positions) if self.positions else None
+        fills = sum(portfolio.fill_counts) if self.fills else 0
+
+        wake = (
+            self.runs == 0
+            or (self.every is not None and tick % self.every == 0)
+            or quotes != self._quotes
+            or positions != self._positions
+            or fills != self._fills
+        )
+        if not wake:
+            self.skipped += 1
+            return False
+        self.runs += 1
+        self._quotes, self._positions, self._fills = quotes, positions, fills
+        return True
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Ticks run and skipped, and the fraction skipped.
+        """
+        ticks = self.runs + self.skipped
+        return {
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / ticks if ticks else 0.0,
+        }
+
+
+def trader_wake(algo) -> Optional[Wake]:
+    """
+    A fresh copy of the wake conditions the algo set with a wake attribute.
+
+    :param algo: Trader instance.
+    """
+    wake = getattr(algo, "wake", None)
+    return None if wake is None else copy.deepcopy(wake)